@@ -125,21 +125,30 @@ class Spider(Spider):
         timestamp = int(time.time() / 4 - 355017625)
         t = timestamp * 4
         m3u8_text = f'#EXTM3U\n#EXT-X-VERSION:3\n#EXT-X-TARGETDURATION:4\n#EXT-X-MEDIA-SEQUENCE:{timestamp}\n'
+        segments = []
         for i in range(10):
             url = f'https://ntd-tgc.cdn.hinet.net/live/pool/{a}/litv-pc/{a}-avc1_6000000={b}-mp4a_134000_zho={c}-begin={t}0000000-dur=40000000-seq={timestamp}.ts'
+            segments.append(url)
             if self.is_proxy:
                 url = f'http://127.0.0.1:9978/proxy?do=py&type=ts&url={self.b64encode(url)}'
 
             m3u8_text += f'#EXTINF:4,\n{url}\n'
             timestamp += 1
             t += 4
+        if self.is_proxy:
+            # 片段地址由时间推算, 第一个片段从当前时刻开始, 就是直播边缘; 之后的都在未来, CDN 上还没有,
+            # 只预取播放位置之后、不超过直播边缘的片段
+            self.prefetch(segments, fetch=lambda u: requests.get(u, headers={'User-Agent': 'Mozilla/5.0'}, proxies=self.proxy, timeout=10), edge=0)
         return [200, "application/vnd.apple.mpegurl", m3u8_text]
 
     def get_ts(self, params):
         url = self.b64decode(params['url'])
+        data = self.prefetched(url)
+        if data is not None:
+            return [206, "application/octet-stream", data]
         headers = {'User-Agent': 'Mozilla/5.0'}
         response = requests.get(url, headers=headers, stream=True, proxies=self.proxy)
-        return [206, "application/octet-stream", response.content]
+        return self.media(response)
 
     def destroy(self):
         return '正在Destroy'
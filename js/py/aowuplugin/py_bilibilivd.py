@@ -5,6 +5,8 @@ import sys
 import json
 import time
 from datetime import datetime
+from threading import Lock
+from collections import OrderedDict
 from urllib.parse import quote, unquote
 
 import requests
@@ -21,6 +23,8 @@ class Spider(Spider):  # 元类 默认的元类 type
 			self.extendDict = json.loads(extend)
 		except:
 			self.extendDict = {}
+		self.rangeCache = OrderedDict()  # 预取的 init+sidx 字节: key -> (expiresAt, Future)
+		self.rangeLock = Lock()  # 代理请求多线程并发读写 rangeCache
 
 	def isVideoFormat(self, url):
 		pass
@@ -518,27 +522,23 @@ class Spider(Spider):  # 元类 默认的元类 type
 	def destroy(self):
 		pass
 
-	def proxyMpd(self, params):
-		content, durlinfos, mediaType = self.getDash(params)
+	def proxyMpd(self, params, forceRefresh=False):
+		content, durlinfos, mediaType = self.getDash(params, forceRefresh)
 		if mediaType == 'mpd':
 			return [200, "application/dash+xml", content]
 		else:
-			url = ''
-			urlList = [content] + durlinfos['durl'][0]['backup_url'] if 'backup_url' in durlinfos['durl'][0] and durlinfos['durl'][0]['backup_url'] else [content]
-			for url in urlList:
-				if 'mcdn.bilivideo.cn' not in url:
-					break
+			urls = [content] + (durlinfos['durl'][0].get('backup_url') or [])
 			header = self.header.copy()
 			if 'range' in params:
 				header['Range'] = params['range']
-			if '127.0.0.1:7777' in url:
-				header["Location"] = url
-				return [302, "video/MP2T", None, header]
-			r = requests.get(url, headers=header, stream=True)
-			return [206, "application/octet-stream", r.content]
+			for url in urls:
+				if '127.0.0.1:7777' in url:
+					header["Location"] = url
+					return [302, "video/MP2T", None, header]
+			return self.proxyRace(urls, header, lambda: self.proxyMpd(params, True), forceRefresh)
 
 	def proxyMedia(self, params, forceRefresh=False):
-		_, dashinfos, _ = self.getDash(params)
+		_, dashinfos, _ = self.getDash(params, forceRefresh)
 		if 'videoid' in params:
 			videoid = int(params['videoid'])
 			dashinfo = dashinfos['video'][videoid]
@@ -547,18 +547,26 @@ class Spider(Spider):  # 元类 默认的元类 type
 			dashinfo = dashinfos['audio'][audioid]
 		else:
 			return [404, "text/plain", ""]
-		url = ''
-		urlList = [dashinfo['baseUrl']] + dashinfo['backupUrl'] if 'backupUrl' in dashinfo and dashinfo['backupUrl'] else [dashinfo['baseUrl']]
-		for url in urlList:
-			if 'mcdn.bilivideo.cn' not in url:
-				break
-		if url == "":
-			return [404, "text/plain", ""]
+		kind = 'video' if 'videoid' in params else 'audio'
+		cached = self.cachedRange(f"{params['aid']}_{params['cid']}_{kind}_{params[kind + 'id']}", params.get('range'))
+		if cached:
+			return cached
+		urls = [dashinfo['baseUrl']] + (dashinfo.get('backupUrl') or [])
 		header = self.header.copy()
 		if 'range' in params:
 			header['Range'] = params['range']
-		r = requests.get(url, headers=header, stream=True)
-		return [206, "application/octet-stream", r.content]
+		return self.proxyRace(urls, header, lambda: self.proxyMedia(params, True), forceRefresh)
+
+	def candidates(self, urls):
+		# mcdn(PCDN) 节点不稳定, 只在没有其他地址时使用
+		return [url for url in urls if 'mcdn.bilivideo.cn' not in url] or urls
+
+	def proxyRace(self, urls, header, refresh, refreshed):
+		# 主备地址并发对冲, 直接转发胜出的连接
+		r = self.race(self.candidates(urls), headers=header)
+		if r is None:
+			return [404, "text/plain", ""] if refreshed else refresh()
+		return self.media(r)
 
 	def getDash(self, params, forceRefresh=False):
 		aid = params['aid']
@@ -660,9 +668,59 @@ class Spider(Spider):  # 元类 默认的元类 type
 	  </Period>
 	</MPD>"""
 		expiresAt = min(deadlineList) - 60
+		self.prewarmRanges(f'{aid}_{cid}', dashinfos, expiresAt)
 		self.setCache(key, {'type': 'mpd', 'content': mpd.replace('&', '&amp;'), 'dashinfos': dashinfos, 'expiresAt': expiresAt})
 		return mpd.replace('&', '&amp;'), dashinfos, 'mpd'
 
+	def prewarmRanges(self, prefix, dashinfos, expiresAt):
+		# 生成 MPD 时后台并发预取每个 Representation 的 Initialization + indexRange (两段相邻, 合并为一次请求),
+		# 播放器起播和拖动时请求这两段字节直接命中, 有效期与 MPD 一致
+		executor = self.executor()
+		warmed = {}
+		for kind in ['video', 'audio']:
+			for index, info in enumerate(dashinfos.get(kind) or []):
+				segmentBase = info['SegmentBase']
+				start = int(segmentBase['Initialization'].split('-')[0])
+				end = int(segmentBase['indexRange'].split('-')[1])
+				urls = self.candidates([info['baseUrl']] + (info.get('backupUrl') or []))
+				warmed[f'{prefix}_{kind}_{index}'] = (expiresAt, executor.submit(self.fetchRange, urls, start, end))
+		now = time.time()
+		with self.rangeLock:
+			for k in [k for k, v in self.rangeCache.items() if v[0] < now]:
+				del self.rangeCache[k]
+			self.rangeCache.update(warmed)
+			while len(self.rangeCache) > 64:
+				self.rangeCache.popitem(last=False)
+
+	def fetchRange(self, urls, start, end):
+		header = self.header.copy()
+		header['Range'] = f'bytes={start}-{end}'
+		r = self.race(urls, headers=header)
+		if r is None:
+			return None
+		data = r.content
+		if r.status_code != 206 or len(data) != end - start + 1:
+			return None
+		return start, data, r.headers.get('Content-Range', '').rpartition('/')[2] or '*'
+
+	def cachedRange(self, key, range):
+		with self.rangeLock:
+			item = self.rangeCache.get(key)
+		m = re.match(r'bytes=(\d+)-(\d+)$', range or '')
+		if not item or not m or item[0] < time.time():
+			return None
+		try:
+			warmed = item[1].result(timeout=5)
+		except Exception:
+			return None
+		if not warmed:
+			return None
+		start, data, total = warmed
+		first, last = int(m.group(1)), int(m.group(2))
+		if first < start or last >= start + len(data):
+			return None
+		return [206, "application/octet-stream", data[first - start:last - start + 1], {'Content-Range': f'bytes {first}-{last}/{total}'}]
+
 	def getCookie(self, cookie):
 		if '{' in cookie and '}' in cookie:
 			cookies = json.loads(cookie)
@@ -4,6 +4,9 @@ import warnings
 import re
 import os
 import time
+import asyncio
+import threading
+from urllib.parse import urlparse
 from urllib3.exceptions import InsecureRequestWarning
 from copy import deepcopy
 from concurrent.futures import ThreadPoolExecutor
@@ -56,6 +59,26 @@ proxy_config = {
     }
 }
 
+# 探测配置
+probe_config = {
+    "max_concurrency": 32,      # 所有站点共用的并发上限
+    "timeout": 7,               # 单个URL的连接/读取超时(秒)
+    "read_limit_kb": 256,       # 校验关键字时最多读取的响应体大小
+    "early_exit_latency": 1.0   # 站点出现带关键字且延迟低于此值(秒)的URL后, 不再探测该站点其余URL
+}
+
+# 探测历史配置: 每个URL保存最近的探测结果, 用于计算权重和决定是否需要重新探测
+history_config = {
+    "enabled": True,
+    "file": "probe_history.json",
+    "max_samples": 20,          # 每个URL保留的样本数
+    "fresh_seconds": 6 * 3600,  # 超过此时长未探测的URL视为过期, 需要重新探测
+    "flap_window": 5,           # 最近几次结果里好坏切换两次以上视为抖动, 需要重新探测
+    "dead_after": 3,            # 连续失败达到此次数后视为下线, 只在过期后复查
+    "prior_strength": 3,        # 静态权重相当于多少个样本
+    "force_full_probe": False   # 为 True 时忽略历史, 全部重新探测
+}
+
 # 文件路径配置
 file_path_config = {
     "input_dir": "",
@@ -250,92 +273,269 @@ def log_message(message, site_name=None, step="", max_error_length=80):
     print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] [{step}] {message}") if step else print(message)
 
 
-def test_url(url, site_name=None):
-    """增强版URL测试函数"""
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+# 按 scheme://host 复用的会话, 同一主机的多个URL共用连接
+sessions = {}
+sessions_lock = threading.Lock()
+
+
+def get_session(url):
+    """按主机取共享会话"""
+    parts = urlparse(url)
+    key = f"{parts.scheme}://{parts.netloc}"
+    with sessions_lock:
+        session = sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(max_retries=2, pool_maxsize=probe_config["max_concurrency"])
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            sessions[key] = session
+    return session
+
+
+def read_keyword(response, keyword, stop=None):
+    """流式读取响应体, 找到关键字或读满 read_limit_kb 即停止"""
+    if not keyword:
+        return True
+    needle = keyword.encode('utf-8')
+    limit = probe_config["read_limit_kb"] * 1024
+    tail, size = b'', 0
+    for chunk in response.iter_content(8192):
+        if stop is not None and stop.is_set():
+            return None
+        data = tail + chunk
+        if needle in data:
+            return True
+        size += len(chunk)
+        if size >= limit:
+            break
+        tail = data[-len(needle):]
+    return False
+
+
+def test_url(url, site_name=None, stop=None):
+    """探测单个URL, 返回 (延迟, 是否含关键字); stop 被置位时中途放弃"""
     search_path = search_path_config.get(site_name)
     test_url = url.strip() + search_path if search_path else url.strip()
     keyword = keyword_required_sites.get(site_name)
+    session = get_session(test_url)
+    attempts = [None, proxy_config["proxies"]] if proxy_config["enabled"] else [None]
+
+    for proxies in attempts:
+        try:
+            with session.get(test_url, timeout=probe_config["timeout"], verify=False, stream=True, proxies=proxies,
+                             headers={'User-Agent': USER_AGENT}) as response:
+                if response.status_code != 200:
+                    log_message(f"[失败] {test_url} HTTP状态码 {response.status_code}", site_name, "URL测试")
+                    return None, None
+                latency = response.elapsed.total_seconds()
+                has_keyword = read_keyword(response, keyword, stop)
+            if has_keyword is None:
+                return None, None
+
+            log_msg = f"{'代理' if proxies else '直接'}访问成功 | 延迟: {latency:.2f}s"
+            if keyword:
+                log_msg += f" | 关键字: {'✅' if has_keyword else '❌'}"
+            log_message(f"[成功] {test_url} {log_msg}", site_name, "URL测试")
+            return latency, has_keyword
+
+        except requests.RequestException as e:
+            if stop is not None and stop.is_set():
+                # 站点已选出URL, 被放弃的探测不再输出
+                return None, None
+            if proxies:
+                log_message(f"[失败] 代理访问错误: {str(e)}", site_name, "URL测试")
+            else:
+                error_type = "[超时]" if isinstance(e, requests.Timeout) else "[连接失败]"
+                log_message(f"{error_type} {str(e)}", site_name, "URL测试")
+
+    return None, None
+
+
+def load_history():
+    """读取探测历史: {站点: {URL: [[时间戳, 延迟毫秒(失败为-1), 关键字0/1], ...]}}"""
+    path = get_file_path(history_config["file"], is_input=False)
+    if history_config["enabled"] and os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            log_message(f"[错误] 读取探测历史失败: {str(e)}", step="探测历史")
+    return {}
 
-    session = requests.Session()
-    adapter = requests.adapters.HTTPAdapter(max_retries=2)
-    session.mount('http://', adapter)
-    session.mount('https://', adapter)
 
+def save_history(history, sites):
+    """只保留当前配置中仍存在的站点和URL"""
+    if not history_config["enabled"]:
+        return
+    compact = {name: {url: history[name][url] for url in dict.fromkeys(urls) if url in history.get(name, {})}
+               for name, urls in sites.items() if isinstance(urls, list)}
     try:
-        # 直接请求测试
-        response = session.get(
-            test_url,
-            timeout=7,
-            verify=False,
-            headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'}
-        )
+        path = get_file_path(history_config["file"], is_input=False)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({k: v for k, v in compact.items() if v}, f, ensure_ascii=False, separators=(',', ':'))
+    except Exception as e:
+        log_message(f"[错误] 保存探测历史失败: {str(e)}", step="探测历史")
 
-        if response.status_code == 200:
-            latency = response.elapsed.total_seconds()
-            has_keyword = keyword in response.text if keyword else True
 
-            log_msg = f"直接访问成功 | 延迟: {latency:.2f}s"
-            if keyword:
-                log_msg += f" | 关键字: {'✅' if has_keyword else '❌'}"
+def record_sample(history, site_name, url, latency, has_keyword):
+    samples = history.setdefault(site_name, {}).setdefault(url, [])
+    samples.append([int(time.time()), -1 if latency is None else int(latency * 1000), 1 if has_keyword else 0])
+    del samples[:-history_config["max_samples"]]
 
-            log_message(f"[成功] {test_url} {log_msg}", site_name, "URL测试")
-            return latency, has_keyword
 
-        log_message(f"[失败] HTTP状态码 {response.status_code}", site_name, "URL测试")
-        return None, None
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
 
-    except requests.RequestException as e:
-        error_type = "[超时]" if isinstance(e, requests.Timeout) else "[连接失败]"
-        log_message(f"{error_type} {str(e)}", site_name, "URL测试")
 
-        # 代理重试逻辑
-        if proxy_config["enabled"]:
-            try:
-                response = session.get(
-                    test_url,
-                    timeout=7,
-                    verify=False,
-                    proxies=proxy_config["proxies"],
-                    headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'}
-                )
-                if response.status_code == 200:
-                    latency = response.elapsed.total_seconds()
-                    has_keyword = keyword in response.text if keyword else True
-                    log_message(f"[成功] 代理访问成功 | 延迟: {latency:.2f}s | 关键字: {'✅' if has_keyword else '❌'}",
-                                site_name, "URL测试")
-                    return latency, has_keyword
-            except Exception as proxy_e:
-                log_message(f"[失败] 代理访问错误: {str(proxy_e)}", site_name, "URL测试")
-
-        return None, None
+def is_good(sample):
+    return sample[1] >= 0 and sample[2] == 1
 
 
-def get_best_url(urls, site_name=None, existing_url=None):
-    """优化后的URL选择算法"""
-    if not isinstance(urls, list):
-        return urls
+def learned_weight(site_name, url, samples):
+    """按最近的可用率和 p90 延迟学习权重: 稳定可用且 p90 为 1 秒时约等于默认的 50"""
+    prior = url_weight_config.get(site_name, {}).get(url, 50)
+    if not samples:
+        return prior
+    reliability = sum(map(is_good, samples)) / len(samples)
+    latencies = [s[1] / 1000 for s in samples if is_good(s)]
+    learned = 100 * reliability / (1 + percentile(latencies, 0.9)) if latencies else 0
+    # 静态配置作为先验, 样本越多越以实测为准
+    k = history_config["prior_strength"]
+    return round((prior * k + learned * len(samples)) / (k + len(samples)), 1)
+
 
-    weights = url_weight_config.get(site_name, {})
-    default_weight = 50
-    sorted_urls = sorted([(url, weights.get(url, default_weight)) for url in urls],
-                         key=lambda x: -x[1])
-
-    def test_single_url(url_weight):
-        url, weight = url_weight
-        latency, has_keyword = test_url(url, site_name)
-        if latency is not None:
-            return {
-                "url": url,
-                "latency": latency,
-                "has_keyword": has_keyword,
-                "weight": weight,
-                "score": (weight * 0.6) + ((1 / (latency + 0.1)) * 40)
-            }
-        return None
-
-    with ThreadPoolExecutor() as executor:
-        candidates = [result for result in executor.map(test_single_url, sorted_urls) if result]
+def needs_probe(samples, now):
+    """没有历史、已过期、抖动或刚失败的URL需要重新探测; 稳定可用或已确认下线的沿用历史"""
+    if history_config["force_full_probe"] or not samples:
+        return True
+    if now - samples[-1][0] > history_config["fresh_seconds"]:
+        return True
+    states = [is_good(s) for s in samples[-history_config["flap_window"]:]]
+    if sum(a != b for a, b in zip(states, states[1:])) >= 2:
+        return True
+    if not states[-1]:
+        failures = len(samples) - max((i + 1 for i, s in enumerate(samples) if is_good(s)), default=0)
+        return failures < history_config["dead_after"]
+    return False
+
+
+def make_candidate(url, latency, has_keyword, weight, cached=False):
+    return {
+        "url": url,
+        "latency": latency,
+        "has_keyword": has_keyword,
+        "weight": weight,
+        "score": (weight * 0.6) + ((1 / (latency + 0.1)) * 40),
+        "cached": cached
+    }
 
+
+class SiteProbe:
+    """单个站点的探测状态"""
+
+    def __init__(self, name, urls, history=None):
+        site_history = (history or {}).get(name, {})
+        now = time.time()
+        # 高权重的URL先探测, 提前结束时优先保留它们
+        self.name = name
+        self.urls = []
+        self.candidates = []
+        self.skipped = 0
+        unseen = set()
+        for url in dict.fromkeys(urls):
+            samples = site_history.get(url, [])
+            weight = learned_weight(name, url, samples)
+            if history is None or needs_probe(samples, now):
+                self.urls.append((url, weight))
+                if not samples:
+                    unseen.add(url)
+                continue
+            # 沿用历史: 稳定可用的以最近成功延迟的中位数作为候选, 已下线的直接跳过
+            self.skipped += 1
+            latencies = [s[1] / 1000 for s in samples[-history_config["flap_window"]:] if is_good(s)]
+            if latencies:
+                self.candidates.append(make_candidate(url, percentile(latencies, 0.5), True, weight, cached=True))
+        self.verify = None
+        self.deferred = []
+        if self.candidates:
+            # 历史最优的URL每次都复查一次, 下线能立即发现; 复查结果替代历史候选
+            best = max(self.candidates, key=lambda c: c["score"])
+            self.candidates.remove(best)
+            self.verify = best["url"]
+            self.urls.append((best["url"], best["weight"]))
+            self.skipped -= 1
+            if unseen and best["latency"] < probe_config["early_exit_latency"]:
+                # 从未探测过的(多是上次提前结束跳过的)只在复查失败时才探测
+                self.deferred = [item for item in self.urls if item[0] in unseen]
+                self.urls = [item for item in self.urls if item[0] not in unseen]
+                self.skipped += len(self.deferred)
+        self.urls.sort(key=lambda x: -x[1])
+        self.stop = threading.Event()
+        self.tasks = []
+        self.verify_failed = False
+
+
+async def probe_one(site, url, weight, semaphore, executor, history=None):
+    async with semaphore:
+        if site.stop.is_set():
+            return
+        loop = asyncio.get_running_loop()
+        latency, has_keyword = await loop.run_in_executor(executor, test_url, url, site.name, site.stop)
+    if history is not None and (latency is not None or not site.stop.is_set()):
+        # 因提前结束而放弃的探测不计为失败
+        record_sample(history, site.name, url, latency, has_keyword)
+    if latency is None:
+        site.verify_failed = site.verify_failed or url == site.verify
+        return
+    site.candidates.append(make_candidate(url, latency, has_keyword, weight))
+    if has_keyword and latency < probe_config["early_exit_latency"] and not site.stop.is_set():
+        # 已有足够好的URL: 取消排队中的探测, 进行中的探测在读取响应体时放弃
+        site.stop.set()
+        log_message(f"[信息] {url} 满足提前结束条件, 跳过其余URL", site.name, "URL测试")
+        for task in site.tasks:
+            if task is not asyncio.current_task():
+                task.cancel()
+
+
+async def probe_sites(sites, history=None):
+    """
+    所有站点的URL放进同一条流水线, 按站点轮流排队, 共享并发上限.
+    传入 history 时只探测需要重新探测的URL, 并把本次结果追加进 history.
+    """
+    probes = [SiteProbe(name, urls, history) for name, urls in sites.items() if isinstance(urls, list)]
+    if history is not None:
+        skipped = sum(p.skipped for p in probes)
+        log_message(f"[信息] 沿用历史 {skipped} 个URL, 需要探测 {sum(len(p.urls) for p in probes)} 个", step="探测历史")
+    semaphore = asyncio.Semaphore(probe_config["max_concurrency"])
+    executor = ThreadPoolExecutor(max_workers=probe_config["max_concurrency"])
+
+    async def run(batch):
+        for i in range(max((len(urls) for _, urls in batch), default=0)):
+            for site, urls in batch:
+                if i < len(urls):
+                    url, weight = urls[i]
+                    site.tasks.append(asyncio.ensure_future(probe_one(site, url, weight, semaphore, executor, history)))
+        await asyncio.gather(*(task for site, _ in batch for task in site.tasks), return_exceptions=True)
+
+    try:
+        await run([(site, site.urls) for site in probes])
+        # 历史最优复查失败且没有提前结束的站点, 补测先前暂缓的URL
+        retry = [(site, site.deferred) for site in probes if site.verify_failed and site.deferred and not site.stop.is_set()]
+        if retry:
+            log_message(f"[信息] {len(retry)} 个站点的历史最优URL复查失败, 补充探测", step="探测历史")
+            await run(retry)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return {site.name: site.candidates for site in probes}
+
+
+def select_best(candidates, site_name=None, existing_url=None):
+    """从探测结果中选出最优URL"""
     if not candidates:
         log_message(f"[警告] 无可用URL，使用现有配置: {existing_url}" if existing_url else
                     "[错误] 无可用URL且无历史配置", site_name, "URL选择")
@@ -347,13 +547,21 @@ def get_best_url(urls, site_name=None, existing_url=None):
 
     log_message("候选URL评估结果:\n" + "\n".join(
         [f"{item['url']} | 权重:{item['weight']} 延迟:{item['latency']:.2f}s 评分:{item['score']:.1f}"
-         for item in sorted_candidates]), site_name, "URL选择")
+         f"{' (历史)' if item.get('cached') else ''}" for item in sorted_candidates]), site_name, "URL选择")
 
     best = sorted_candidates[0]
     log_message(f"[选择] 最优URL: {best['url']} (评分: {best['score']:.1f})", site_name, "URL选择")
     return best['url']
 
 
+def get_best_url(urls, site_name=None, existing_url=None):
+    """单个站点的URL选择"""
+    if not isinstance(urls, list):
+        return urls
+    candidates = asyncio.run(probe_sites({site_name: urls}))[site_name]
+    return select_best(candidates, site_name, existing_url)
+
+
 def get_star2_real_url(source_url):
     """改进的星剧社真实URL提取"""
     try:
@@ -523,16 +731,23 @@ def process_urls():
     result = {'url': {}}
     stats = {'total': 0,'success': 0, 'failed': [], 'changed': []}
 
+    # 所有站点一次性并发探测, 稳定可用的URL沿用历史结果
+    log_message("[开始] 并发探测全部站点", step="URL测试")
+    history = load_history() if history_config["enabled"] else None
+    probed = asyncio.run(probe_sites(merged_data, history))
+    if history is not None:
+        save_history(history, merged_data)
+
     for cn_name, urls in merged_data.items():
         stats['total'] += 1
         site_key = site_mappings.get(cn_name)
         existing_url = existing_config.get(site_key, '')
 
         if cn_name == '星剧社':
-            best_source = get_best_url(urls, cn_name, existing_url)
+            best_source = select_best(probed.get(cn_name, []), cn_name, existing_url)
             final_url = get_star2_real_url(best_source) if best_source else existing_url
         else:
-            final_url = get_best_url(urls, cn_name, existing_url) or existing_url
+            final_url = select_best(probed.get(cn_name, []), cn_name, existing_url) or existing_url
 
         if final_url:
             result['url'][site_key] = final_url
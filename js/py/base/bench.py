@@ -0,0 +1,1364 @@
+#coding=utf-8
+#!/usr/bin/python
+# 本地基准测试, 在 base 目录下运行: python bench.py pool
+import io
+import os
+import ssl
+import json
+import sys
+import time
+import tempfile
+import warnings
+import contextlib
+import subprocess
+import requests
+import asyncio
+import urllib3
+import threading
+from threading import Thread, Event
+from concurrent.futures import ThreadPoolExecutor
+from socketserver import ThreadingMixIn
+from http.server import BaseHTTPRequestHandler, HTTPServer
+sys.path.append('..')
+from base.spider import Spider, AsyncSpider, executorStats
+from base import local
+
+urllib3.disable_warnings()
+
+class BenchSpider(Spider):
+    def init(self, extend=""):
+        pass
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    wbufsize = 65536
+    body = b'{"code":200,"data":[]}'
+    mime = 'application/json'
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', self.mime)
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, format, *args):
+        pass
+
+class SlowHandler(StandInHandler):
+    delay = 0.03
+    hits = 0
+
+    def do_GET(self):
+        SlowHandler.hits += 1
+        time.sleep(self.delay)
+        super().do_GET()
+
+class StandInServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # 客户端主动断开(对冲请求的落败方等)不算错误
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+def threadStarts(func):
+    # 统计 func 执行期间新建的线程数
+    count, start = [0], Thread.start
+    def counted(thread):
+        count[0] += 1
+        start(thread)
+    Thread.start = counted
+    try:
+        func()
+    finally:
+        Thread.start = start
+    return count[0]
+
+def selfSigned(folder):
+    cert, key = os.path.join(folder, 'cert.pem'), os.path.join(folder, 'key.pem')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1', '-subj', '/CN=127.0.0.1',
+                    '-keyout', key, '-out', cert], check=True, capture_output=True)
+    return cert, key
+
+def startServer(handler=StandInHandler, tls=False):
+    server = StandInServer(('127.0.0.1', 0), handler)
+    if tls:
+        folder = tempfile.mkdtemp()
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(*selfSigned(folder))
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+    Thread(target=server.serve_forever, daemon=True).start()
+    scheme = 'https' if tls else 'http'
+    return server, f'{scheme}://127.0.0.1:{server.server_address[1]}'
+
+def timeit(func, rounds):
+    start = time.perf_counter()
+    for i in range(rounds):
+        func(i)
+    return time.perf_counter() - start
+
+def benchPool(rounds=200):
+    server, base = startServer(tls=True)
+    sp = BenchSpider()
+    try:
+        cold = timeit(lambda i: requests.get(f'{base}/api?i={i}', timeout=5, verify=False).content, rounds)
+        warm = timeit(lambda i: sp.fetch(f'{base}/api?i={i}', timeout=5, verify=False).content, rounds)
+    finally:
+        sp.closeSessions()
+        server.shutdown()
+    print(f'requests.get  {rounds} 次: {cold:.3f}s  {cold / rounds * 1000:.2f}ms/次')
+    print(f'Spider.fetch  {rounds} 次: {warm:.3f}s  {warm / rounds * 1000:.2f}ms/次')
+    print(f'连接复用节省: {(1 - warm / cold) * 100:.1f}%')
+
+class LegacyProxyServer(local.ProxyServer):
+    protocol_version = 'HTTP/1.0'
+
+def legacyServe(event, port):
+    # 旧实现: 每个请求都重新绑定端口
+    while not event.is_set():
+        try:
+            local.ThreadedHTTPServer(('127.0.0.1', port), LegacyProxyServer).handle_request()
+        except OSError:
+            pass
+
+def freePort():
+    server = HTTPServer(('127.0.0.1', 0), BaseHTTPRequestHandler)
+    port = server.server_address[1]
+    server.server_close()
+    return port
+
+def loadProxy(port, clients, rounds):
+    def client(n):
+        errors = 0
+        session = requests.Session()
+        for i in range(rounds):
+            try:
+                if i % 4 == 0:
+                    session.post(f'http://127.0.0.1:{port}/cache?do=set&key=k{n}_{i}', data={'value': 'v' * 256}, timeout=5)
+                else:
+                    session.get(f'http://127.0.0.1:{port}/cache?do=get&key=k{n}_{i - i % 4}', timeout=5).content
+            except requests.RequestException:
+                errors += 1
+        return errors
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        errors = sum(executor.map(client, range(clients)))
+    return (clients * rounds - errors) / (time.perf_counter() - start), errors
+
+def benchProxy(clients=8, rounds=250):
+    for name, target in [('每请求重绑定', legacyServe), ('常驻长连接', local.serveForever)]:
+        event, port = Event(), freePort()
+        thread = Thread(target=target, args=(event, port), daemon=True)
+        thread.start()
+        time.sleep(0.3)
+        rps, errors = loadProxy(port, clients, rounds)
+        event.set()
+        try:
+            requests.get(f'http://127.0.0.1:{port}/cache?do=none', timeout=1)
+        except requests.RequestException:
+            pass
+        thread.join(5)
+        print(f'{name}: 成功 {rps:.0f} req/s  失败 {errors}/{clients * rounds}')
+
+class FanoutSpider(Spider):
+    # 旧写法: 每次调用新建 ThreadPoolExecutor(max_workers=len(tasks))
+    def init(self, extend=""):
+        pass
+
+    def detailContent(self, ids):
+        with ThreadPoolExecutor(max_workers=len(ids)) as executor:
+            return list(executor.map(lambda u: self.fetch(u).text, ids))
+
+class SharedPoolSpider(Spider):
+    def init(self, extend=""):
+        pass
+
+    def detailContent(self, ids):
+        with self.executor() as executor:
+            return list(executor.map(lambda u: self.fetch(u).text, ids))
+
+class GatherSpider(AsyncSpider):
+    async def init(self, extend=""):
+        self.extend = extend
+
+    async def detailContent(self, ids):
+        return [r.text for r in await asyncio.gather(*[self.fetchInThread(u) for u in ids])]
+
+def benchAsync(pages=30, fanout=8, clients=4):
+    server, base = startServer(SlowHandler)
+    urls = [f'{base}/api/v1/movie_addr/list?i={i}' for i in range(fanout)]
+    try:
+        for sp in [FanoutSpider(), SharedPoolSpider(), GatherSpider()]:
+            sp.init('')
+            sp.detailContent(urls)
+            def load():
+                with ThreadPoolExecutor(max_workers=clients) as executor:
+                    list(executor.map(lambda i: sp.detailContent(urls), range(pages)))
+            start = time.perf_counter()
+            threads = threadStarts(load)
+            cost = time.perf_counter() - start
+            print(f'{type(sp).__name__}: {pages} 个详情页 x {fanout} 请求 {cost:.2f}s  新建线程 {threads}')
+        print(executorStats())
+    finally:
+        server.shutdown()
+
+class CoalesceSpider(Spider):
+    coalesce = True
+
+    def init(self, extend=""):
+        pass
+
+def benchCoalesce(clients=50, rounds=5):
+    server, base = startServer(SlowHandler)
+    try:
+        for sp in [BenchSpider(), CoalesceSpider()]:
+            SlowHandler.hits = 0
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=clients) as executor:
+                for i in range(rounds):
+                    list(executor.map(lambda n: sp.fetch(f'{base}/api/v1/app/config?r={i}').json(), range(clients)))
+            cost = time.perf_counter() - start
+            print(f'{type(sp).__name__}: {clients} 并发 x {rounds} 轮 {cost:.2f}s  上游请求 {SlowHandler.hits}')
+    finally:
+        server.shutdown()
+
+class EtagHandler(StandInHandler):
+    body = b'{"class":[' + b','.join(b'{"type_id":"%d","type_name":"filter"}' % i for i in range(5000)) + b']}'
+    sent = 0
+
+    def do_GET(self):
+        if self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.send_header('ETag', '"v1"')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        EtagHandler.sent += len(self.body)
+        self.send_response(200)
+        self.send_header('ETag', '"v1"')
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+class RevalidateSpider(Spider):
+    cacheRules = {r'/api/v1/app/config': 0}
+
+    def init(self, extend=""):
+        pass
+
+class FreshSpider(Spider):
+    cacheRules = {r'/api/v1/app/config': 60}
+
+    def init(self, extend=""):
+        pass
+
+def benchHttpCache(rounds=200):
+    server, base = startServer(EtagHandler)
+    try:
+        for sp in [BenchSpider(), RevalidateSpider(), FreshSpider()]:
+            EtagHandler.sent = 0
+            cost = timeit(lambda i: sp.fetch(f'{base}/api/v1/app/config?by={type(sp).__name__}').json(), rounds)
+            print(f'{type(sp).__name__}: {rounds} 次 {cost:.2f}s  上游正文 {EtagHandler.sent / 1024:.0f}KB')
+        print(sp.cacheStats()['http'])
+    finally:
+        server.shutdown()
+
+def pluginFiles():
+    # 仓库内所有定义了 Spider 的插件文件; base 框架与独立脚本(upurl.py 等)不含 class Spider, 不计入
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+    for folder, dirs, files in os.walk(root):
+        dirs[:] = [d for d in dirs if d not in ('.git', 'base', '__pycache__')]
+        for name in sorted(files):
+            path = os.path.join(folder, name)
+            if name.endswith('.py') and 'class Spider' in open(path, encoding='utf-8', errors='ignore').read():
+                yield path
+
+def loadAll(mode):
+    from importlib.machinery import SourceFileLoader
+    from base.loader import loadPlugin
+    files = list(pluginFiles())
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+    costs, failed = [], set()
+    for _ in range(2):
+        start = time.perf_counter()
+        for i, path in enumerate(files):
+            name = f'plugin{i}'
+            try:
+                with contextlib.redirect_stdout(None), warnings.catch_warnings():
+                    warnings.simplefilter('ignore')
+                    if mode == 'legacy':
+                        SourceFileLoader(name, path).load_module()
+                    else:
+                        loadPlugin(path, name)
+            except Exception:
+                failed.add(os.path.relpath(path, root))
+        costs.append(time.perf_counter() - start)
+    print(json.dumps({'files': len(files), 'cold': costs[0], 'warm': costs[1], 'failed': sorted(failed)}, ensure_ascii=False))
+
+def benchLoader():
+    for mode in ['legacy', 'cached']:
+        out = subprocess.run([sys.executable, __file__, 'loadall', mode], capture_output=True, text=True, timeout=600)
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f'{mode}: {r["files"]} 个插件  冷启动 {r["cold"]:.2f}s  热加载 {r["warm"] * 1000:.1f}ms  '
+              f'失败 {len(r["failed"])} {" ".join(r["failed"])}')
+
+class RawSpider(Spider):
+    timedMethods = ()
+
+    def init(self, extend=""):
+        pass
+
+    def categoryContent(self, tid, pg, filter, extend):
+        return {'list': [], 'page': pg}
+
+class TimedSpider(Spider):
+    def init(self, extend=""):
+        pass
+
+    def categoryContent(self, tid, pg, filter, extend):
+        return {'list': [], 'page': pg}
+
+def benchMetrics(rounds=200000):
+    raw, timed = RawSpider(), TimedSpider()
+    a = timeit(lambda i: raw.categoryContent('1', i, False, {}), rounds)
+    b = timeit(lambda i: timed.categoryContent('1', i, False, {}), rounds)
+    print(f'未埋点 {a / rounds * 1e6:.2f}us/次  埋点 {b / rounds * 1e6:.2f}us/次  额外开销 {(b - a) / rounds * 1e6:.2f}us/次')
+    from base.metrics import metrics
+    print([line for line in metrics.render().splitlines() if line.startswith('spider_call_seconds_count')])
+    # getCache/setCache/delCache 只访问本地代理, 不应计入上游请求
+    event = Event()
+    Thread(target=local.serveForever, args=(event,), daemon=True).start()
+    time.sleep(0.3)
+    try:
+        for i in range(3):
+            timed.setCache(f'metrics{i}', {'v': i})
+            timed.getCache(f'metrics{i}')
+            timed.delCache(f'metrics{i}')
+    finally:
+        event.set()
+    print('缓存调用后上游计数:', [line for line in metrics.render().splitlines()
+                                 if line.startswith('spider_upstream_requests_total{')])
+    # 流式 body: 耗时计到迭代器读完为止
+    sp = StreamTimedSpider()
+    start = time.perf_counter()
+    body = sp.localProxy({})[2]
+    created = time.perf_counter() - start
+    b''.join(body)
+    total = metrics.calls[(type(sp).__module__, 'localProxy')][-1]
+    print(f'流式 localProxy: 返回 {created * 1000:.3f}ms  读完 {(time.perf_counter() - start) * 1000:.1f}ms  '
+          f'记录 {total * 1000:.1f}ms')
+
+class StreamTimedSpider(Spider):
+    def init(self, extend=""):
+        pass
+
+    def localProxy(self, param):
+        def body():
+            for _ in range(5):
+                time.sleep(0.01)
+                yield b'x' * 1024
+        return [200, 'video/mp2t', body()]
+
+class ReplaySpider(Spider):
+    # 模拟一个完整插件, URL 带时间戳, 回放时需要按路径顺序匹配; init 先取一次配置
+    host = ''
+
+    def init(self, extend=""):
+        if self.host:
+            self.get('/api/v1/app/init?i=0')
+
+    def get(self, path):
+        return self.fetch(f'{self.host}{path}&t={time.time()}').json()
+
+    def homeContent(self, filter):
+        self.get('/api/v1/app/config?i=0')
+        return {'class': [{'type_id': '1', 'type_name': '电影'}]}
+
+    def categoryContent(self, tid, pg, filter, extend):
+        self.get(f'/api/v1/list?tid={tid}')
+        return {'list': [{'vod_id': '42'}]}
+
+    def detailContent(self, ids):
+        with self.executor() as executor:
+            list(executor.map(lambda i: self.get(f'/api/v1/detail?id={ids[0]}&part={i}'), range(4)))
+        return {'list': [{'vod_play_from': 'line', 'vod_play_url': '第1集$ep1'}]}
+
+    def playerContent(self, flag, id, vipFlags):
+        self.get(f'/api/v1/play?id={id}')
+        return {'parse': 0, 'url': ''}
+
+    def searchContent(self, key, quick, pg='1'):
+        self.get(f'/api/v1/search?wd={key}')
+        return {'list': []}
+
+def benchReplay():
+    from base import replay
+    server, base = startServer(SlowHandler)
+    path = os.path.join(tempfile.mkdtemp(), 'ReplaySpider.jsonl')
+    sp = ReplaySpider()
+    sp.host = base
+    SlowHandler.hits = 0
+    start = time.perf_counter()
+    replay.record(sp, path)
+    print(f'在线录制 {time.perf_counter() - start:.2f}s  上游 {SlowHandler.hits}')
+    server.shutdown()
+    server.server_close()
+    replay.bench(sp, path)
+    # 插件自带代理(如 kzb 的 self.proxy)时, 回放请求仍直连本机替身服务器, 不经过失效的代理
+    with replay.Session(replay.FixtureStore(path).load(), 'replay'):
+        try:
+            code = requests.get(f'{base}/api/v1/app/config?i=0', proxies={'http': 'http://127.0.0.1:9'}, timeout=2).status_code
+        except requests.ConnectionError as e:
+            code = type(e).__name__
+    print(f'带代理的请求回放: {code}')
+
+class SegmentHandler(StandInHandler):
+    size = 32 * 1024 * 1024
+    block = b'\x47' * 188 * 348
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'video/mp2t')
+        self.send_header('Content-Length', str(self.size))
+        self.end_headers()
+        for _ in range(self.size // len(self.block)):
+            self.wfile.write(self.block)
+        self.wfile.write(self.block[:self.size % len(self.block)])
+
+class BufferedSpider(Spider):
+    upstreamUrl = ''
+
+    def init(self, extend=""):
+        pass
+
+    def localProxy(self, params):
+        return [206, 'video/mp2t', self.fetch(self.upstreamUrl, stream=True).content]
+
+class StreamingSpider(Spider):
+    upstreamUrl = ''
+    streamBody = True
+
+    def init(self, extend=""):
+        pass
+
+    def localProxy(self, params):
+        return self.media(self.fetch(self.upstreamUrl, stream=True), 'video/mp2t')
+
+def benchStream(rounds=3):
+    import tracemalloc
+    server, base = startServer(SegmentHandler)
+    event, port = Event(), freePort()
+    thread = Thread(target=local.serveForever, args=(event, port), daemon=True)
+    thread.start()
+    time.sleep(0.3)
+    try:
+        for sp in [BufferedSpider(), StreamingSpider()]:
+            sp.upstreamUrl = f'{base}/seg.ts'
+            local.plugin = sp
+            ttfb, total, peak = [], [], 0
+            for _ in range(rounds):
+                tracemalloc.start()
+                start = time.perf_counter()
+                with requests.get(f'http://127.0.0.1:{port}/proxy?do=py&type=ts', stream=True, timeout=30) as r:
+                    status = f'{r.status_code} Content-Length={r.headers.get("Content-Length")}'
+                    chunks = r.iter_content(64 * 1024)
+                    size = len(next(chunks))
+                    ttfb.append(time.perf_counter() - start)
+                    size += sum(len(c) for c in chunks)
+                total.append(time.perf_counter() - start)
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+            print(f'{type(sp).__name__}: {size / 1048576:.0f}MB  首字节 {min(ttfb) * 1000:.1f}ms  '
+                  f'总耗时 {min(total) * 1000:.0f}ms  峰值内存 {peak / 1048576:.1f}MB  {status}')
+    finally:
+        local.plugin = None
+        event.set()
+        server.shutdown()
+
+class PlaylistHandler(StandInHandler):
+    body = ('#EXTM3U\n#EXT-X-TARGETDURATION:6\n#EXT-X-MEDIA-SEQUENCE:1\n' +
+            ''.join(f'#EXTINF:6.0,\n/hls/20250101/{i}.ts\n' for i in range(600))).encode()
+    hits = 0
+
+    def do_GET(self):
+        PlaylistHandler.hits += 1
+        super().do_GET()
+
+class HlsSpider(Spider):
+    proxy = 'http://127.0.0.1:9978/proxy?do=py'
+
+    def init(self, extend=""):
+        pass
+
+    def legacy(self, url):
+        # 各插件原先的写法: 每次回源, 逐行 split 拼接
+        data = self.fetch(url).content.decode('utf-8')
+        lines = data.strip().split('\n')
+        for index, string in enumerate(lines):
+            if '#EXT' not in string and 'http' not in string:
+                lines[index] = f'{self.proxy}&type=ts&url={url.rsplit("/", 1)[0]}{string}'
+        return '\n'.join(lines)
+
+    def shared(self, url):
+        return self.loadPlaylist(url).rewrite(segment=lambda uri, attrs: f'{self.proxy}&type=ts&url={uri}')
+
+def benchHls(rounds=300):
+    server, base = startServer(PlaylistHandler)
+    sp = HlsSpider()
+    try:
+        for name in ['legacy', 'shared']:
+            PlaylistHandler.hits = 0
+            cost = timeit(lambda i: getattr(sp, name)(f'{base}/live/index.m3u8'), rounds)
+            print(f'{name}: {rounds} 次 {cost * 1000 / rounds:.2f}ms/次  上游 {PlaylistHandler.hits}')
+        print(sp.cacheStats()['hls'])
+    finally:
+        server.shutdown()
+
+class SlowSegmentHandler(StandInHandler):
+    delay = 0.2
+    body = b'\x47' * 512 * 1024
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        super().do_GET()
+
+class LiveSpider(Spider):
+    prefetchCount = 0
+    host = ''
+
+    def init(self, extend=""):
+        pass
+
+    def m3u8(self, sequence):
+        # 与 kzb 相同: 按时间推算出 6 个片段
+        urls = [f'{self.host}/{n}.ts' for n in range(sequence, sequence + 6)]
+        self.prefetch(urls)
+        return urls
+
+    def ts(self, url):
+        data = self.prefetched(url)
+        return data if data is not None else self.fetch(url, timeout=10).content
+
+class PrefetchLiveSpider(Spider):
+    prefetchCount = 3
+    host = ''
+    init, m3u8, ts = LiveSpider.init, LiveSpider.m3u8, LiveSpider.ts
+
+def benchPrefetch(segmentCount=20, duration=0.3):
+    server, base = startServer(SlowSegmentHandler)
+    try:
+        for sp in [LiveSpider(), PrefetchLiveSpider()]:
+            sp.host = f'{base}/{type(sp).__name__}'
+            waits = []
+            sp.m3u8(0)
+            for n in range(3, 3 + segmentCount):
+                # 播放器: 从列表倒数第 3 个片段起播, 每播完一个片段刷新一次列表
+                start = time.perf_counter()
+                sp.ts(f'{sp.host}/{n}.ts')
+                waits.append(time.perf_counter() - start)
+                time.sleep(max(duration - waits[-1], 0))
+                sp.m3u8(n - 1)
+            waits.sort()
+            print(f'{type(sp).__name__}: {segmentCount} 个片段  平均等待 {sum(waits) / len(waits) * 1000:.1f}ms  '
+                  f'最长等待 {waits[-1] * 1000:.1f}ms')
+        print(sp.cacheStats()['segments'])
+    finally:
+        server.shutdown()
+
+class EdgeSegmentHandler(StandInHandler):
+    # 直播源站: 只有序号不超过 edge 的片段已生成, 更新的片段返回 404
+    edge = 0
+    body = b'\x47' * 64 * 1024
+
+    def do_GET(self):
+        if int(self.path.rsplit('/', 1)[1].split('.')[0]) > EdgeSegmentHandler.edge:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        super().do_GET()
+
+class ClockLiveSpider(Spider):
+    # 与 kzb 相同: 列表从当前时刻的片段开始, 按时间往后推算 10 个, 除第一个外都还没生成
+    prefetchCount = 3
+    host = ''
+    edge = None
+
+    def init(self, extend=""):
+        pass
+
+    def m3u8(self, sequence):
+        urls = [f'{self.host}/{n}.ts' for n in range(sequence, sequence + 10)]
+        self.prefetch(urls, edge=self.edge)
+        return urls
+
+def benchLiveEdge(segmentCount=20):
+    from base.prefetch import segments
+    server, base = startServer(EdgeSegmentHandler)
+    try:
+        for edge in [None, 0]:
+            sp = ClockLiveSpider()
+            sp.host, sp.edge = f'{base}/edge{edge}', edge
+            segments.clear()
+            segments.stats = dict.fromkeys(segments.stats, 0)
+            hits = 0
+            for n in range(segmentCount):
+                # 每个片段时长刷新一次列表, 播放器跟在直播边缘播放
+                EdgeSegmentHandler.edge = n
+                sp.m3u8(n)
+                time.sleep(0.05)
+                hits += sp.prefetched(f'{sp.host}/{n}.ts', timeout=1) is not None
+            time.sleep(0.2)
+            print(f'edge={edge}: {segmentCount} 个片段  命中 {hits}  预取 404 {segments.info()["failed"]}', segments.info())
+    finally:
+        server.shutdown()
+
+class MirrorHandler(StandInHandler):
+    # /slow 卡顿的主 CDN, /fast 正常的备用 CDN, /down 故障节点
+    body = b'\x00' * 256 * 1024
+    hits = 0
+
+    def do_GET(self):
+        MirrorHandler.hits += 1
+        if self.path.startswith('/down'):
+            self.send_response(502)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.path.startswith('/slow'):
+            time.sleep(1.5)
+        self.send_response(206)
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+class SequentialMirrorSpider(Spider):
+    def init(self, extend=""):
+        pass
+
+    def media(self, urls):
+        # 原写法: 依次探测, 每个 1s 超时, 再对胜出地址重新请求一次取内容
+        for url in urls:
+            try:
+                r = self.fetch(url, stream=True, timeout=1)
+                r.close()
+                if r.status_code in (200, 206):
+                    break
+            except Exception:
+                pass
+        return self.fetch(url, stream=True).content
+
+class RaceMirrorSpider(Spider):
+    def init(self, extend=""):
+        pass
+
+    def media(self, urls):
+        return b''.join(self.relay(self.race(urls)))
+
+def benchRace(rounds=10):
+    servers = [startServer(MirrorHandler) for _ in range(3)]
+    urls = [f'{servers[0][1]}/slow/seg.m4s', f'{servers[1][1]}/down/seg.m4s', f'{servers[2][1]}/fast/seg.m4s']
+    try:
+        for sp in [SequentialMirrorSpider(), RaceMirrorSpider()]:
+            MirrorHandler.hits = 0
+            first = timeit(lambda i: sp.media(urls), 1)
+            rest = timeit(lambda i: sp.media(urls), rounds - 1)
+            print(f'{type(sp).__name__}: 首个 Range {first * 1000:.0f}ms  之后 {rest / (rounds - 1) * 1000:.0f}ms/次  '
+                  f'上游请求 {MirrorHandler.hits}')
+    finally:
+        for server, _ in servers:
+            server.shutdown()
+
+class RangeHandler(StandInHandler):
+    # 带 80ms 延迟、支持 Range 的媒体 CDN; /playurl 返回 B 站格式的 dash 信息
+    delay = 0.08
+    media = bytes(range(256)) * 4096
+    hits = 0
+
+    def do_GET(self):
+        if self.path.startswith('/playurl'):
+            host = f'http://127.0.0.1:{self.server.server_address[1]}'
+            rep = lambda kind, i: {'id': 80 - i, 'baseUrl': f'{host}/{kind}{i}.m4s?deadline={int(time.time()) + 3600}',
+                                   'backupUrl': [], 'codecs': 'avc1', 'bandwidth': 1000, 'frameRate': '25',
+                                   'height': 1080, 'width': 1920,
+                                   'SegmentBase': {'Initialization': '0-927', 'indexRange': '928-2999'}}
+            dash = {'duration': 60, 'minBufferTime': 1.5, 'video': [rep('v', i) for i in range(4)],
+                    'audio': [rep('a', i) for i in range(2)]}
+            self.body = json.dumps({'code': 0, 'data': {'dash': dash}}).encode()
+            return super().do_GET()
+        RangeHandler.hits += 1
+        time.sleep(self.delay)
+        first, last = map(int, self.headers['Range'][6:].split('-'))
+        body = self.media[first:last + 1]
+        self.send_response(206)
+        self.send_header('Content-Range', f'bytes {first}-{last}/{len(self.media)}')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def benchDashWarm(rounds=5):
+    from base.loader import loadPlugin
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'aowuplugin', 'py_bilibilivd.py')
+    sp = loadPlugin(path, 'py_bilibilivd').Spider()
+    sp.init('')
+    prewarm = sp.prewarmRanges
+    server, base = startServer(RangeHandler)
+    event = Event()
+    Thread(target=local.serveForever, args=(event,), daemon=True).start()
+    time.sleep(0.3)
+    try:
+        for name, warm in [('逐段回源', False), ('生成 MPD 时预取', True)]:
+            sp.prewarmRanges = prewarm if warm else (lambda *args: None)
+            costs = []
+            for n in range(rounds):
+                params = {'aid': f'{name}{n}', 'cid': '1', 'url': f'{base}/playurl', 'cookies': '{}'}
+                start = time.perf_counter()
+                sp.localProxy(dict(params, type='mpd'))
+                # 播放器起播: 选中的视频/音频各取 Initialization 与 indexRange
+                for kind in ['videoid', 'audioid']:
+                    for r in ['bytes=0-927', 'bytes=928-2999']:
+                        body = sp.localProxy(dict(params, type='media', range=r, **{kind: '0'}))[2]
+                        body if isinstance(body, bytes) else b''.join(body)
+                costs.append(time.perf_counter() - start)
+            print(f'{name}: 起播前准备 {sum(costs) / rounds * 1000:.0f}ms')
+    finally:
+        event.set()
+        server.shutdown()
+
+class CoverHandler(StandInHandler):
+    # 与 51吸瓜 相同的 AES-CBC 加密封面, 40ms 延迟
+    delay = 0.04
+    hits = 0
+
+    def do_GET(self):
+        from Crypto.Cipher import AES
+        from Crypto.Util.Padding import pad
+        CoverHandler.hits += 1
+        time.sleep(self.delay)
+        image = self.path.encode() * 4000
+        self.body = AES.new(b'f5d965df75336270', AES.MODE_CBC, b'97b60394abc2fbe1').encrypt(pad(image, 16))
+        super().do_GET()
+
+class CoverSpider(Spider):
+    host = ''
+    cached = False
+
+    def init(self, extend=""):
+        pass
+
+    def categoryContent(self, tid, pg, filter, extend):
+        videos = [{'vod_id': str(i), 'vod_pic': f'http://127.0.0.1:9978/proxy?do=py&url={self.host}/cover/{tid}/{i}.jpg&type=img'}
+                  for i in range(30)]
+        if self.cached:
+            self.prefetchImages(videos, self.coverImage)
+        return {'list': videos}
+
+    def localProxy(self, param):
+        if self.cached:
+            return self.cachedImage(param['url'], self.coverImage)
+        return [200, *reversed(self.coverImage(param['url']))]
+
+    def coverImage(self, url):
+        from Crypto.Cipher import AES
+        from Crypto.Util.Padding import unpad
+        res = self.fetch(url, timeout=10)
+        return unpad(AES.new(b'f5d965df75336270', AES.MODE_CBC, b'97b60394abc2fbe1').decrypt(res.content), 16), 'image/jpeg'
+
+def benchImages():
+    from base import images
+    images._pipeline = images.ImagePipeline(images.ImageCache(tempfile.mkdtemp()))
+    server, base = startServer(CoverHandler)
+    sp = CoverSpider()
+    sp.host = base
+    try:
+        for cached in [False, True]:
+            sp.cached = cached
+            CoverHandler.hits = 0
+            costs = []
+            for visit in range(2):
+                # 播放器拿到列表后按宫格顺序逐张请求封面
+                start = time.perf_counter()
+                for vod in sp.categoryContent('1', '1', False, {})['list']:
+                    sp.localProxy({'url': vod['vod_pic'].split('url=')[1].split('&type')[0]})
+                costs.append(time.perf_counter() - start)
+            print(f'{"磁盘缓存+预取" if cached else "逐张解密"}: 首次 {costs[0] * 1000:.0f}ms  再次进入 {costs[1] * 1000:.0f}ms  '
+                  f'上游 {CoverHandler.hits}')
+        print(images.pipeline().cache.info())
+    finally:
+        server.shutdown()
+
+class PosterHandler(StandInHandler):
+    # 1500x2200 的高清海报, 约 2.5MB
+    body = b''
+    hits = 0
+
+    def do_GET(self):
+        PosterHandler.hits += 1
+        if self.path.startswith('/captcha'):
+            # 防盗链/验证码页: 200 text/html
+            self.mime, self.body = 'text/html', b'<html><body>captcha</body></html>'
+            return super().do_GET()
+        self.mime = 'image/jpeg'
+        if not PosterHandler.body:
+            from PIL import Image
+            image = Image.effect_noise((1500, 2200), 60).convert('RGB')
+            out = io.BytesIO()
+            image.save(out, 'JPEG', quality=92)
+            PosterHandler.body = out.getvalue()
+        self.body = PosterHandler.body
+        super().do_GET()
+
+class ThumbSpider(Spider):
+    def init(self, extend=""):
+        pass
+
+def benchThumbs(rounds=20):
+    from PIL import Image
+    from urllib.parse import urlparse, parse_qsl
+    from base import images
+    images._pipeline = images.ImagePipeline(images.ImageCache(tempfile.mkdtemp()))
+    server, base = startServer(PosterHandler)
+    sp = ThumbSpider()
+    try:
+        def decode(data):
+            start = time.perf_counter()
+            Image.open(io.BytesIO(data)).load()
+            return time.perf_counter() - start
+        original = requests.get(f'{base}/poster.jpg').content
+        print(f'原图: {len(original) / 1024:.0f}KB  解码 {min(decode(original) for _ in range(5)) * 1000:.1f}ms')
+        for i in range(2):
+            vod = sp.thumbs([{'vod_pic': f'{base}/poster.jpg'}])[0]
+            params = dict(parse_qsl(urlparse(vod['vod_pic']).query))
+            costs = []
+            for _ in range(1 if i == 0 else rounds):
+                start = time.perf_counter()
+                code, mime, data = sp.localProxy(params)[:3]
+                costs.append(time.perf_counter() - start)
+            print(f'缩略图{"(首次缩放)" if i == 0 else "(缓存)"}: {len(data) / 1024:.0f}KB {mime}  '
+                  f'代理耗时 {min(costs) * 1000:.1f}ms  解码 {min(decode(data) for _ in range(5)) * 1000:.1f}ms')
+        hits = PosterHandler.hits
+        page = dict(parse_qsl(urlparse(sp.thumb(f'{base}/captcha.jpg')).query))
+        codes = [sp.localProxy(page)[0] for _ in range(3)]
+        forged = dict(params, url=f'{base}/captcha.jpg')
+        print(f'HTML 页: {codes} 上游 {PosterHandler.hits - hits}  伪造地址: {sp.localProxy(forged)[0]}')
+        print(f'上游 {PosterHandler.hits}', images.pipeline().cache.info())
+    finally:
+        server.shutdown()
+
+class KeyHandler(StandInHandler):
+    # 与 浴火社APP 相同: 带 authdog 令牌取 16 字节 AES 密钥, 40ms 延迟; token 变化模拟令牌轮换
+    delay = 0.04
+    token = 't1'
+    hits = 0
+
+    def do_GET(self):
+        KeyHandler.hits += 1
+        time.sleep(self.delay)
+        if self.headers.get('authdog') != KeyHandler.token:
+            self.body = b'{"code":401}'
+        else:
+            self.body = self.path.encode().ljust(16, b'k')[:16]
+        super().do_GET()
+
+class KeySpider(Spider):
+    host = ''
+    cached = False
+    token = 't1'
+
+    def init(self, extend=""):
+        pass
+
+    def localProxy(self, param):
+        url = f'{self.host}/api/v1/video/key/{param["id"]}'
+        if not self.cached:
+            return [200, 'application/octet-stream', self.fetch(url, headers={'authdog': self.token}).content]
+        try:
+            return self.cachedKey(url, lambda: self.fetchKey(url), param['id'])
+        except Exception:
+            self.token = KeyHandler.token
+            self.invalidateKeys()
+        return self.cachedKey(url, lambda: self.fetchKey(url), param['id'])
+
+    def fetchKey(self, url):
+        res = self.fetch(url, headers={'authdog': self.token})
+        if res.status_code != 200 or len(res.content) != 16:
+            raise Exception(f'key {res.status_code}')
+        return res.content, 'application/octet-stream'
+
+def benchKeys(reloads=20, seeks=8):
+    server, base = startServer(KeyHandler)
+    sp = KeySpider()
+    sp.host = base
+    try:
+        for cached in [False, True]:
+            sp.cached, sp.token, KeyHandler.token, KeyHandler.hits = cached, 't1', 't1', 0
+            start = time.perf_counter()
+            # 直播列表每次刷新播放器都重新请求一次密钥
+            for _ in range(reloads):
+                assert len(sp.localProxy({'id': '42'})[2]) == 16
+            reload = time.perf_counter() - start
+            # 拖动进度: 多个分片下载线程同时请求同一密钥
+            start = time.perf_counter()
+            with ThreadPoolExecutor(seeks) as pool:
+                list(pool.map(lambda _: sp.localProxy({'id': '43'}), range(seeks)))
+            seek = time.perf_counter() - start
+            # 令牌轮换: 插件重新 init 时旧密钥作废, 下一次请求用新令牌回源
+            KeyHandler.token = sp.token = 't2'
+            sp.invalidateKeys()
+            hits = KeyHandler.hits
+            rotated = sp.localProxy({'id': '42'})[2]
+            print(f'{"密钥缓存" if cached else "每次回源"}: {reloads} 次刷新 {reload * 1000:.0f}ms  '
+                  f'{seeks} 路并发 {seek * 1000:.0f}ms  上游 {hits}  轮换后回源 {KeyHandler.hits - hits} 次 {len(rotated)}B')
+        print(sp.cacheStats()['keys'])
+    finally:
+        server.shutdown()
+
+class JsonRouteSpider(Spider):
+    # homeContent 筛选 JSON (30 个分类 x 5 组筛选) 与 1500 片段的点播 m3u8
+    filters = json.dumps({str(t): [{'key': k, 'name': f'筛选{k}', 'value': [{'n': f'选项{k}{i}', 'v': f'{k}_{i}'} for i in range(40)]}
+                                   for k in ['class', 'area', 'year', 'lang', 'by']] for t in range(30)}, ensure_ascii=False)
+    playlist = '#EXTM3U\n#EXT-X-TARGETDURATION:6\n' + ''.join(
+        f'#EXTINF:6.000,\nhttp://127.0.0.1:9978/proxy?do=py&type=ts&url=https%3A%2F%2Fcdn.example.com%2Fhls%2F{i:05d}.ts\n'
+        for i in range(1500)) + '#EXT-X-ENDLIST\n'
+
+    def init(self, extend=""):
+        pass
+
+    def localProxy(self, param):
+        if param['type'] == 'home':
+            return [200, 'application/json; charset=utf-8', self.filters]
+        if param['type'] == 'm3u8':
+            return [200, 'application/vnd.apple.mpegurl', self.playlist]
+        # 分批生成的大 JSON, 长度未知, 走 chunked
+        return [200, 'application/json', (self.filters[i:i + 65536] for i in range(0, len(self.filters), 65536))]
+
+def benchGzip(rounds=50, mbps=20):
+    port = freePort()
+    server = local.ThreadedHTTPServer(('127.0.0.1', port), local.ProxyServer)
+    Thread(target=server.serve_forever, daemon=True).start()
+    local.plugin = JsonRouteSpider()
+    local.cache.set('filters', JsonRouteSpider.filters)
+    routes = [('home 筛选', 'proxy?do=py&type=home'), ('m3u8', 'proxy?do=py&type=m3u8'),
+              ('流式 JSON', 'proxy?do=py&type=stream'), ('do=get 缓存', 'cache?do=get&key=filters')]
+    try:
+        for name, path in routes:
+            line = []
+            for encoding in ['identity', 'gzip']:
+                session = requests.Session()
+                session.headers['Accept-Encoding'] = encoding
+                url = f'http://127.0.0.1:{port}/{path}'
+                start = time.perf_counter()
+                for _ in range(rounds):
+                    rsp = session.get(url, stream=True)
+                    wire = len(rsp.raw.read(decode_content=False))
+                    rsp.close()
+                cost = (time.perf_counter() - start) / rounds
+                assert len(session.get(url).content) > 10000
+                # 回环上测不出带宽差异, 另按 mbps 估算局域网传输时间
+                line.append(f'{encoding} {wire / 1024:.0f}KB {cost * 1000:.2f}ms (+{wire * 8 / mbps / 1000:.0f}ms@{mbps}Mbps)')
+            print(f'{name}: ' + '  '.join(line))
+    finally:
+        local.plugin = None
+        server.shutdown()
+
+class HostHandler(StandInHandler):
+    delay = 0
+
+    def do_HEAD(self):
+        time.sleep(self.delay)
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        super().do_GET()
+
+def hostLate(urls):
+    # 旧 host_late: 每个镜像一个线程 HEAD 1 秒超时, 等全部结束取最小值
+    results, threads = {}, []
+    def test_host(url):
+        try:
+            start_time = time.time()
+            requests.head(url, timeout=1.0, allow_redirects=False)
+            results[url] = (time.time() - start_time) * 1000
+        except Exception:
+            results[url] = float('inf')
+    for url in urls:
+        t = threading.Thread(target=test_host, args=(url,))
+        threads.append(t)
+        t.start()
+    for t in threads:
+        t.join()
+    return min(results.items(), key=lambda x: x[1])[0]
+
+class MirrorPluginSpider(Spider):
+    hosts = []
+
+    def init(self, extend=""):
+        self.host = self.pickHost(self.hosts)
+
+def benchMirrors(inits=10):
+    import socket
+    servers = [startServer(type('Host', (HostHandler,), {'delay': d})) for d in [0.02, 0.08, 0.15, 0.3]]
+    # 只 listen 不 accept 的黑洞镜像: 连得上但永远不响应
+    hole = socket.socket()
+    hole.bind(('127.0.0.1', 0))
+    hole.listen(16)
+    hosts = [base for _, base in reversed(servers)] + [f'http://127.0.0.1:{hole.getsockname()[1]}']
+    delays = dict(zip(hosts, ['300ms', '150ms', '80ms', '20ms', '黑洞']))
+    MirrorPluginSpider.hosts = hosts
+    try:
+        start = time.perf_counter()
+        for _ in range(inits):
+            hostLate(hosts)
+        print(f'host_late: {inits} 次 init {(time.perf_counter() - start) * 1000:.0f}ms')
+        sp = MirrorPluginSpider()
+        costs = []
+        for _ in range(inits):
+            start = time.perf_counter()
+            sp.init()
+            costs.append(time.perf_counter() - start)
+        print(f'pickHost: {inits} 次 init {sum(costs) * 1000:.0f}ms  首次 {costs[0] * 1000:.0f}ms  之后 {max(costs[1:]) * 1000:.2f}ms  '
+              f'胜出 {delays[sp.host]}')
+        # 浏览一会儿后胜出镜像宕机(其余镜像的探测已在后台完成): 下一次请求立即切到次优镜像
+        time.sleep(0.5)
+        servers[0][0].shutdown()
+        servers[0][0].server_close()
+        sp.closeSessions()
+        start = time.perf_counter()
+        rsp = sp.fetch(f'{sp.host}/api/list', timeout=1)
+        print(f'胜者宕机后请求: {rsp.status_code} {(time.perf_counter() - start) * 1000:.0f}ms  '
+              f'切换到 {delays[sp.host]}', sp.cacheStats()['mirrors'])
+    finally:
+        hole.close()
+        for server, _ in servers[1:]:
+            server.shutdown()
+
+class DohHandler(StandInHandler):
+    # 线路域名 CNAME 到接口域名, 再给出地址记录; 名字都用压缩指针, 与真实 DoH 应答一致
+    delay = 0.03
+    hits = 0
+    slowTypes = ()  # 这些记录类型的查询超过解析器超时才应答
+    chain = {'bfm11as9f.fuqiyun.cn': 'api7.bench.test'}
+    addresses = {'api7.bench.test': '127.0.0.1'}
+
+    def do_GET(self):
+        import base64
+        import struct
+        import socket
+        from urllib.parse import urlparse, parse_qs
+        from base import doh
+        DohHandler.hits += 1
+        time.sleep(self.delay)
+        query = base64.urlsafe_b64decode(parse_qs(urlparse(self.path).query)['dns'][0] + '==')
+        name, end = doh.readName(query, 12)
+        qtype = struct.unpack_from('>H', query, end)[0]
+        if qtype in self.slowTypes:
+            time.sleep(3.5)
+        if self.delay > 0.3:
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        answers, owner, target = [], 0xC00C, name
+        if target in self.chain:
+            target = self.chain[target]
+            rdata = b''.join(bytes([len(p)]) + p.encode() for p in target.split('.')) + b'\x00'
+            answers.append(struct.pack('>HHHIH', owner, 5, 1, 600, len(rdata)) + rdata)
+            owner = 0xC000 | (end + 4 + 12)  # 指向上一条 CNAME 的 rdata
+        if target in self.addresses:
+            ip = self.addresses[target]
+            rdata = socket.inet_aton(ip) if qtype == 1 else socket.inet_pton(socket.AF_INET6, '::ffff:' + ip)
+            answers.append(struct.pack('>HHHIH', owner, qtype, 1, 300, len(rdata)) + rdata)
+        self.body = struct.pack('>HHHHHH', 0, 0x8180, 1, len(answers), 0, 0) + query[12:end + 4] + b''.join(answers)
+        super().do_GET()
+
+def legacyGethost(server):
+    # 旧 火车太顺APP.gethost: 固定查询报文, 从偏移 12 读名字(实为问题段, 读不到 CNAME)
+    response = requests.get(server, headers={'Accept': 'application/dns-message'},
+                            params={'dns': 'AAABAAABAAAAAAAACWJmbTExYXM5ZgdmdXFpeXVuAmNuAAAcAAE'})
+    data, offset, parts = response.content, 12, []
+    while data[offset]:
+        parts.append(data[offset + 1:offset + 1 + data[offset]].decode('utf-8'))
+        offset += 1 + data[offset]
+    return '.'.join(parts)
+
+class DohSpider(Spider):
+    # 与 火车太顺APP.gethost 相同: 以查询的域名作为 host, 只把连接固定到 DoH 解析出的 IP
+    def init(self, extend=""):
+        self.host = 'bfm11as9f.fuqiyun.cn'
+        if self.addresses(self.host):
+            self.dohHosts = [self.host]
+
+class HostEchoHandler(StandInHandler):
+    host = None
+
+    def do_GET(self):
+        HostEchoHandler.host = self.headers.get('Host')
+        super().do_GET()
+
+def benchDoh(inits=10):
+    from base import doh
+    servers = [startServer(type('Doh', (DohHandler,), {'delay': d})) for d in [0.03, 0.12, 0.5]]
+    api, apiBase = startServer(HostEchoHandler)
+    # 与 box.json 的 doh 配置同格式: 服务器域名系统 DNS 解析不到, 只能经 ips 连接
+    config = [{'name': f'dns{i}', 'url': f'http://dns{i}.bench.test:{base.rsplit(":", 1)[1]}/dns-query', 'ips': ['127.0.0.1']}
+              for i, (_, base) in enumerate(servers)]
+    doh.resolver = doh.Resolver()
+    doh.resolver.configure(config)
+    try:
+        start = time.perf_counter()
+        for _ in range(inits):
+            host = legacyGethost(f'{servers[1][1]}/dns-query')
+        print(f'旧 gethost: {inits} 次 init {(time.perf_counter() - start) * 1000:.0f}ms  得到 {host}')
+        DohHandler.hits = 0
+        sp, costs = DohSpider(), []
+        for _ in range(inits):
+            start = time.perf_counter()
+            sp.init()
+            costs.append(time.perf_counter() - start)
+        print(f'DoH 解析器(box.json 配置): {inits} 次 init {sum(costs) * 1000:.0f}ms  首次 {costs[0] * 1000:.0f}ms  '
+              f'之后 {max(costs[1:]) * 1000:.2f}ms  得到 {sp.host} dohHosts={sp.dohHosts}  DoH 请求 {DohHandler.hits}')
+        # 线路域名系统 DNS 解析不到本机; fetch 经 DoH 连接到 CNAME 末端的 127.0.0.1, Host 仍是线路域名
+        url = f'http://{sp.host}:{apiBase.rsplit(":", 1)[1]}/api/v1/app/config'
+        rsp = sp.fetch(url)
+        print(f'fetch http://{sp.host}/...: {rsp.status_code} 上游收到 Host={HostEchoHandler.host}',
+              sp.cacheStats()['doh'])
+        # 固定 IP 只作用于设置了 dohHosts 的插件的会话, 其他插件访问同一域名仍走系统 DNS
+        try:
+            BenchSpider().fetch(url, timeout=2)
+            print('其他插件: 也连上了 (固定 IP 泄漏到全局)')
+        except requests.ConnectionError:
+            print('其他插件: 系统 DNS 解析失败, 未受 dohHosts 影响')
+        # AAAA 查询超时不耽误 A 记录
+        DohHandler.slowTypes = (28,)
+        doh.resolver.clear()
+        fresh = DohSpider()
+        fresh.dohHosts = []
+        start = time.perf_counter()
+        fresh.init()
+        print(f'AAAA 超时时 init: {(time.perf_counter() - start) * 1000:.0f}ms  dohHosts={fresh.dohHosts}')
+    finally:
+        DohHandler.slowTypes = ()
+        for server, _ in servers + [(api, apiBase)]:
+            server.shutdown()
+
+class HandshakeServer(StandInServer):
+    # 模拟移动网络: 建连(DNS + TCP + TLS 共约 3 个 RTT)150ms, 请求本身一个 RTT 50ms
+    setup = 0.15
+
+    def get_request(self):
+        time.sleep(self.setup)
+        return super().get_request()
+
+class WarmHandler(StandInHandler):
+    def do_GET(self):
+        time.sleep(0.05)
+        super().do_GET()
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+class WarmPluginSpider(Spider):
+    base = ''
+
+    def init(self, extend=""):
+        self.host = self.base
+
+    def homeContent(self, filter):
+        return self.fetch(f'{self.host}/api/v1/home').json()
+
+def benchWarm(rounds=5, idle=0.3):
+    # 受信任的自签证书, fetch 与预建连都按默认 verify=True 校验, 落在同一个连接池
+    folder = tempfile.mkdtemp()
+    cert, key = os.path.join(folder, 'cert.pem'), os.path.join(folder, 'key.pem')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1', '-subj', '/CN=127.0.0.1',
+                    '-addext', 'subjectAltName=IP:127.0.0.1', '-keyout', key, '-out', cert], check=True, capture_output=True)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    os.environ['REQUESTS_CA_BUNDLE'] = cert
+    sp = WarmPluginSpider()
+    try:
+        for warm in [False, True]:
+            sp.warmAttrs = ('host',) if warm else ()
+            costs = []
+            for _ in range(rounds):
+                server = HandshakeServer(('127.0.0.1', 0), WarmHandler)
+                server.socket = context.wrap_socket(server.socket, server_side=True)
+                Thread(target=server.serve_forever, daemon=True).start()
+                WarmPluginSpider.base = f'https://127.0.0.1:{server.server_address[1]}'
+                sp.closeSessions()
+                sp.init()
+                # 用户看到首页前的空档
+                time.sleep(idle)
+                start = time.perf_counter()
+                sp.homeContent(False)
+                costs.append(time.perf_counter() - start)
+                server.shutdown()
+            print(f'{"init 预建连" if warm else "不预热"}: 首个 homeContent 平均 {sum(costs) / rounds * 1000:.0f}ms')
+    finally:
+        del os.environ['REQUESTS_CA_BUNDLE']
+
+class SearchPageHandler(StandInHandler):
+    # 镜像站搜索页: 1MB 页面, 关键字在开头附近; delay 为该镜像的响应延迟
+    delay = 0
+    hits = 0
+    body = b'<html><div class="search-stat">ok</div>' + b'x' * (1024 * 1024)
+
+    def do_GET(self):
+        SearchPageHandler.hits += 1
+        time.sleep(self.delay)
+        super().do_GET()
+
+def legacyBestUrl(urls, keyword, timeout):
+    # 旧 upurl.get_best_url: 每个URL新建会话、读完整个响应体, 每个站点一个不限大小的线程池
+    def test(url):
+        session = requests.Session()
+        try:
+            response = session.get(url, timeout=timeout, verify=False)
+            if response.status_code == 200:
+                return url, response.elapsed.total_seconds(), keyword in response.text
+        except requests.RequestException:
+            pass
+        return None
+    with ThreadPoolExecutor() as executor:
+        candidates = [r for r in executor.map(test, urls) if r]
+    return sorted(candidates, key=lambda x: (-x[2], x[1]))[0][0] if candidates else None
+
+def benchUpurl(siteCount=6, mirrorsPerSite=5):
+    import socket
+    import asyncio
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'aowuplugin'))
+    with contextlib.redirect_stdout(io.StringIO()):
+        import upurl
+    delays = [0.4, 0.25, 0.05, 0.6, 0.15]
+    servers, sites = [], {}
+    hole = socket.socket()
+    hole.bind(('127.0.0.1', 0))
+    hole.listen(64)
+    for n in range(siteCount):
+        name = f'站点{n}'
+        urls = []
+        for d in delays[:mirrorsPerSite]:
+            server, base = startServer(type('Search', (SearchPageHandler,), {'delay': d}))
+            servers.append(server)
+            urls.append(base)
+        sites[name] = urls + [f'http://127.0.0.1:{hole.getsockname()[1]}']
+        upurl.search_path_config[name] = '/search?wd=test'
+        upurl.keyword_required_sites[name] = 'class="search-stat"'
+    upurl.probe_config['timeout'] = 2
+    try:
+        SearchPageHandler.hits = 0
+        start = time.perf_counter()
+        old = {name: legacyBestUrl([u + '/search?wd=test' for u in urls], 'class="search-stat"', 2)
+               for name, urls in sites.items()}
+        print(f'旧实现(站点串行, 读完整页): {(time.perf_counter() - start) * 1000:.0f}ms  请求 {SearchPageHandler.hits}  '
+              f'读取 {SearchPageHandler.hits}MB')
+        read = [0]
+        iterContent = requests.Response.iter_content
+        def counted(self, *args, **kwargs):
+            for chunk in iterContent(self, *args, **kwargs):
+                read[0] += len(chunk)
+                yield chunk
+        requests.Response.iter_content = counted
+        for cap in [32, 8]:
+            upurl.probe_config['max_concurrency'] = cap
+            SearchPageHandler.hits, read[0] = 0, 0
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                probed = asyncio.run(upurl.probe_sites(sites))
+                new = {name: upurl.select_best(probed[name], name) for name in sites}
+            print(f'asyncio 流水线(并发上限 {cap}): {(time.perf_counter() - start) * 1000:.0f}ms  请求 {SearchPageHandler.hits}  '
+                  f'读取 {read[0] / 1024:.0f}KB  选中最快镜像 {sum(new[n] == sites[n][2] for n in sites)}/{siteCount}  '
+                  f'低于提前结束阈值 {sum(c["url"] == new[n] and c["latency"] < 1 for n in sites for c in probed[n])}/{siteCount}')
+        requests.Response.iter_content = iterContent
+        print(f'旧实现选中最快镜像 {sum(old[n] == sites[n][2] + "/search?wd=test" for n in sites)}/{siteCount}')
+    finally:
+        hole.close()
+        for server in servers:
+            server.shutdown()
+
+def benchHistory(siteCount=6, mirrorsPerSite=5):
+    import socket
+    from urllib.parse import urlparse
+    import asyncio
+    import tempfile
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'aowuplugin'))
+    with contextlib.redirect_stdout(io.StringIO()):
+        import upurl
+    delays = [0.4, 0.25, 0.05, 0.6, 0.15]
+    servers, sites = [], {}
+    hole = socket.socket()
+    hole.bind(('127.0.0.1', 0))
+    hole.listen(64)
+    for n in range(siteCount):
+        name = f'站点{n}'
+        urls = []
+        for d in delays[:mirrorsPerSite]:
+            server, base = startServer(type('Search', (SearchPageHandler,), {'delay': d}))
+            servers.append(server)
+            urls.append(base)
+        sites[name] = urls + [f'http://127.0.0.1:{hole.getsockname()[1]}']
+        upurl.search_path_config[name] = '/search?wd=test'
+        upurl.keyword_required_sites[name] = 'class="search-stat"'
+    upurl.probe_config['timeout'] = 2
+    upurl.file_path_config['output_dir'] = tempfile.mkdtemp()
+
+    def run(label):
+        SearchPageHandler.hits = 0
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            history = upurl.load_history()
+            probed = asyncio.run(upurl.probe_sites(sites, history))
+            upurl.save_history(history, sites)
+            best = {name: upurl.select_best(probed[name], name) for name in sites}
+        print(f'{label}: {(time.perf_counter() - start) * 1000:.0f}ms  请求 {SearchPageHandler.hits}  '
+              f'选中 {sorted({urlparse(u).port for u in best.values()})}')
+        return best
+
+    try:
+        run('首次(无历史)')
+        run('常规(历史新鲜)')
+        fastest = sites['站点0'][2]
+        servers[2].shutdown()
+        servers[2].server_close()
+        run('镜像下线后首轮')
+        run('镜像下线后次轮')
+        path = upurl.get_file_path(upurl.history_config['file'], is_input=False)
+        with open(path, encoding='utf-8') as f:
+            history = json.load(f)
+        for urls in history.values():
+            for samples in urls.values():
+                for sample in samples:
+                    sample[0] -= upurl.history_config['fresh_seconds'] + 1
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(history, f)
+        run('历史过期')
+        print('站点0 学习权重: ' + ', '.join(f'{urlparse(u).port}={upurl.learned_weight("站点0", u, s)}'
+                                         for u, s in history['站点0'].items()) + f'  (下线的 {urlparse(fastest).port})')
+        print(f'历史文件 {os.path.getsize(path)} 字节')
+    finally:
+        hole.close()
+        for server in servers:
+            server.shutdown()
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['loadall']:
+        loadAll(sys.argv[2])
+        sys.exit()
+    benches = {'pool': benchPool, 'proxy': benchProxy, 'async': benchAsync, 'coalesce': benchCoalesce,
+               'httpcache': benchHttpCache, 'loader': benchLoader,
+               'metrics': benchMetrics, 'replay': benchReplay,
+               'stream': benchStream, 'hls': benchHls,
+               'prefetch': benchPrefetch, 'liveedge': benchLiveEdge, 'race': benchRace,
+               'dashwarm': benchDashWarm, 'images': benchImages,
+               'thumbs': benchThumbs, 'keys': benchKeys, 'gzip': benchGzip,
+               'mirrors': benchMirrors, 'doh': benchDoh,
+               'warm': benchWarm, 'upurl': benchUpurl, 'history': benchHistory}
+    for name in sys.argv[1:] or benches:
+        print(f'== {name} ==')
+        benches[name]()
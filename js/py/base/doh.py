@@ -0,0 +1,300 @@
+import time
+import base64
+import socket
+import struct
+import random
+import requests
+from threading import Lock
+from ipaddress import IPv6Address
+from collections import OrderedDict
+from urllib.parse import urlparse
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait as waitFutures
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import HTTPError
+
+types = {'A': 1, 'NS': 2, 'CNAME': 5, 'SOA': 6, 'PTR': 12, 'MX': 15, 'TXT': 16, 'AAAA': 28, 'SRV': 33, 'HTTPS': 65}
+typeNames = {v: k for k, v in types.items()}
+# box.json 中 doh 列表里的国内服务器; 配置了 box.json 时由 resolver.configure 换成其中的完整列表
+defaultServers = ['https://dns.alidns.com/dns-query', 'https://doh.pub/dns-query', 'https://doh.360.cn/dns-query']
+
+class DnsError(Exception):
+    pass
+
+def buildQuery(name, qtype='A', id=0):
+    # RFC 8484 建议 GET 查询的 id 置 0, 便于 HTTP 缓存; RD=1, 一个问题
+    qtype = types.get(qtype, qtype) if isinstance(qtype, str) else qtype
+    labels = b''.join(bytes([len(p)]) + p for p in name.rstrip('.').encode('idna').split(b'.') if p)
+    return struct.pack('>HHHHHH', id, 0x0100, 1, 0, 0, 0) + labels + b'\x00' + struct.pack('>HH', qtype, 1)
+
+def readName(data, offset):
+    # 返回 (域名, 名字之后的偏移); 支持压缩指针, 指针只能往前跳, 防止循环
+    labels, end, start = [], None, offset
+    while True:
+        if offset >= len(data):
+            raise DnsError('name out of range')
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            pointer = struct.unpack_from('>H', data, offset)[0] & 0x3FFF
+            if pointer >= start:
+                raise DnsError('bad compression pointer')
+            end = offset + 2 if end is None else end
+            offset = start = pointer
+            continue
+        offset += 1
+        if length == 0:
+            break
+        labels.append(data[offset:offset + length].decode('utf-8', 'replace'))
+        offset += length
+    return '.'.join(labels), offset if end is None else end
+
+def readRecord(data, offset):
+    name, offset = readName(data, offset)
+    rtype, rclass, ttl, length = struct.unpack_from('>HHIH', data, offset)
+    offset += 10
+    rdata, value = data[offset:offset + length], None
+    if rtype == 1 and length == 4:
+        value = socket.inet_ntoa(rdata)
+    elif rtype == 28 and length == 16:
+        value = str(IPv6Address(rdata))
+    elif rtype in (2, 5, 12):
+        value = readName(data, offset)[0]
+    elif rtype == 15:
+        value = (struct.unpack_from('>H', data, offset)[0], readName(data, offset + 2)[0])
+    elif rtype == 16:
+        parts, i = [], 0
+        while i < length:
+            parts.append(rdata[i + 1:i + 1 + rdata[i]].decode('utf-8', 'replace'))
+            i += 1 + rdata[i]
+        value = ''.join(parts)
+    elif rtype == 6:
+        mname, i = readName(data, offset)
+        rname, i = readName(data, i)
+        value = (mname, rname) + struct.unpack_from('>IIIII', data, i)
+    elif rtype == 33:
+        priority, weight, port = struct.unpack_from('>HHH', data, offset)
+        value = (priority, weight, port, readName(data, offset + 6)[0])
+    else:
+        value = rdata
+    return {'name': name.lower(), 'type': typeNames.get(rtype, rtype), 'ttl': ttl, 'value': value}, offset + length
+
+def parseMessage(data):
+    if len(data) < 12:
+        raise DnsError('short message')
+    id, flags, qd, an, ns, ar = struct.unpack_from('>HHHHHH', data, 0)
+    offset, questions = 12, []
+    for _ in range(qd):
+        name, offset = readName(data, offset)
+        questions.append((name.lower(), typeNames.get(struct.unpack_from('>H', data, offset)[0])))
+        offset += 4
+    sections = []
+    for count in (an, ns):
+        records = []
+        for _ in range(count):
+            record, offset = readRecord(data, offset)
+            records.append(record)
+        sections.append(records)
+    return {'id': id, 'rcode': flags & 0xF, 'truncated': bool(flags & 0x200), 'questions': questions,
+            'answers': sections[0], 'authority': sections[1]}
+
+class Answer:
+    __slots__ = ('name', 'qtype', 'canonical', 'values', 'ttl', 'rcode')
+
+    def __init__(self, name, qtype, canonical, values, ttl, rcode):
+        self.name = name
+        self.qtype = qtype
+        self.canonical = canonical  # 沿 CNAME 链走到底的名字, 没有 CNAME 时等于 name
+        self.values = values
+        self.ttl = ttl
+        self.rcode = rcode
+
+    def __repr__(self):
+        return f'Answer({self.name} {self.qtype} -> {self.canonical} {self.values} ttl={self.ttl})'
+
+def follow(message, name, qtype, depth=8):
+    # 在应答段里沿 CNAME 链查找, 返回 (规范名, 记录值, 最小 TTL, 链是否完整)
+    records, current, ttl = message['answers'], name.lower().rstrip('.'), None
+    for _ in range(depth):
+        values = [r for r in records if r['name'] == current and r['type'] == qtype]
+        if values:
+            ttl = min([ttl or values[0]['ttl']] + [r['ttl'] for r in values])
+            return current, [r['value'] for r in values], ttl, True
+        cname = next((r for r in records if r['name'] == current and r['type'] == 'CNAME'), None)
+        if cname is None:
+            break
+        ttl = cname['ttl'] if ttl is None else min(ttl, cname['ttl'])
+        current = cname['value'].lower()
+    # NXDOMAIN/空应答按 SOA 的 minimum 做否定缓存
+    soa = next((r for r in message['authority'] if r['type'] == 'SOA'), None)
+    negative = min(soa['ttl'], soa['value'][6]) if soa else 60
+    return current, [], negative if ttl is None else min(ttl, negative), current == name.lower().rstrip('.')
+
+class Resolver:
+    """
+    DNS-over-HTTPS 解析器: 多个 DoH 服务器并发查询, 先返回的有效应答胜出.
+    结果按记录 TTL 缓存(含否定缓存), 相同查询在途时共用一次请求.
+    """
+
+    def __init__(self, servers=None, timeout=3, minTtl=10, maxTtl=86400, maxItems=1024):
+        self.servers = list(servers or defaultServers)
+        self.bootstrap = {}  # DoH 服务器域名 -> box.json 给出的 ips, 查询服务器本身时不依赖系统 DNS
+        self.timeout = timeout
+        self.minTtl = minTtl
+        self.maxTtl = maxTtl
+        self.maxItems = maxItems
+        self.cache = OrderedDict()  # (name, qtype) -> (Answer, expiresAt)
+        self.inflight = {}
+        self.lock = Lock()
+        self.session = requests.Session()
+        adapter = PinnedAdapter(lambda host: self.bootstrap.get(host, []))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # box.json 的 doh 列表有十来个服务器, 每次查询全部并发
+        self.pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix='doh')
+        # addresses() 并发查 A/AAAA; 与 pool 分开, lookup 在这里等 pool 里的查询不会互相占满
+        self.lookups = ThreadPoolExecutor(max_workers=4, thread_name_prefix='dohLookup')
+        self.stats = {'hits': 0, 'misses': 0, 'queries': 0, 'failed': 0}
+
+    def configure(self, servers):
+        # 接受地址列表或 box.json 的 doh 配置 [{"name", "url", "ips"}]; 为空时保留原有服务器
+        servers = [s if isinstance(s, dict) else {'url': s} for s in servers or [] if s]
+        if not servers:
+            return
+        self.servers = [s['url'] for s in servers]
+        self.bootstrap = {urlparse(s['url']).hostname: list(s['ips']) for s in servers if s.get('ips')}
+        self.clear()
+
+    def ask(self, server, query):
+        rsp = self.session.get(server, params={'dns': base64.urlsafe_b64encode(query).rstrip(b'=').decode()},
+                               headers={'Accept': 'application/dns-message'}, timeout=self.timeout)
+        if rsp.status_code != 200:
+            raise DnsError(f'{server} {rsp.status_code}')
+        message = parseMessage(rsp.content)
+        if message['rcode'] not in (0, 3):
+            raise DnsError(f'{server} rcode {message["rcode"]}')
+        return message
+
+    def query(self, name, qtype):
+        # 并发询问全部服务器, 第一个有效应答胜出; 其余请求在后台结束
+        query = buildQuery(name, qtype)
+        with self.lock:
+            self.stats['queries'] += 1
+        futures = {self.pool.submit(self.ask, server, query) for server in self.servers}
+        end, error = time.time() + self.timeout, None
+        while futures and time.time() < end:
+            done, futures = waitFutures(futures, timeout=max(end - time.time(), 0), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error or DnsError(f'{name} timeout')
+
+    def lookup(self, name, qtype='A', depth=0):
+        key = (name.lower().rstrip('.'), qtype)
+        with self.lock:
+            item = self.cache.get(key)
+            if item and item[1] > time.time():
+                self.cache.move_to_end(key)
+                self.stats['hits'] += 1
+                return item[0]
+            self.stats['misses'] += 1
+            future = self.inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self.inflight[key] = Future()
+        if not leader:
+            return future.result()
+        try:
+            message = self.query(name, qtype)
+            canonical, values, ttl, complete = follow(message, name, qtype)
+            if not values and not complete and depth < 4:
+                # 服务器只给了 CNAME 没给最终记录, 继续解析链尾
+                tail = self.lookup(canonical, qtype, depth + 1)
+                canonical, values, ttl = tail.canonical, tail.values, min(ttl, tail.ttl)
+            answer = Answer(key[0], qtype, canonical, values, min(max(ttl, self.minTtl), self.maxTtl), message['rcode'])
+            with self.lock:
+                self.cache[key] = (answer, time.time() + answer.ttl)
+                while len(self.cache) > self.maxItems:
+                    self.cache.popitem(last=False)
+            future.set_result(answer)
+        except BaseException as e:
+            with self.lock:
+                self.stats['failed'] += 1
+            future.set_exception(e)
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+        return future.result()
+
+    def addresses(self, name):
+        # 连接用: A 与 AAAA 并发查询, 有 A 记录时优先用 A; 一种查询超时或失败不耽误另一种. 同类地址打乱顺序分摊负载
+        futures = [self.lookups.submit(self.lookup, name, qtype) for qtype in ('A', 'AAAA')]
+        for future in futures:
+            try:
+                values = list(future.result().values)
+            except Exception:
+                continue
+            if values:
+                random.shuffle(values)
+                return values
+        return []
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+
+    def info(self):
+        with self.lock:
+            return dict(self.stats, entries=len(self.cache), servers=len(self.servers))
+
+def addresses(host):
+    # 插件会话用, 每次取当前的 resolver
+    return resolver.addresses(host)
+
+class PinnedConnection:
+    """
+    混入 urllib3 的连接类: 依次连接 addresses(域名) 给出的 IP, 没有地址时退回系统 DNS.
+    只改 TCP 连接目标, 请求的 Host 与 TLS SNI/证书校验仍用原域名.
+    """
+    addresses = None
+
+    def _new_conn(self):
+        host = self._dns_host
+        try:
+            ips = self.addresses(host.rstrip('.'))
+        except Exception:
+            ips = []
+        error = None
+        for ip in ips:
+            # 父类只用 _dns_host 建 TCP 连接, 建完立即还原, 之后的 TLS 握手仍按域名校验
+            self._dns_host = ip
+            try:
+                return super()._new_conn()
+            except HTTPError as e:
+                error = e
+            finally:
+                self._dns_host = host
+        if error:
+            raise error
+        return super()._new_conn()
+
+class PinnedAdapter(HTTPAdapter):
+    """只作用于挂载了它的会话, 不影响进程内其他插件的连接"""
+
+    def __init__(self, addresses, **kwargs):
+        # HTTPAdapter.__init__ 会调用 init_poolmanager, 需先保存
+        self.addresses = addresses
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        attrs = {'addresses': staticmethod(self.addresses)}
+        http = type('PinnedHTTPConnection', (PinnedConnection, HTTPConnection), attrs)
+        https = type('PinnedHTTPSConnection', (PinnedConnection, HTTPSConnection), attrs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': type('PinnedHTTPConnectionPool', (HTTPConnectionPool,), {'ConnectionCls': http}),
+            'https': type('PinnedHTTPSConnectionPool', (HTTPSConnectionPool,), {'ConnectionCls': https}),
+        }
+
+resolver = Resolver()
@@ -0,0 +1,220 @@
+import re
+import json
+import time
+from threading import Lock
+from collections import OrderedDict
+from concurrent.futures import Future
+from urllib.parse import urljoin
+
+attrPattern = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+uriPattern = re.compile(r'URI="([^"]*)"')
+# 带 URI 属性的标签, 改写时统一替换 URI="..."
+uriTags = {'#EXT-X-KEY': 'key', '#EXT-X-SESSION-KEY': 'key', '#EXT-X-MAP': 'map', '#EXT-X-MEDIA': 'media',
+           '#EXT-X-I-FRAME-STREAM-INF': 'variant'}
+
+def attributes(text):
+    return {k: v.strip('"') for k, v in attrPattern.findall(text)}
+
+def byteRange(text, offset):
+    # "长度[@起点]", 省略起点时紧接上一片段
+    length, _, start = text.partition('@')
+    start = int(start) if start else offset
+    return int(length), start
+
+class Playlist:
+    """
+    单次遍历解析 master / media 播放列表, 所有 URI 按最终地址解析成绝对地址.
+    lines 中每项为 (类型, 原文, 绝对 URI, 属性), 类型是 tag / segment / variant / key / map / media.
+    """
+
+    def __init__(self, text, url):
+        self.url = url
+        self.lines = []
+        self.segments = []
+        self.variants = []
+        self.master = False
+        self.endList = False
+        self.targetDuration = 0
+        self.mediaSequence = 0
+        self.parse(text)
+
+    def parse(self, text):
+        pending, offset = {}, 0
+        for line in text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            if not line.startswith('#'):
+                uri = urljoin(self.url, line)
+                if pending.get('variant'):
+                    entry = ('variant', line, uri, pending['variant'])
+                    self.variants.append(entry)
+                else:
+                    attrs = {'duration': pending.get('duration', 0), 'byterange': pending.get('byterange'),
+                             'sequence': self.mediaSequence + len(self.segments)}
+                    if attrs['byterange']:
+                        offset = sum(attrs['byterange'])
+                    entry = ('segment', line, uri, attrs)
+                    self.segments.append(entry)
+                self.lines.append(entry)
+                pending = {}
+                continue
+            tag, _, value = line.partition(':')
+            if tag == '#EXTINF':
+                pending['duration'] = float(value.split(',')[0] or 0)
+            elif tag == '#EXT-X-BYTERANGE':
+                pending['byterange'] = byteRange(value, offset)
+            elif tag == '#EXT-X-STREAM-INF':
+                self.master = True
+                pending['variant'] = attributes(value)
+            elif tag == '#EXT-X-TARGETDURATION':
+                self.targetDuration = int(float(value))
+            elif tag == '#EXT-X-MEDIA-SEQUENCE':
+                self.mediaSequence = int(value)
+            elif tag == '#EXT-X-ENDLIST':
+                self.endList = True
+            if tag in uriTags and 'URI="' in value:
+                attrs = attributes(value)
+                self.master = self.master or tag in ('#EXT-X-MEDIA', '#EXT-X-I-FRAME-STREAM-INF')
+                self.lines.append((uriTags[tag], line, urljoin(self.url, attrs['URI']), attrs))
+            else:
+                self.lines.append(('tag', line, None, None))
+
+    def ttl(self):
+        # 直播列表每半个目标时长刷新一次; 点播和 master 列表内容不变, 缓存更久
+        if self.master or self.endList:
+            return 600
+        return max(self.targetDuration / 2, 1)
+
+    def rewrite(self, segment=None, key=None, variant=None, map=None, media=None):
+        """
+        回调签名为 fn(绝对 URI, 属性) -> 新 URI; 未提供回调的类型输出绝对 URI.
+        片段属性含 duration / byterange / sequence, 标签属性即 KEY=VALUE 字典.
+        """
+        callbacks = {'segment': segment, 'key': key, 'variant': variant, 'map': map, 'media': media}
+        out = []
+        for kind, line, uri, attrs in self.lines:
+            if kind == 'tag':
+                out.append(line)
+                continue
+            fn = callbacks[kind]
+            target = fn(uri, attrs) if fn else uri
+            if line.startswith('#'):
+                out.append(uriPattern.sub(lambda m: f'URI="{target}"', line, count=1))
+            else:
+                out.append(target)
+        return '\n'.join(out) + '\n'
+
+class PlaylistCache:
+    def __init__(self, maxItems=256):
+        self.maxItems = maxItems
+        self.items = OrderedDict()  # key -> (Playlist, expiresAt)
+        self.lock = Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item and item[1] > time.time():
+                self.items.move_to_end(key)
+                self.stats['hits'] += 1
+                return item[0]
+            self.items.pop(key, None)
+            self.stats['misses'] += 1
+            return None
+
+    def set(self, key, playlist):
+        with self.lock:
+            self.items[key] = (playlist, time.time() + playlist.ttl())
+            self.items.move_to_end(key)
+            while len(self.items) > self.maxItems:
+                self.items.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+    def info(self):
+        with self.lock:
+            return dict(self.stats, entries=len(self.items))
+
+playlists = PlaylistCache()
+
+def load(fetch, url, headers=None, **kwargs):
+    # 以请求地址缓存, 以跟随重定向后的最终地址解析相对路径
+    key = json.dumps([url, headers], sort_keys=True, default=str)
+    playlist = playlists.get(key)
+    if playlist is None:
+        rsp = fetch(url, headers=headers, **kwargs)
+        rsp.encoding = 'utf-8'
+        playlist = Playlist(rsp.text, rsp.url or url)
+        if rsp.status_code == 200 and (playlist.segments or playlist.variants):
+            playlists.set(key, playlist)
+    return playlist
+
+class KeyCache:
+    """
+    EXT-X-KEY 解密密钥缓存: 播放器每次刷新列表、拖动进度都会重新请求密钥, 命中时不再回源.
+    键为 (作用域, 密钥 URI, 内容 id); 并发请求同一密钥只回源一次; 令牌更换时按作用域整体失效.
+    """
+
+    def __init__(self, ttl=3600, maxItems=512):
+        self.ttl = ttl
+        self.maxItems = maxItems
+        self.items = OrderedDict()  # key -> (data, mime, expiresAt)
+        self.inflight = {}          # key -> (Future, 发起时的版本)
+        self.versions = {}          # 作用域 -> 失效次数, 失效前发起的请求结果不再写入
+        self.lock = Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'invalidated': 0}
+
+    def load(self, scope, uri, contentId, produce, ttl=None):
+        key = (scope, uri, contentId)
+        with self.lock:
+            item = self.items.get(key)
+            if item and item[2] > time.time():
+                self.items.move_to_end(key)
+                self.stats['hits'] += 1
+                return item[0], item[1]
+            self.items.pop(key, None)
+            self.stats['misses'] += 1
+            version = self.versions.get(scope, 0)
+            future, leader = self.inflight.get(key, (None, None))
+            if future is None or leader != version:
+                future, leader = Future(), version
+                self.inflight[key] = (future, version)
+            else:
+                leader = None
+        if leader is None:
+            return future.result()
+        try:
+            data, mime = produce()
+            with self.lock:
+                if self.versions.get(scope, 0) == version:
+                    self.items[key] = (data, mime, time.time() + (ttl or self.ttl))
+                    while len(self.items) > self.maxItems:
+                        self.items.popitem(last=False)
+            future.set_result((data, mime))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self.lock:
+                if self.inflight.get(key, (None,))[0] is future:
+                    del self.inflight[key]
+        return future.result()
+
+    def invalidate(self, scope):
+        with self.lock:
+            self.versions[scope] = self.versions.get(scope, 0) + 1
+            for key in [k for k in self.items if k[0] == scope]:
+                del self.items[key]
+                self.stats['invalidated'] += 1
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+    def info(self):
+        with self.lock:
+            return dict(self.stats, entries=len(self.items))
+
+keys = KeyCache()
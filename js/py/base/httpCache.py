@@ -0,0 +1,95 @@
+import zlib
+import time
+from threading import Lock
+from collections import OrderedDict
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+
+class HttpCache:
+    """
+    Spider.fetch 的响应缓存: 正文 zlib 压缩后按 LRU 存放, 总大小受 maxBytes 限制.
+    过期后带 If-None-Match / If-Modified-Since 回源, 304 时直接复用缓存正文.
+    """
+    dropHeaders = ('content-encoding', 'content-length', 'transfer-encoding', 'connection')
+
+    def __init__(self, maxBytes=16 * 1024 * 1024):
+        self.maxBytes = maxBytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = Lock()
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'savedBytes': 0}
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, rsp):
+        if 'no-store' in rsp.headers.get('Cache-Control', ''):
+            return
+        body = zlib.compress(rsp.content, 6)
+        entry = {
+            'status': rsp.status_code,
+            'url': rsp.url,
+            'headers': CaseInsensitiveDict({k: v for k, v in rsp.headers.items() if k.lower() not in self.dropHeaders}),
+            'body': body,
+            'length': len(rsp.content),
+            'storedAt': time.time()
+        }
+        with self.lock:
+            self.pop(key)
+            self.entries[key] = entry
+            self.size += len(body)
+            while self.entries and self.size > self.maxBytes:
+                self.pop(next(iter(self.entries)))
+
+    def pop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry:
+            self.size -= len(entry['body'])
+
+    def isFresh(self, entry, ttl):
+        return time.time() - entry['storedAt'] < ttl
+
+    def validators(self, entry):
+        headers = {}
+        if 'ETag' in entry['headers']:
+            headers['If-None-Match'] = entry['headers']['ETag']
+        if 'Last-Modified' in entry['headers']:
+            headers['If-Modified-Since'] = entry['headers']['Last-Modified']
+        return headers
+
+    def refresh(self, entry, rsp):
+        # 304 可能带回新的 ETag / Cache-Control 等
+        with self.lock:
+            for k, v in rsp.headers.items():
+                if k.lower() not in self.dropHeaders:
+                    entry['headers'][k] = v
+            entry['storedAt'] = time.time()
+
+    def count(self, name, entry=None):
+        with self.lock:
+            self.stats[name] += 1
+            if entry:
+                self.stats['savedBytes'] += entry['length']
+
+    def response(self, entry):
+        rsp = Response()
+        rsp.status_code = entry['status']
+        rsp.url = entry['url']
+        rsp.headers = CaseInsensitiveDict(entry['headers'])
+        rsp._content = zlib.decompress(entry['body'])
+        rsp._content_consumed = True
+        rsp.fromCache = True
+        return rsp
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def info(self):
+        with self.lock:
+            return dict(self.stats, entries=len(self.entries), bytes=self.size)
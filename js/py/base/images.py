@@ -0,0 +1,209 @@
+import io
+import os
+import hashlib
+import tempfile
+from threading import Lock
+from collections import OrderedDict
+from concurrent.futures import Future
+
+class ImageCache:
+    """
+    解密后图片的磁盘缓存, 按内容寻址: blobs/<sha256> 存图片, refs/<sha1(来源)> 记录 "sha256 mime".
+    相同图片只存一份; 按最近使用顺序淘汰, 总大小不超过 maxBytes.
+    """
+
+    def __init__(self, folder, maxBytes=128 * 1024 * 1024):
+        self.folder = folder
+        self.maxBytes = maxBytes
+        self.index = OrderedDict()  # ref -> (digest, mime), 按最近使用排序
+        self.blobs = {}             # digest -> [size, 引用数]
+        self.size = 0
+        self.lock = Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evicted': 0}
+        os.makedirs(os.path.join(folder, 'blobs'), exist_ok=True)
+        os.makedirs(os.path.join(folder, 'refs'), exist_ok=True)
+        self.load()
+
+    def path(self, kind, name):
+        return os.path.join(self.folder, kind, name)
+
+    def load(self):
+        refs = []
+        for name in os.listdir(os.path.join(self.folder, 'refs')):
+            try:
+                with open(self.path('refs', name), encoding='utf-8') as f:
+                    digest, mime = f.read().split(' ', 1)
+                size = os.path.getsize(self.path('blobs', digest))
+                refs.append((os.path.getmtime(self.path('refs', name)), name, digest, mime, size))
+            except (OSError, ValueError):
+                continue
+        for _, name, digest, mime, size in sorted(refs):
+            self.link(name, digest, mime, size)
+        self.evict()
+
+    def link(self, ref, digest, mime, size):
+        self.index[ref] = (digest, mime)
+        blob = self.blobs.setdefault(digest, [size, 0])
+        if blob[1] == 0:
+            self.size += size
+        blob[1] += 1
+
+    def unlink(self, ref):
+        digest, _ = self.index.pop(ref)
+        self.remove(self.path('refs', ref))
+        blob = self.blobs[digest]
+        blob[1] -= 1
+        if blob[1] == 0:
+            del self.blobs[digest]
+            self.size -= blob[0]
+            self.remove(self.path('blobs', digest))
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def key(self, source):
+        return hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+    def get(self, source):
+        ref = self.key(source)
+        with self.lock:
+            item = self.index.get(ref)
+            if item:
+                self.index.move_to_end(ref)
+        if item:
+            try:
+                with open(self.path('blobs', item[0]), 'rb') as f:
+                    data = f.read()
+                os.utime(self.path('refs', ref))
+                with self.lock:
+                    self.stats['hits'] += 1
+                return data, item[1]
+            except OSError:
+                with self.lock:
+                    if ref in self.index:
+                        self.unlink(ref)
+        with self.lock:
+            self.stats['misses'] += 1
+        return None
+
+    def put(self, source, data, mime):
+        mime = mime or 'image/jpeg'
+        ref, digest = self.key(source), hashlib.sha256(data).hexdigest()
+        with self.lock:
+            if self.index.get(ref, (None,))[0] == digest:
+                self.index.move_to_end(ref)
+                return
+            if ref in self.index:
+                self.unlink(ref)
+            blob = self.path('blobs', digest)
+            if digest not in self.blobs:
+                # 先写临时文件再改名, 读取方不会读到半截文件
+                fd, tmp = tempfile.mkstemp(dir=self.folder)
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp, blob)
+            with open(self.path('refs', ref), 'w', encoding='utf-8') as f:
+                f.write(f'{digest} {mime}')
+            self.link(ref, digest, mime, len(data))
+            self.evict()
+
+    def evict(self):
+        while self.index and self.size > self.maxBytes:
+            self.unlink(next(iter(self.index)))
+            self.stats['evicted'] += 1
+
+    def clear(self):
+        with self.lock:
+            while self.index:
+                self.unlink(next(iter(self.index)))
+
+    def info(self):
+        with self.lock:
+            return dict(self.stats, entries=len(self.index), blobs=len(self.blobs), bytes=self.size)
+
+class ImagePipeline:
+    """磁盘缓存 + 单飞: 同一张图片并发请求时只下载解密一次"""
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.inflight = {}
+        self.lock = Lock()
+
+    def load(self, source, produce):
+        cached = self.cache.get(source)
+        if cached:
+            return cached
+        with self.lock:
+            future = self.inflight.get(source)
+            leader = future is None
+            if leader:
+                future = self.inflight[source] = Future()
+        if leader:
+            try:
+                data, mime = produce()
+                self.cache.put(source, data, mime)
+                future.set_result((data, mime))
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                with self.lock:
+                    self.inflight.pop(source, None)
+        return future.result()
+
+def sniff(data):
+    # 按文件头识别图片格式; 不是图片 (如防盗链、验证码的 HTML 页) 时返回 None
+    if data[:3] == b'\xff\xd8\xff':
+        return 'image/jpeg'
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'image/png'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    return None
+
+def isImageType(contentType):
+    # 上游 Content-Type 为空或为通用二进制类型时交给 sniff 判断
+    mime = (contentType or '').split(';')[0].strip().lower()
+    return not mime or mime.startswith('image/') or mime in ('application/octet-stream', 'binary/octet-stream')
+
+def shrink(data, width, quality=80):
+    """
+    缩放到指定宽度并重新编码: 不透明图片输出 JPEG, 带透明通道的输出 PNG.
+    Pillow 为可选依赖, 未安装或原图不比目标大时原样返回; 不是图片或无法解码时抛 ValueError.
+    """
+    mime = sniff(data)
+    if mime is None:
+        raise ValueError('not an image')
+    try:
+        from PIL import Image
+    except ImportError:
+        return data, mime
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.width <= width or getattr(image, 'is_animated', False):
+            return data, mime
+        # thumbnail 对 JPEG 会先在解码阶段按 1/2、1/4、1/8 缩小, 大图省掉大部分解码开销
+        image.thumbnail((width, image.height * width // image.width + 1), Image.LANCZOS, reducing_gap=2.0)
+        out = io.BytesIO()
+        if image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info:
+            image.save(out, 'PNG', optimize=True)
+            return out.getvalue(), 'image/png'
+        image.convert('RGB').save(out, 'JPEG', quality=quality, optimize=True)
+        return out.getvalue(), 'image/jpeg'
+    except Exception as e:
+        raise ValueError(f'image decode failed: {e}') from e
+
+_pipeline = None
+_pipelineLock = Lock()
+
+def pipeline():
+    # 首次使用时才创建缓存目录
+    global _pipeline
+    with _pipelineLock:
+        if _pipeline is None:
+            _pipeline = ImagePipeline(ImageCache(os.path.join(tempfile.gettempdir(), 'spiderImages')))
+    return _pipeline
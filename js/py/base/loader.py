@@ -0,0 +1,69 @@
+import os
+import sys
+import importlib.util
+from threading import RLock, local
+from contextlib import contextmanager
+from importlib.machinery import PathFinder, SourceFileLoader
+
+# 插件模块缓存: 绝对路径 -> ((mtime_ns, size), module), 文件未变化时不再重新执行
+_modules = {}
+_lock = RLock()
+# 延迟导入的重量级依赖, 只对纯 Python 源码模块生效; 首次访问模块属性时才真正执行
+# requests/lxml 已被 base.spider 提前导入, 放进来也不会延迟
+lazyPackages = {'Crypto', 'pyquery', 'bs4'}
+# 只在 loadPlugin 执行插件代码的线程里延迟导入, 其他线程的 import 不受影响
+_lazyScope = local()
+
+class LazyFinder:
+    def find_spec(self, name, path=None, target=None):
+        if not getattr(_lazyScope, 'depth', 0) or name.split('.')[0] not in lazyPackages:
+            return None
+        spec = PathFinder.find_spec(name, path)
+        if spec and isinstance(spec.loader, SourceFileLoader):
+            spec.loader = importlib.util.LazyLoader(spec.loader)
+        return spec
+
+_lazyFinder = LazyFinder()
+
+@contextmanager
+def lazyImports():
+    # 调用方持有 _lock, 插件执行期间才把 finder 挂到 sys.meta_path 上; 插件里嵌套 loadPlugin 时按深度计数
+    depth = getattr(_lazyScope, 'depth', 0)
+    _lazyScope.depth = depth + 1
+    if depth == 0:
+        sys.meta_path.insert(0, _lazyFinder)
+    try:
+        yield
+    finally:
+        _lazyScope.depth = depth
+        if depth == 0:
+            sys.meta_path.remove(_lazyFinder)
+
+def loadPlugin(fileName, name=None):
+    path = os.path.abspath(fileName)
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        cached = _modules.get(path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+        name = name or os.path.splitext(os.path.basename(path))[0]
+        # SourceFileLoader 会复用 __pycache__ 中与源码匹配的 .pyc
+        loader = SourceFileLoader(name, path)
+        spec = importlib.util.spec_from_file_location(name, path, loader=loader)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        try:
+            with lazyImports():
+                loader.exec_module(module)
+        except BaseException:
+            sys.modules.pop(name, None)
+            raise
+        _modules[path] = (stamp, module)
+        return module
+
+def unloadPlugin(fileName):
+    with _lock:
+        cached = _modules.pop(os.path.abspath(fileName), None)
+    if cached:
+        sys.modules.pop(cached[1].__name__, None)
@@ -1,85 +1,370 @@
 #coding=utf-8
 #!/usr/bin/python
-from re import sub
-from requests import get
-from urllib.parse import unquote
-from threading import Thread, Event
+import re
+import sys
+import json
+import gzip
+import time
+import zlib
+import sqlite3
+from collections import OrderedDict
+from threading import Thread, Event, Lock
 from socketserver import ThreadingMixIn
 from urllib.parse import urlparse, parse_qs
-from importlib.machinery import SourceFileLoader
 from http.server import BaseHTTPRequestHandler, HTTPServer
+sys.path.append('..')
+from base.loader import loadPlugin
+from base.metrics import metrics
+from base.spider import executorStats
+from base import replay
+
+class CacheStore:
+    """有界缓存: LRU + TTL + 内存上限, 后台定期清理过期项"""
+
+    def __init__(self, maxItems=2048, maxBytes=64 * 1024 * 1024, ttl=86400, sweepInterval=60):
+        self.maxItems = maxItems
+        self.maxBytes = maxBytes
+        self.ttl = ttl
+        self.sweepInterval = sweepInterval
+        self.items = OrderedDict()  # key -> (value, expiresAt, size)
+        self.size = 0
+        self.lock = Lock()
+
+    def deadline(self, value):
+        # 沿用插件的 expiresAt 约定, 否则使用默认 TTL
+        if value.startswith('{') and '"expiresAt"' in value:
+            try:
+                return int(json.loads(value)['expiresAt'])
+            except (ValueError, KeyError, TypeError):
+                pass
+        return int(time.time()) + self.ttl
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                return None
+            if item[1] < time.time():
+                self.pop(key)
+                return None
+            self.items.move_to_end(key)
+            return item[0]
+
+    def set(self, key, value, deadline=None):
+        item = (value, deadline or self.deadline(value), len(key) + len(value.encode()))
+        with self.lock:
+            old = self.items.pop(key, None)
+            if old:
+                self.size -= old[2]
+            self.items[key] = item
+            self.size += item[2]
+            self.saved(key, item)
+            while self.items and (len(self.items) > self.maxItems or self.size > self.maxBytes):
+                self.pop(next(iter(self.items)))
+
+    def delete(self, key):
+        with self.lock:
+            self.pop(key)
+
+    def pop(self, key):
+        item = self.items.pop(key, None)
+        if item:
+            self.size -= item[2]
+            self.dropped(key)
+
+    def saved(self, key, item):
+        pass
+
+    def dropped(self, key):
+        pass
+
+    def seed(self, fileName):
+        # 预热: JSON 对象 {key: value}, 非字符串的值按 JSON 存储
+        with open(fileName, encoding='utf-8') as f:
+            for key, value in json.load(f).items():
+                self.set(key, value if isinstance(value, str) else json.dumps(value, ensure_ascii=False))
+
+    def sweep(self):
+        now = time.time()
+        with self.lock:
+            for key in [k for k, v in self.items.items() if v[1] < now]:
+                self.pop(key)
+
+    def sweepForever(self, event):
+        while not event.wait(self.sweepInterval):
+            self.sweep()
+
+class DiskCacheStore(CacheStore):
+    """写穿到 SQLite 的缓存, 代理重启后保留未过期的数据"""
+
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, expiresAt INTEGER, '
+                        'updatedAt REAL)')
+        self.compact()
+        self.load()
+
+    def load(self):
+        # 从最近写入的行往前载入, 条数或字节数超出上限后, 更早的行从库中删除
+        kept, dropped = [], []
+        for key, value, expiresAt in self.db.execute('SELECT key, value, expiresAt FROM cache ORDER BY updatedAt DESC'):
+            size = len(key) + len(value.encode())
+            if dropped or len(kept) >= self.maxItems or self.size + size > self.maxBytes:
+                dropped.append((key,))
+                continue
+            kept.append((key, (value, expiresAt, size)))
+            self.size += size
+        for key, item in reversed(kept):
+            self.items[key] = item
+        if dropped:
+            self.db.executemany('DELETE FROM cache WHERE key = ?', dropped)
+            self.db.commit()
+
+    def saved(self, key, item):
+        self.db.execute('INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)', (key, item[0], item[1], time.time()))
+        self.db.commit()
+
+    def dropped(self, key):
+        self.db.execute('DELETE FROM cache WHERE key = ?', (key,))
+        self.db.commit()
+
+    def sweep(self):
+        super().sweep()
+        with self.lock:
+            self.compact()
+
+    def compact(self):
+        # 删除过期行, 空闲页过多时整理数据库文件
+        self.db.execute('DELETE FROM cache WHERE expiresAt < ?', (int(time.time()),))
+        self.db.commit()
+        free = self.db.execute('PRAGMA freelist_count').fetchone()[0]
+        pages = self.db.execute('PRAGMA page_count').fetchone()[0]
+        if free > 64 and free * 4 > pages:
+            self.db.execute('VACUUM')
+        self.db.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+cache = CacheStore()
+plugin = None  # do=py 请求转交给它的 localProxy
+# 值得压缩的文本类型: JSON、m3u8、mpd、xml 等; 视频分片与图片不压缩
+compressible = re.compile(r'^(text/|application/([\w.+-]*\+)?(json|javascript|xml|x-mpegurl|vnd\.apple\.mpegurl)|'
+                          r'audio/(x-)?mpegurl)', re.I)
+
+def acceptsGzip(value):
+    # Accept-Encoding 中 gzip 或 * 且 q 不为 0
+    for part in (value or '').lower().split(','):
+        name, _, params = part.partition(';')
+        if name.strip() in ('gzip', '*'):
+            q = params.strip()
+            try:
+                return not q.startswith('q=') or float(q[2:]) > 0
+            except ValueError:
+                return False
+    return False
 
-cache = {}
 class ProxyServer(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    timeout = 30  # 空闲的长连接在此秒数后关闭
+    disable_nagle_algorithm = True
+    chunkSize = 64 * 1024
+    gzipLevel = 6
+    gzipMinSize = 1024  # 小于此字节数的文本不压缩, 省掉压缩开销
+
+    def gzipWanted(self, code, mime, headers):
+        # 仅压缩完整的文本响应; 插件已自行编码或返回 Range 片段时原样转发
+        if code != 200 or not compressible.match(mime or ''):
+            return False
+        if any(k.lower() in ('content-encoding', 'content-range') for k in headers):
+            return False
+        return acceptsGzip(self.headers.get('Accept-Encoding'))
+
+    def reply(self, code=200, body=b'', mime='text/plain; charset=utf-8', headers=None):
+        headers = {k: v for k, v in (headers or {}).items()
+                   if k.lower() not in ('content-length', 'transfer-encoding', 'content-type')}
+        if len(body) >= self.gzipMinSize and self.gzipWanted(code, mime, headers):
+            body = gzip.compress(body, self.gzipLevel)
+            headers['Content-Encoding'] = 'gzip'
+            headers['Vary'] = 'Accept-Encoding'
+        self.send_response(code)
+        self.send_header('Content-Type', mime)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def proxyPlugin(self, queryQarams):
+        params = {k: v[0] for k, v in queryQarams.items()}
+        params['headers'] = dict(self.headers)
+        if self.headers.get('Range'):
+            params['range'] = self.headers['Range']
+        result = plugin.localProxy(params) if plugin else None
+        if not result:
+            return self.reply(404)
+        code, mime, body = result[:3]
+        headers = result[3] if len(result) > 3 and result[3] else {}
+        if body is None or isinstance(body, (bytes, bytearray, str)):
+            body = body.encode() if isinstance(body, str) else bytes(body or b'')
+            return self.reply(code, body, mime, headers)
+        self.stream(code, mime, body, headers)
+
+    def stream(self, code, mime, body, headers):
+        # 迭代器/生成器/类文件对象逐块转发, 内存占用与片段大小无关
+        chunks = iter(lambda: body.read(self.chunkSize), b'') if hasattr(body, 'read') else iter(body)
+        sized = any(k.lower() == 'content-length' for k in headers)
+        # 未知长度的文本流边读边压缩
+        compressor = None if sized or not self.gzipWanted(code, mime, headers) else \
+            zlib.compressobj(self.gzipLevel, zlib.DEFLATED, 31)
+        try:
+            self.send_response(code)
+            self.send_header('Content-Type', mime)
+            for k, v in headers.items():
+                if k.lower() not in ('transfer-encoding', 'content-type'):
+                    self.send_header(k, v)
+            if compressor:
+                self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Vary', 'Accept-Encoding')
+            if not sized:
+                self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                if compressor and chunk:
+                    chunk = compressor.compress(chunk)
+                if not chunk:
+                    continue
+                if sized:
+                    self.wfile.write(chunk)
+                else:
+                    self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+            if compressor:
+                tail = compressor.flush()
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(tail), tail))
+            if not sized:
+                self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+        finally:
+            close = getattr(body, 'close', None)
+            if close:
+                close()
+
     def do_GET(self):
         urlParts = urlparse(self.path)
+        if urlParts.path == '/metrics':
+            return self.metrics()
         queryQarams = parse_qs(urlParts.query)
-        do = queryQarams['do'][0]
-        try:
-            key = queryQarams['key'][0]
-        except:
-            key = ''
-        try:
-            value = queryQarams['value'][0]
-        except:
-            value = ''
+        do = queryQarams.get('do', [''])[0]
+        if do == 'py':
+            return self.proxyPlugin(queryQarams)
+        key = queryQarams.get('key', [''])[0]
+        value = queryQarams.get('value', [''])[0]
         if do == 'set':
-            cache[key] = value
-            self.send_response(200)
-            self.end_headers()
-        if do == 'get':
-            self.send_response(200)
-            self.end_headers()
-            if key in cache:
-                self.wfile.write(cache[key].encode())
-        elif do == 'delete':
-            cache.pop(key, None)
-            self.send_response(200)
-            self.end_headers()
+            cache.set(key, value)
+            self.reply()
+        elif do == 'get':
+            value = cache.get(key)
+            self.reply(body=value.encode() if value else b'')
+        elif do in ['delete', 'del']:
+            cache.delete(key)
+            self.reply()
         else:
-            self.send_response(200)
-            self.end_headers()
+            self.reply()
 
     def do_POST(self):
         urlParts = urlparse(self.path)
         queryQarams = parse_qs(urlParts.query)
-        key = queryQarams['key'][0]
+        key = queryQarams.get('key', [''])[0]
         try:
             contentLength = int(self.headers.get('Content-Length', 0))
-            value = self.rfile.read(contentLength).decode().replace('+', ' ')
-            value = sub(r'value=(.*?)', '', unquote(value))
+            value = parse_qs(self.rfile.read(contentLength).decode(), keep_blank_values=True)['value'][0]
         except:
             value = ''
-        cache[key] = value
-        self.send_response(200)
-        self.end_headers()
+        cache.set(key, value)
+        self.reply()
+
+    def metrics(self):
+        stats = executorStats()
+        gauges = {'spider_executor_threads': stats['threads'], 'spider_executor_queued': stats['queued'],
+                  'proxy_cache_items': len(cache.items), 'proxy_cache_bytes': cache.size}
+        self.reply(body=metrics.render(gauges).encode(), mime='text/plain; version=0.0.4; charset=utf-8')
+
+    def log_message(self, format, *args):
+        pass
 
 class ThreadedHTTPServer(ThreadingMixIn, HTTPServer):
     """Handle requests in a separate thread."""
+    daemon_threads = True
+    allow_reuse_address = True
 
-def serveForever(event):
+def waitShutdown(event, server):
+    event.wait()
+    server.shutdown()
+
+def serveForever(event, port=9978):
+    server = None
     try:
-        while not event.is_set():
-            ThreadedHTTPServer(('0.0.0.0', 9978), ProxyServer).handle_request()
-        ThreadedHTTPServer(('0.0.0.0', 9978), ProxyServer).server_close()
+        server = ThreadedHTTPServer(('0.0.0.0', port), ProxyServer)
+        Thread(target=cache.sweepForever, args=(event,), name='cacheSweep', daemon=True).start()
+        Thread(target=waitShutdown, args=(event, server), name='proxyShutdown', daemon=True).start()
+        server.serve_forever(poll_interval=0.5)
     except Exception as erro:
         print(erro)
     finally:
-        ThreadedHTTPServer(('0.0.0.0', 9978), ProxyServer).server_close()
+        if server:
+            server.server_close()
+        if isinstance(cache, DiskCacheStore):
+            cache.close()
 
 def loadFromDisk(fileName):
     name = fileName.split('/')[-1].split('.')[0]
-    sp = SourceFileLoader(name, fileName).load_module().Spider()
+    sp = loadPlugin(fileName, name).Spider()
     return sp
 
-def run(fileName, proxy=False):
+def useDiskCache(path, seedFile=None):
+    global cache
+    cache = DiskCacheStore(path)
+    if seedFile:
+        cache.seed(seedFile)
+
+def useConfig(path):
+    # 读取 box.json 一类的配置: doh 列表交给 DoH 解析器, 插件的 resolve()/dohHosts 都走这些服务器
+    from base import doh
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f)
+    doh.resolver.configure(config.get('doh'))
+
+def run(fileName, proxy=False, cacheFile=None, mode=None, seedFile=None, configFile=None):
+    global plugin
     event = Event()
+    if configFile:
+        useConfig(configFile)
+    if cacheFile:
+        useDiskCache(cacheFile, seedFile)
+    elif seedFile:
+        cache.seed(seedFile)
     if proxy:
         thread = Thread(target=serveForever, args=(event,), name='localProxy')
         thread.start()
     sp = loadFromDisk(f'../plugin/{fileName}.py')  #载入本地脚本
-    sp.init('') # 初始化
+    sp.streamBody = True  # do=py 路由可逐块转发迭代器 body
+    plugin = sp
+    fixture = f'fixtures/{fileName}.jsonl'
     try:
+        # 录制/回放时 init 在会话内执行, 它发出的请求同样被录制或回放
+        if mode == 'record':  # 录制上游响应到 fixtures
+            return replay.record(sp, fixture)
+        if mode == 'replay':  # 离线回放, 输出各方法耗时/CPU/内存/上游次数
+            return replay.bench(sp, fixture)
+        sp.init('') # 初始化
         # formatJo = sp.decode('')
         # formatJo = sp.homeContent(True)  # 主页
         # formatJo = sp.homeVideoContent()  # 主页视频
@@ -93,14 +378,13 @@ def run(fileName, proxy=False):
         print(erro)
     finally:
         event.set()
-        try:
-            get('http://127.0.0.1:9978/cache?do=none')
-        except:
-            pass
+        if proxy:
+            thread.join()
 
 if __name__ == '__main__':
     """
-    run(PY爬虫文件名, 是否启用本地代理)
+    run(PY爬虫文件名, 是否启用本地代理, 持久化缓存文件(可选, 如 'cache.db'), 模式(可选, 'record' 录制 / 'replay' 回放基准),
+        预热文件(可选, JSON 对象 {key: value}, 启动时写入缓存), 配置文件(可选, 如 '../../../box.json', 读取其中的 doh))
     再去run函数中修改函数参数
     """
     run('py_bilibilivd', True)
\ No newline at end of file
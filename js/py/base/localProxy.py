@@ -1,6 +1,8 @@
 class Proxy:
-    def getUrl(self, local):
+    @staticmethod
+    def getUrl(local):
         return 'http://127.0.0.1:9978'
 
-    def getPort(self):
-        return 9978
\ No newline at end of file
+    @staticmethod
+    def getPort():
+        return 9978
@@ -0,0 +1,115 @@
+import time
+from bisect import bisect_left
+from threading import Lock
+from functools import wraps
+from collections.abc import Iterator
+
+class Metrics:
+    """
+    进程内指标: 插件方法耗时直方图/异常数, 上游请求数与字节数, 缓存命中数.
+    只做加法计数, 渲染时再拼成 Prometheus 文本格式, 常驻开启的开销很小.
+    """
+    buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self):
+        self.lock = Lock()
+        self.calls = {}      # (plugin, method) -> [每个桶的计数..., +Inf 计数, 总耗时]
+        self.errors = {}     # (plugin, method) -> 次数
+        self.upstream = {}   # (plugin, http method) -> 次数
+        self.bytes = {}      # plugin -> 字节数
+        self.cacheHits = {}  # (plugin, tier) -> 次数
+
+    def observe(self, plugin, method, seconds, error=False):
+        index = bisect_left(self.buckets, seconds)
+        key = (plugin, method)
+        with self.lock:
+            series = self.calls.get(key)
+            if series is None:
+                series = self.calls[key] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += seconds
+            if error:
+                self.errors[key] = self.errors.get(key, 0) + 1
+
+    def request(self, plugin, method, size):
+        with self.lock:
+            self.upstream[(plugin, method)] = self.upstream.get((plugin, method), 0) + 1
+            self.bytes[plugin] = self.bytes.get(plugin, 0) + size
+
+    def hit(self, plugin, tier):
+        with self.lock:
+            self.cacheHits[(plugin, tier)] = self.cacheHits.get((plugin, tier), 0) + 1
+
+    def timed(self, method, name):
+        # localProxy 返回迭代器作为 body 时, 计时到迭代器读完(或客户端断开)为止, 而不只是生成器创建的耗时
+        @wraps(method)
+        def wrapper(spider, *args, **kwargs):
+            plugin = type(spider).__module__
+            start = time.perf_counter()
+            try:
+                result = method(spider, *args, **kwargs)
+            except BaseException:
+                self.observe(plugin, name, time.perf_counter() - start, True)
+                raise
+            if isinstance(result, list) and len(result) > 2 and isinstance(result[2], Iterator):
+                result = list(result)
+                result[2] = self.drain(result[2], plugin, name, start)
+            else:
+                self.observe(plugin, name, time.perf_counter() - start)
+            return result
+        return wrapper
+
+    def drain(self, body, plugin, name, start):
+        error = False
+        try:
+            yield from body
+        except GeneratorExit:
+            # 客户端断开, 不算插件异常
+            raise
+        except BaseException:
+            error = True
+            raise
+        finally:
+            close = getattr(body, 'close', None)
+            if close:
+                close()
+            self.observe(plugin, name, time.perf_counter() - start, error)
+
+    def render(self, gauges=None):
+        lines = []
+        with self.lock:
+            calls = {k: list(v) for k, v in self.calls.items()}
+            errors, upstream = dict(self.errors), dict(self.upstream)
+            size, hits = dict(self.bytes), dict(self.cacheHits)
+        lines.append('# TYPE spider_call_seconds histogram')
+        for (plugin, method), series in sorted(calls.items()):
+            labels = f'plugin="{escape(plugin)}",method="{method}"'
+            total = 0
+            for bound, count in zip(self.buckets, series):
+                total += count
+                lines.append(f'spider_call_seconds_bucket{{{labels},le="{bound}"}} {total}')
+            total += series[-2]
+            lines.append(f'spider_call_seconds_bucket{{{labels},le="+Inf"}} {total}')
+            lines.append(f'spider_call_seconds_sum{{{labels}}} {series[-1]:.6f}')
+            lines.append(f'spider_call_seconds_count{{{labels}}} {total}')
+        lines.append('# TYPE spider_call_errors_total counter')
+        for (plugin, method), count in sorted(errors.items()):
+            lines.append(f'spider_call_errors_total{{plugin="{escape(plugin)}",method="{method}"}} {count}')
+        lines.append('# TYPE spider_upstream_requests_total counter')
+        for (plugin, method), count in sorted(upstream.items()):
+            lines.append(f'spider_upstream_requests_total{{plugin="{escape(plugin)}",method="{method}"}} {count}')
+        lines.append('# TYPE spider_upstream_bytes_total counter')
+        for plugin, count in sorted(size.items()):
+            lines.append(f'spider_upstream_bytes_total{{plugin="{escape(plugin)}"}} {count}')
+        lines.append('# TYPE spider_cache_hits_total counter')
+        for (plugin, tier), count in sorted(hits.items()):
+            lines.append(f'spider_cache_hits_total{{plugin="{escape(plugin)}",tier="{tier}"}} {count}')
+        for name, value in (gauges or {}).items():
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+def escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+metrics = Metrics()
@@ -0,0 +1,134 @@
+import time
+from threading import Lock
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait as waitFutures
+
+class HostStats:
+    __slots__ = ('latency', 'failures', 'probedAt')
+
+    def __init__(self):
+        self.latency = None  # 成功探测耗时的 EWMA, 秒
+        self.failures = 0.0  # 失败分: 每次失败 +1, 每次成功减半
+        self.probedAt = 0
+
+class MirrorSelector:
+    """
+    插件镜像域名选择: 并发探测一组镜像, 最先成功的胜出, 其余探测在后台继续更新延迟.
+    每个域名维护 EWMA 延迟与失败分; 胜者按组缓存 ttl 秒, 过期后先返回旧胜者再后台重新探测.
+    请求失败时 failover 立即切换到同组得分次优的镜像.
+    """
+
+    def __init__(self, ttl=600, alpha=0.3, timeout=1.0, workers=16):
+        self.ttl = ttl
+        self.alpha = alpha
+        self.timeout = timeout
+        self.hosts = {}    # 镜像地址 -> HostStats
+        self.groups = {}   # 镜像组(tuple) -> [胜者, 选出时间, 是否正在刷新]
+        self.members = {}  # netloc -> {镜像地址: 镜像组}, 供 failover 由请求地址反查
+        self.lock = Lock()
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='mirrorProbe')
+        self.stats = {'probes': 0, 'cached': 0, 'refreshed': 0, 'failovers': 0}
+
+    def stat(self, host):
+        return self.hosts.setdefault(host, HostStats())
+
+    def score(self, host):
+        # 越小越好; 没有成功记录的排最后, 失败分按倍数放大延迟
+        stat = self.hosts.get(host)
+        if stat is None or stat.latency is None:
+            return float('inf')
+        return stat.latency * (1 + stat.failures * 4)
+
+    def ranked(self, group, exclude=()):
+        return sorted((h for h in group if h not in exclude), key=lambda h: (self.score(h), group.index(h)))
+
+    def observe(self, host, latency=None):
+        with self.lock:
+            stat = self.stat(host)
+            stat.probedAt = time.time()
+            if latency is None:
+                stat.failures += 1
+            else:
+                stat.latency = latency if stat.latency is None else stat.latency + self.alpha * (latency - stat.latency)
+                stat.failures /= 2
+
+    def probeOne(self, host, probe):
+        start = time.perf_counter()
+        try:
+            probe(host)
+        except Exception:
+            self.observe(host)
+            raise
+        self.observe(host, time.perf_counter() - start)
+        return host
+
+    def probe(self, group, probe, timeout=None):
+        # 全部并发探测, 第一个成功的直接返回; timeout 秒内(默认 self.timeout)都未成功时返回得分最优(或第一个)的镜像
+        with self.lock:
+            self.stats['probes'] += 1
+        futures = {self.pool.submit(self.probeOne, host, probe) for host in group}
+        end = time.time() + (self.timeout if timeout is None else timeout)
+        while futures and time.time() < end:
+            done, futures = waitFutures(futures, timeout=max(end - time.time(), 0), return_when=FIRST_COMPLETED)
+            for future in done:
+                if not future.exception():
+                    return future.result()
+        with self.lock:
+            return self.ranked(group)[0]
+
+    def refresh(self, group, probe, timeout=None):
+        try:
+            winner = self.probe(group, probe, timeout)
+            with self.lock:
+                self.groups[group] = [winner, time.time(), False]
+                self.stats['refreshed'] += 1
+        except Exception:
+            with self.lock:
+                self.groups[group][2] = False
+
+    def select(self, urls, probe, timeout=None):
+        group = tuple(urls)
+        with self.lock:
+            for host in group:
+                self.members.setdefault(urlparse(host).netloc, {})[host] = group
+            entry = self.groups.get(group)
+            if entry:
+                self.stats['cached'] += 1
+                if time.time() - entry[1] > self.ttl and not entry[2]:
+                    entry[2] = True
+                    self.pool.submit(self.refresh, group, probe, timeout)
+                return entry[0]
+        winner = self.probe(group, probe, timeout)
+        with self.lock:
+            self.groups[group] = [winner, time.time(), False]
+        return winner
+
+    def failover(self, url):
+        # url 属于某个镜像组时记一次失败并切换胜者, 返回 (失败的镜像, 次优镜像); 不属于任何组返回 (None, None)
+        with self.lock:
+            candidates = self.members.get(urlparse(url).netloc, {})
+            host = max((h for h in candidates if url.startswith(h)), key=len, default=None)
+            if host is None:
+                return None, None
+            group = candidates[host]
+            stat = self.stat(host)
+            stat.failures += 1
+            stat.probedAt = time.time()
+            others = self.ranked(group, exclude=(host,))
+            if not others:
+                return host, None
+            self.groups[group] = [others[0], time.time(), False]
+            self.stats['failovers'] += 1
+            return host, others[0]
+
+    def clear(self):
+        with self.lock:
+            self.hosts.clear()
+            self.groups.clear()
+            self.members.clear()
+
+    def info(self):
+        with self.lock:
+            return dict(self.stats, groups=len(self.groups), hosts=len(self.hosts))
+
+selector = MirrorSelector()
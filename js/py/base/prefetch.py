@@ -0,0 +1,105 @@
+import time
+from threading import Lock, Event
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+class Segment:
+    __slots__ = ('data', 'ready', 'startedAt')
+
+    def __init__(self):
+        self.data = None
+        self.ready = Event()
+        self.startedAt = time.time()
+
+class SegmentBuffer:
+    """
+    直播代理的 TS 预取环形缓冲: 刷新播放列表时后台下载后续片段, 播放器请求时直接取走.
+    片段数与总字节数都有上限, 超出时丢弃最早的片段; 已播放的片段取走即释放.
+    """
+
+    def __init__(self, maxSegments=32, maxBytes=64 * 1024 * 1024, workers=4):
+        self.maxSegments = maxSegments
+        self.maxBytes = maxBytes
+        self.entries = OrderedDict()  # url -> Segment
+        self.played = OrderedDict()   # 最近播放过的 url, 用于定位播放进度
+        self.size = 0
+        self.lock = Lock()
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='segmentPrefetch')
+        self.stats = {'scheduled': 0, 'hits': 0, 'misses': 0, 'failed': 0, 'evicted': 0}
+
+    def schedule(self, urls, fetch, count, edge=None):
+        # 从最近播放的片段之后开始预取; 尚未播放时取列表末尾, 与播放器的直播起播位置一致
+        # edge 为源站上已生成的最新片段的下标, 之后的片段还不存在, 不预取
+        if edge is not None:
+            urls = urls[:edge + 1]
+        with self.lock:
+            last = max((i for i, url in enumerate(urls) if url in self.played), default=None)
+            start = last + 1 if last is not None else max(len(urls) - count, 0)
+            todo = [url for url in urls[start:start + count] if url not in self.entries and url not in self.played]
+            for url in todo:
+                self.entries[url] = Segment()
+                self.stats['scheduled'] += 1
+            self.evict()
+        for url in todo:
+            self.pool.submit(self.download, url, fetch)
+
+    def download(self, url, fetch):
+        with self.lock:
+            segment = self.entries.get(url)
+        if segment is None:
+            return
+        try:
+            rsp = fetch(url)
+            data = rsp.content if rsp.status_code in (200, 206) else None
+        except Exception:
+            data = None
+        with self.lock:
+            if self.entries.get(url) is segment:
+                if data is None:
+                    # 失败的片段不占位, 下次刷新列表时可重新预取
+                    del self.entries[url]
+                    self.stats['failed'] += 1
+                else:
+                    segment.data = data
+                    self.size += len(data)
+                    self.evict()
+        segment.ready.set()
+
+    def take(self, url, timeout=10):
+        # 下载中的片段等待完成, 不再重复回源; 未预取或失败时返回 None
+        with self.lock:
+            self.played[url] = None
+            while len(self.played) > self.maxSegments * 4:
+                self.played.popitem(last=False)
+            segment = self.entries.get(url)
+        if segment is not None:
+            segment.ready.wait(timeout)
+            with self.lock:
+                if self.entries.get(url) is segment and segment.data is not None:
+                    del self.entries[url]
+                    self.size -= len(segment.data)
+                    self.stats['hits'] += 1
+                    return segment.data
+        with self.lock:
+            self.stats['misses'] += 1
+        return None
+
+    def evict(self):
+        while self.entries and (len(self.entries) > self.maxSegments or self.size > self.maxBytes):
+            _, segment = self.entries.popitem(last=False)
+            if segment.data is not None:
+                self.size -= len(segment.data)
+            self.stats['evicted'] += 1
+
+    def clear(self):
+        # 下载中的片段完成后发现已不在 entries 里, 不会再写入
+        with self.lock:
+            self.entries.clear()
+            self.played.clear()
+            self.size = 0
+
+    def info(self):
+        with self.lock:
+            return dict(self.stats, entries=len(self.entries), bytes=self.size)
+
+segments = SegmentBuffer()
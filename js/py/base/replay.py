@@ -0,0 +1,239 @@
+#coding=utf-8
+#!/usr/bin/python
+# 离线录制/回放: 录制插件所有上游请求, 回放时由本地替身服务器返回录制内容, 用于无网络的性能基准
+import os
+import json
+import time
+import base64
+import hashlib
+import tracemalloc
+from threading import Thread, Lock
+from urllib.parse import urlparse, quote, parse_qs
+from socketserver import ThreadingMixIn
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from requests.adapters import HTTPAdapter
+
+_send = HTTPAdapter.send
+skipHeaders = ('content-encoding', 'content-length', 'transfer-encoding', 'connection')
+
+class FixtureStore:
+    """一个插件一个 jsonl 文件: 第一行是调用序列, 其余每行是一次上游交换"""
+
+    def __init__(self, path):
+        self.path = path
+        self.calls = []
+        self.entries = []
+        self.exact = {}
+        self.byPath = {}
+        self.lock = Lock()
+
+    def key(self, method, url, body):
+        if isinstance(body, str):
+            body = body.encode()
+        return f'{method} {url} {hashlib.sha1(body or b"").hexdigest()}'
+
+    def pathKey(self, method, url):
+        parts = urlparse(url)
+        return f'{method} {parts.netloc}{parts.path}'
+
+    def add(self, request, rsp):
+        entry = {
+            'key': self.key(request.method, request.url, request.body),
+            'path': self.pathKey(request.method, request.url),
+            'status': rsp.status_code,
+            'headers': {k: v for k, v in rsp.headers.items() if k.lower() not in skipHeaders},
+            'body': base64.b64encode(rsp.content).decode()
+        }
+        with self.lock:
+            self.index(entry)
+
+    def index(self, entry):
+        self.entries.append(entry)
+        self.exact.setdefault(entry['key'], entry)
+        self.byPath.setdefault(entry['path'], []).append(entry)
+
+    def find(self, key, path, cursor):
+        # 先精确匹配; URL 带时间戳/签名时退回到同路径的录制顺序
+        entry = self.exact.get(key)
+        if entry:
+            return entry
+        candidates = self.byPath.get(path)
+        if candidates:
+            with self.lock:
+                n = cursor.get(path, 0)
+                cursor[path] = n + 1
+            return candidates[n % len(candidates)]
+        return None
+
+    def load(self):
+        with open(self.path, encoding='utf-8') as f:
+            self.calls = json.loads(f.readline())
+            for line in f:
+                self.index(json.loads(line))
+        return self
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(self.calls, ensure_ascii=False) + '\n')
+            for entry in self.entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    store = None
+    cursor = {}
+    misses = []
+
+    def replay(self):
+        query = parse_qs(urlparse(self.path).query)
+        key, path = query['key'][0], query['path'][0]
+        entry = self.store.find(key, path, self.cursor)
+        if entry is None:
+            self.misses.append(key)
+            status, headers, body = 404, {'X-Replay-Miss': '1'}, b''
+        else:
+            status, headers, body = entry['status'], entry['headers'], base64.b64decode(entry['body'])
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_HEAD = do_PUT = do_DELETE = do_OPTIONS = replay
+
+    def log_message(self, format, *args):
+        pass
+
+class ReplayServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+class Session:
+    """录制或回放期间替换 HTTPAdapter.send, 插件直接用 requests 的请求也会被接管"""
+
+    def __init__(self, store, mode):
+        self.store = store
+        self.mode = mode
+        self.upstream = 0
+        self.server = None
+
+    def __enter__(self):
+        if self.mode == 'replay':
+            handler = type('Handler', (ReplayHandler,), {'store': self.store, 'cursor': {}, 'misses': []})
+            self.server = ReplayServer(('127.0.0.1', 0), handler)
+            Thread(target=self.server.serve_forever, daemon=True).start()
+        session = self
+
+        def send(adapter, request, **kwargs):
+            session.upstream += 1
+            if session.mode == 'record':
+                rsp = _send(adapter, request, **kwargs)
+                session.store.add(request, rsp)
+                return rsp
+            return session.replay(adapter, request, **kwargs)
+        HTTPAdapter.send = send
+        return self
+
+    def replay(self, adapter, request, **kwargs):
+        original = request.url
+        key = self.store.key(request.method, request.url, request.body)
+        path = self.store.pathKey(request.method, request.url)
+        local = request.copy()
+        local.url = f'http://127.0.0.1:{self.server.server_address[1]}/replay?key={quote(key)}&path={quote(path)}'
+        kwargs['verify'] = False
+        # 回放服务器在本机, 插件设置的代理(如 kzb 的 self.proxy)不能再用, 否则离线时回放失败
+        kwargs['proxies'] = {}
+        rsp = _send(adapter, local, **kwargs)
+        rsp.url = original
+        rsp.request = request
+        return rsp
+
+    def misses(self):
+        return self.server.RequestHandlerClass.misses if self.server else []
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        HTTPAdapter.send = _send
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+        return False
+
+def firstEpisode(detail):
+    vod = detail['list'][0]
+    flag = vod['vod_play_from'].split('$$$')[0]
+    episode = vod['vod_play_url'].split('$$$')[0].split('#')[0]
+    return [flag, episode.split('$')[-1], []]
+
+def scenario(sp, keyword, calls):
+    """按 首页 -> 分类 -> 详情 -> 播放, 搜索 的顺序依次调用, 参数取自上一步的返回"""
+    def call(name, args):
+        result = getattr(sp, name)(*args)
+        calls.append([name, args])
+        return result
+    home = call('homeContent', [False])
+    tid = home['class'][0]['type_id']
+    category = call('categoryContent', [tid, '1', False, {}])
+    detail = call('detailContent', [[category['list'][0]['vod_id']]])
+    call('playerContent', firstEpisode(detail))
+    call('searchContent', [keyword, False, '1'])
+
+def record(sp, path, keyword='繁花', extend=''):
+    # init 也在会话内执行, 它的上游请求(取域名、测速、预建连等)一并录制; 中途失败时保留已完成的调用
+    store = FixtureStore(path)
+    with Session(store, 'record') as session:
+        try:
+            sp.init(extend)
+            scenario(sp, keyword, store.calls)
+        except Exception as erro:
+            print(f'录制中断于第 {len(store.calls) + 1} 步: {erro!r}')
+    store.save()
+    print(f'已录制 {len(store.calls)} 个方法, {session.upstream} 次上游交换 -> {path}')
+    return store
+
+def measure(sp, name, args, session, rounds):
+    # 每轮前清空进程内缓存, 否则第二轮起测到的只是缓存命中
+    walls, cpus = [], []
+    upstream = session.upstream
+    for _ in range(rounds):
+        sp.clearCaches()
+        wall, cpu = time.perf_counter(), time.process_time()
+        getattr(sp, name)(*args)
+        walls.append(time.perf_counter() - wall)
+        cpus.append(time.process_time() - cpu)
+    calls = (session.upstream - upstream) / rounds
+    sp.clearCaches()
+    tracemalloc.start()
+    getattr(sp, name)(*args)
+    current, peak = tracemalloc.get_traced_memory()
+    blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+    tracemalloc.stop()
+    walls.sort()
+    cpus.sort()
+    return {'method': name, 'wall': walls[len(walls) // 2], 'cpu': cpus[len(cpus) // 2], 'peak': peak,
+            'blocks': blocks, 'upstream': calls}
+
+def bench(sp, path, rounds=5, extend=''):
+    store = FixtureStore(path).load()
+    results = []
+    with Session(store, 'replay') as session:
+        try:
+            sp.init(extend)
+        except Exception as erro:
+            print(f'init 失败: {erro!r}')
+        for name, args in store.calls:
+            try:
+                results.append(measure(sp, name, args, session, rounds))
+            except Exception as erro:
+                results.append({'method': name, 'error': repr(erro)})
+        misses = len(session.misses())
+    for r in results:
+        if 'error' in r:
+            print(f"{r['method']:<16} 失败 {r['error']}")
+        else:
+            print(f"{r['method']:<16} 耗时 {r['wall'] * 1000:8.2f}ms  CPU {r['cpu'] * 1000:8.2f}ms  "
+                  f"峰值内存 {r['peak'] / 1024:8.1f}KB  存活块 {r['blocks']:6d}  上游 {r['upstream']:.0f}")
+    if misses:
+        print(f'未录制的请求 {misses} 个')
+    return results
@@ -1,19 +1,241 @@
 import re
 import os
+import sys
+import copy
 import json
 import time
+import hmac
+import hashlib
+import inspect
 import requests
 from lxml import etree
+from functools import partial, wraps
+from threading import Lock, Thread, current_thread
+from concurrent.futures import ThreadPoolExecutor, Future, FIRST_COMPLETED, wait as waitFutures
+from collections import OrderedDict, deque
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlparse, parse_qs, quote
+from urllib3.util.retry import Retry
+from requests.adapters import HTTPAdapter
 from abc import abstractmethod, ABCMeta
-from importlib.machinery import SourceFileLoader
 from base.localProxy import Proxy
+from base.httpCache import HttpCache
+from base.loader import loadPlugin
+from base.metrics import metrics
+
+# 按 scheme://host 共享的连接池会话, 所有插件共用
+_sessions = {}
+_sessionLock = Lock()
+# getCache/setCache 的进程内 LRU 层, 值为 (写入时间, 写入代理的原文, expiresAt), 写穿到本地代理
+_memCache = OrderedDict()
+_memLock = Lock()
+_memStats = {'hits': 0, 'misses': 0}
+# 单飞: 相同请求在途时共用一次上游调用
+_inflight = {}
+_inflightLock = Lock()
+# fetch 的 HTTP 响应缓存, 只对插件 cacheRules 命中的 URL 生效
+_httpCache = HttpCache()
+
+# 进程级有界线程池: self.executor() 与 AsyncSpider 共用, 避免每次调用新建线程
+_workerPool = ThreadPoolExecutor(max_workers=32, thread_name_prefix='spiderWorker')
+_workerBacklog = {}
+_workerStats = {}
+_workerLock = Lock()
+# prewarm: 源站 -> 上次预建连时间; 预建连用单独的小线程池, 不占插件任务的名额
+_warmed = {}
+_warmLock = Lock()
+_warmPool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='spiderWarm')
+# race() 的对冲请求单独用一个池, 避免在 spiderWorker 线程里调用时占满共享池
+_racePool = ThreadPoolExecutor(max_workers=16, thread_name_prefix='spiderRace')
+# thumb() 地址签名用的进程内密钥, 代理重启后旧地址随列表一起重新生成
+_thumbSecret = os.urandom(16)
+# 镜像组(候选 host 元组) -> 上次胜出的 host
+_raceWinners = {}
+# AsyncSpider 共用的事件循环(后台线程)
+_loop = None
+_loopLock = Lock()
+
+def eventLoop():
+    import asyncio
+    global _loop
+    with _loopLock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            Thread(target=_loop.run_forever, name='spiderLoop', daemon=True).start()
+    return _loop
+
+def executorStats():
+    with _workerLock:
+        plugins = {name: dict(stats) for name, stats in _workerStats.items()}
+    return {'threads': len(_workerPool._threads), 'queued': _workerPool._work_queue.qsize(), 'plugins': plugins}
+
+def closeResponse(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+def thumbProxy(method):
+    # 插件自己的 localProxy 之前先处理 thumb() 生成的缩略图请求
+    @wraps(method)
+    def wrapper(self, param, *args, **kwargs):
+        if isinstance(param, dict) and param.get('thumb'):
+            return self.thumbnail(param)
+        return method(self, param, *args, **kwargs)
+    return wrapper
+
+def warmAfterInit(method):
+    # 插件 init 选好 host 后立即在后台建连, 首个 homeContent 直接复用连接池里的连接
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        self.prewarm(getattr(self, name, None) for name in self.warmAttrs)
+        return result
+    return wrapper
+
+class PluginExecutor:
+    """
+    self.executor() 返回的对象, submit/map 与 ThreadPoolExecutor 用法一致, 可直接替换 with ThreadPoolExecutor(...) as executor.
+    任务提交到共享线程池, 每个插件同时运行的任务数受 quota 限制; submit 不阻塞, 超出配额的任务排队, 有任务结束时依次启动.
+    """
+
+    def __init__(self, name, quota):
+        self.name = name
+        self.quota = quota
+        with _workerLock:
+            if name not in _workerStats:
+                _workerBacklog[name] = deque()
+                _workerStats[name] = {'submitted': 0, 'running': 0, 'peak': 0, 'waiting': 0, 'inline': 0}
+            self.backlog = _workerBacklog[name]
+            self.stats = _workerStats[name]
+        self.futures = []
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        if current_thread().name.startswith('spiderWorker'):
+            # 已经在共享线程池里, 就地执行, 防止池满时嵌套提交互相等待
+            with _workerLock:
+                self.stats['inline'] += 1
+            if future.set_running_or_notify_cancel():
+                self.call(future, fn, args, kwargs)
+        else:
+            with _workerLock:
+                self.stats['submitted'] += 1
+                start = self.stats['running'] < self.quota
+                if start:
+                    self.stats['running'] += 1
+                    self.stats['peak'] = max(self.stats['peak'], self.stats['running'])
+                else:
+                    self.backlog.append((future, fn, args, kwargs))
+                    self.stats['waiting'] += 1
+            if start:
+                self.start(future, fn, args, kwargs)
+        self.futures.append(future)
+        return future
+
+    def start(self, future, fn, args, kwargs):
+        try:
+            _workerPool.submit(self.run, future, fn, args, kwargs)
+        except BaseException as e:
+            # 解释器退出时线程池已关闭
+            if future.set_running_or_notify_cancel():
+                future.set_exception(e)
+            self.done()
+
+    def run(self, future, fn, args, kwargs):
+        try:
+            if future.set_running_or_notify_cancel():
+                self.call(future, fn, args, kwargs)
+        finally:
+            self.done()
+
+    def call(self, future, fn, args, kwargs):
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+
+    def done(self):
+        # 空出的名额直接交给排队的下一个任务
+        with _workerLock:
+            if self.backlog:
+                item = self.backlog.popleft()
+                self.stats['waiting'] -= 1
+            else:
+                item = None
+                self.stats['running'] -= 1
+        if item:
+            self.start(*item)
+
+    def map(self, fn, *iterables, timeout=None):
+        futures = [self.submit(fn, *args) for args in zip(*iterables)]
+        return (future.result(timeout) for future in futures)
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        if cancel_futures:
+            for future in self.futures:
+                future.cancel()
+        if wait:
+            waitFutures(self.futures)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+        return False
 
 class Spider(metaclass=ABCMeta):
     _instance = None
+    # 连接池配置, 插件可覆盖
+    poolConnections = 10
+    poolMaxsize = 20
+    poolRetries = 1
+    poolBackoff = 0.2
+    poolKeepAlive = True
+    # 进程内缓存的容量与最长驻留时间(秒), 超时后回源到代理以便看到外部写入
+    memCacheSize = 512
+    memCacheTtl = 600
+    # 每个插件(按文件路径区分)在共享线程池中同时运行的任务上限, 超出的任务排队
+    workerQuota = 16
+    # 定义插件类的文件路径, 由 __init_subclass__ 填写; 同名的插件副本各自独立计配额
+    pluginPath = None
+    # 合并并发的相同 GET 请求(URL/参数/请求头/cookies 一致), 默认关闭
+    coalesce = False
+    # 响应缓存规则 {URL 正则: 新鲜期秒数}, 过期后用 ETag/Last-Modified 条件请求回源
+    cacheRules = {}
+    # 直播代理刷新播放列表时后台预取的后续片段数, 0 为关闭
+    prefetchCount = 3
+    # 改用 DoH 解析的域名(防污染), fetch/post 这些域名时连接 DoH 解析出的 IP; 只作用于本插件的会话
+    dohHosts = []
+    # init 结束后在后台预先建连的属性, 值为 http(s) 地址时生效; 为空则关闭
+    warmAttrs = ('host',)
+    # thumb() 缩略图的默认宽度与 JPEG 质量
+    thumbWidth = 300
+    thumbQuality = 80
+    # 下载 thumb() 原图时使用的请求头, 需要 Referer 等的插件自行覆盖
+    thumbHeaders = None
+    # 宿主能否接收迭代器作为 localProxy 的 body; TVBox 只认 bytes/str, 由 local.py 的 do=py 路由置 True
+    streamBody = False
+
+    # 记录耗时与异常的 TVBox 入口方法
+    timedMethods = ('homeContent', 'homeVideoContent', 'categoryContent', 'detailContent', 'searchContent',
+                    'playerContent', 'localProxy')
 
     def __init__(self):
         self.extend = ''
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # 类定义时 sys.modules 里的正是正在执行的插件模块; 之后可能被同名副本覆盖
+        cls.pluginPath = getattr(sys.modules.get(cls.__module__), '__file__', None) or cls.__module__
+        if 'localProxy' in cls.__dict__:
+            cls.localProxy = thumbProxy(cls.__dict__['localProxy'])
+        if callable(cls.__dict__.get('init')) and not inspect.iscoroutinefunction(cls.__dict__['init']):
+            cls.init = warmAfterInit(cls.__dict__['init'])
+        for name in cls.timedMethods:
+            method = cls.__dict__.get(name)
+            if callable(method) and not inspect.iscoroutinefunction(method):
+                setattr(cls, name, metrics.timed(method, name))
+
     def __new__(cls, *args, **kwargs):
         if cls._instance:
             return cls._instance
@@ -47,7 +269,8 @@ class Spider(metaclass=ABCMeta):
         pass
 
     def localProxy(self, param):
-        pass
+        if param.get('thumb'):
+            return self.thumbnail(param)
 
     def isVideoFormat(self, url):
         pass
@@ -72,7 +295,10 @@ class Spider(metaclass=ABCMeta):
 
     def loadModule(self, name):
         path = os.path.join(os.path.join("../plugin"),  f'{name}.py')
-        return SourceFileLoader(name, path).load_module()
+        return loadPlugin(path, name)
+
+    def executor(self):
+        return PluginExecutor(self.pluginPath, self.workerQuota)
 
     def regStr(self, reg, src, group=1):
         m = re.search(reg, src)
@@ -90,20 +316,338 @@ class Spider(metaclass=ABCMeta):
                        src)
         return clean
 
+    def getSession(self, url, retries=None):
+        # retries 为 None 时用插件的 poolRetries; 镜像探测传 0, 死链立即失败
+        retries = self.poolRetries if retries is None else retries
+        parts = urlparse(url)
+        # dohHosts 里的域名用单独的会话连接 DoH 解析出的 IP, 其他插件访问同一域名不受影响
+        pinned = bool(self.dohHosts) and parts.hostname in self.dohHosts
+        # 连接池与重试配置不同的插件各用各的会话, 否则后来的插件会沿用先建会话者的配置
+        key = (f'{parts.scheme}://{parts.netloc}', self.poolConnections, self.poolMaxsize, retries,
+               self.poolBackoff, self.poolKeepAlive, pinned)
+        session = _sessions.get(key)
+        if session is None:
+            with _sessionLock:
+                session = _sessions.get(key)
+                if session is None:
+                    session = self.newSession(retries, pinned)
+                    _sessions[key] = session
+        return session
+
+    def newSession(self, retries=None, pinned=False):
+        retries = self.poolRetries if retries is None else retries
+        session = requests.Session()
+        # 不在共享会话里保存响应 cookie, 避免插件之间串号; 显式传入的 cookies 仍然生效
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        if not self.poolKeepAlive:
+            session.headers['Connection'] = 'close'
+        retry = Retry(total=retries, connect=retries, read=0, backoff_factor=self.poolBackoff,
+                      allowed_methods=Retry.DEFAULT_ALLOWED_METHODS, raise_on_status=False)
+        options = dict(pool_connections=self.poolConnections, pool_maxsize=self.poolMaxsize, max_retries=retry)
+        if pinned:
+            from base import doh
+            adapter = doh.PinnedAdapter(doh.addresses, **options)
+        else:
+            adapter = HTTPAdapter(**options)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def closeSessions(self):
+        with _sessionLock:
+            for session in _sessions.values():
+                session.close()
+            _sessions.clear()
+        with _warmLock:
+            _warmed.clear()
+
     def fetch(self, url, params=None, cookies=None, headers=None, timeout=5, verify=True, stream=False,
               allow_redirects=True):
-        rsp = requests.get(url, params=params, cookies=cookies, headers=headers, timeout=timeout, verify=verify,
-                           stream=stream, allow_redirects=allow_redirects)
+        request = partial(self.upstream, 'GET', self.getSession(url).get, url, params=params, cookies=cookies,
+                          headers=headers, timeout=timeout, verify=verify, stream=stream,
+                          allow_redirects=allow_redirects)
+        ttl = None if stream else self.cacheTtl(url)
+        if ttl is not None or self.coalesce and not stream:
+            key = json.dumps(['GET', url, params, headers, cookies, verify, allow_redirects], sort_keys=True,
+                             default=str)
+        if ttl is not None:
+            request = partial(self.cachedRequest, key, ttl, request, headers)
+        if self.coalesce and not stream:
+            rsp = copy.copy(self.singleFlight(key, request))
+        else:
+            rsp = request()
         rsp.encoding = 'utf-8'
         return rsp
 
+    def cacheTtl(self, url):
+        for pattern, ttl in self.cacheRules.items():
+            if re.search(pattern, url):
+                return ttl
+        return None
+
+    def cachedRequest(self, key, ttl, request, headers):
+        entry = _httpCache.get(key)
+        if entry and _httpCache.isFresh(entry, ttl):
+            _httpCache.count('hits', entry)
+            metrics.hit(type(self).__module__, 'http')
+            return _httpCache.response(entry)
+        validators = _httpCache.validators(entry) if entry else {}
+        rsp = request(headers=dict(headers or {}, **validators)) if validators else request()
+        if rsp.status_code == 304 and entry:
+            _httpCache.refresh(entry, rsp)
+            _httpCache.count('revalidated', entry)
+            metrics.hit(type(self).__module__, 'http304')
+            return _httpCache.response(entry)
+        _httpCache.count('misses')
+        if rsp.status_code == 200:
+            _httpCache.put(key, rsp)
+        return rsp
+
+    def singleFlight(self, key, func):
+        with _inflightLock:
+            future = _inflight.get(key)
+            leader = future is None
+            if leader:
+                future = _inflight[key] = Future()
+        if leader:
+            try:
+                future.set_result(func())
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                with _inflightLock:
+                    _inflight.pop(key, None)
+        return future.result()
+
+    def upstream(self, method, send, *args, **kwargs):
+        try:
+            rsp = send(*args, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            # 请求的是 pickHost 选出的镜像时立即换次优镜像重试一次
+            url = self.failover(args[0])
+            if url is None:
+                raise
+            rsp = getattr(self.getSession(url), method.lower())(url, *args[1:], **kwargs)
+        # getCache/setCache/delCache 访问的本地代理不是上游, 不计入上游请求与字节数
+        if not args[0].startswith(f'http://127.0.0.1:{Proxy.getPort()}/'):
+            size = len(rsp._content) if isinstance(rsp._content, bytes) else int(rsp.headers.get('Content-Length') or 0)
+            metrics.request(type(self).__module__, method, size)
+        return rsp
+
     def post(self, url, params=None, data=None, json=None, cookies=None, headers=None, timeout=5, verify=True,
              stream=False, allow_redirects=True):
-        rsp = requests.post(url, params=params, data=data, json=json, cookies=cookies, headers=headers, timeout=timeout,
-                            verify=verify, stream=stream, allow_redirects=allow_redirects)
+        rsp = self.upstream('POST', self.getSession(url).post, url, params=params, data=data, json=json,
+                            cookies=cookies, headers=headers, timeout=timeout, verify=verify, stream=stream,
+                            allow_redirects=allow_redirects)
         rsp.encoding = 'utf-8'
         return rsp
 
+    def relay(self, rsp, chunkSize=64 * 1024):
+        # localProxy 可把它作为 body 返回, 代理边收边发; 读完或客户端断开时释放上游连接
+        try:
+            for chunk in rsp.iter_content(chunkSize):
+                if chunk:
+                    yield chunk
+        finally:
+            rsp.close()
+
+    def media(self, rsp, mime='application/octet-stream', code=206):
+        # 转发 stream=True 的媒体响应: 宿主支持流式时边收边发, 并带上上游的状态码、长度与范围; 否则照旧返回完整字节
+        if not self.streamBody:
+            try:
+                return [code, mime, rsp.content]
+            finally:
+                rsp.close()
+        # iter_content 会解压, 上游带 Content-Encoding 时长度对不上, 不转发
+        names = ('Content-Range', 'Accept-Ranges') if rsp.headers.get('Content-Encoding') else \
+            ('Content-Length', 'Content-Range', 'Accept-Ranges')
+        return [rsp.status_code, mime, self.relay(rsp), {k: rsp.headers[k] for k in names if k in rsp.headers}]
+
+    def race(self, urls, headers=None, hedge=0.3, timeout=5, ok=(200, 206)):
+        """
+        同一资源的多个镜像地址对冲请求: 先请求该组上次胜出的 host, hedge 秒内没有结果再加发下一个,
+        失败立即换下一个. 最先返回 ok 状态的响应(stream=True)直接返回给调用方转发, 其余关闭; 全部失败返回 None.
+        """
+        hosts = tuple(sorted({urlparse(url).netloc for url in urls}))
+        best = _raceWinners.get(hosts)
+        pending = sorted(urls, key=lambda url: urlparse(url).netloc != best)
+        futures, winner = {}, None
+        end = time.time() + timeout
+        while winner is None and (pending or futures) and time.time() < end:
+            if pending:
+                url = pending.pop(0)
+                futures[_racePool.submit(self.fetch, url, headers=headers, stream=True, timeout=timeout)] = url
+            done, _ = waitFutures(futures, timeout=hedge if pending else max(end - time.time(), 0),
+                                  return_when=FIRST_COMPLETED)
+            for future in done:
+                url = futures.pop(future)
+                rsp = None if future.exception() else future.result()
+                if rsp is not None and winner is None and rsp.status_code in ok:
+                    winner = url, rsp
+                elif rsp is not None:
+                    rsp.close()
+        for future in futures:
+            future.add_done_callback(closeResponse)
+        if winner is None:
+            return None
+        _raceWinners[hosts] = urlparse(winner[0]).netloc
+        return winner[1]
+
+    def prewarm(self, urls, connections=1):
+        # 后台完成 DNS/TCP/TLS 握手, 每个源站放 connections 条空闲连接进共享连接池
+        origins = {f'{p.scheme}://{p.netloc}' for p in
+                   (urlparse(u) for u in urls if isinstance(u, str) and u.startswith('http'))}
+        now = time.time()
+        with _warmLock:
+            # 一分钟内预热过的源站连接池里已有空闲连接, 重复 init 时跳过
+            todo = [origin for origin in origins if now - _warmed.get(origin, 0) >= 60]
+            for origin in todo:
+                _warmed[origin] = now
+        for origin in todo:
+            for _ in range(connections):
+                _warmPool.submit(self.warmConnection, origin)
+
+    def warmConnection(self, origin):
+        # HEAD 不带响应体, 读完后连接自动归还连接池
+        try:
+            self.getSession(origin).head(f'{origin}/', timeout=5, allow_redirects=False)
+        except Exception:
+            pass
+
+    def resolve(self, name, qtype='A'):
+        # DoH 查询, 返回 doh.Answer(canonical 为 CNAME 链末端, values 为记录值), 按 TTL 缓存
+        from base import doh
+        return doh.resolver.lookup(name, qtype)
+
+    def addresses(self, name):
+        # 连接 dohHosts 时实际使用的地址: A/AAAA 并发查询, 优先 A; 解析失败返回空列表
+        from base import doh
+        return doh.resolver.addresses(name)
+
+    def pickHost(self, urls, headers=None, proxies=None, timeout=1.0, strict=False):
+        """
+        从镜像列表(逗号分隔的字符串或列表)中选出最快的, 替代各插件的 host_late.
+        结果按组缓存并在后台刷新, 之后对该组镜像的请求连接失败时自动切到次优镜像.
+        strict 为 True 时探测需返回 2xx/3xx 才算可用, 否则能连通即可.
+        """
+        urls = [u.strip() for u in urls.split(',')] if isinstance(urls, str) else [u.strip() for u in urls]
+        urls = [u for u in urls if u]
+        if len(urls) <= 1:
+            return urls[0] if urls else ''
+        from base import mirrors
+        probe = partial(self.probeHost, headers=headers, proxies=proxies, timeout=timeout, strict=strict)
+        return mirrors.selector.select(urls, probe, timeout)
+
+    def probeHost(self, url, headers=None, proxies=None, timeout=1.0, strict=False):
+        # 不重试: 死链一次连接失败即出局, 不再按 poolRetries 退避重连
+        rsp = self.getSession(url, retries=0).head(url, headers=headers, proxies=proxies, timeout=timeout,
+                                                   allow_redirects=False)
+        if strict:
+            rsp.raise_for_status()
+
+    def failover(self, url):
+        # 记录镜像失败并返回换到次优镜像后的地址; 插件属性里保存的旧镜像地址一并替换
+        from base import mirrors
+        host, nextHost = mirrors.selector.failover(url)
+        if nextHost is None:
+            return None
+        for name, value in list(vars(self).items()):
+            if value == host:
+                setattr(self, name, nextHost)
+        return nextHost + url[len(host):]
+
+    def loadPlaylist(self, url, headers=None, fetch=None, **kwargs):
+        # 返回解析后的 hls.Playlist, 按 EXT-X-TARGETDURATION 缓存; fetch 默认走连接池
+        from base import hls
+        return hls.load(fetch or self.fetch, url, headers=headers, **kwargs)
+
+    def prefetch(self, urls, headers=None, fetch=None, edge=None):
+        # urls 为播放列表中按顺序排列的原始片段地址, fetch(url) 需返回 Response
+        # 列表按时间推算、含尚未生成的片段时, edge 传直播边缘(已生成的最新片段)的下标, 只预取它及之前的片段
+        if self.prefetchCount:
+            from base.prefetch import segments
+            fetch = fetch or partial(self.fetch, headers=headers, timeout=10)
+            segments.schedule(list(urls), fetch, self.prefetchCount, edge)
+
+    def prefetched(self, url, timeout=10):
+        from base.prefetch import segments
+        return segments.take(url, timeout)
+
+    def cachedKey(self, uri, produce, contentId='', ttl=None):
+        # localProxy 密钥分支用: produce() -> (bytes, mime) 负责带令牌回源, 同一密钥在 ttl 内只取一次
+        from base import hls
+        data, mime = hls.keys.load(type(self).__module__, uri, contentId, produce, ttl)
+        return [200, mime or 'application/octet-stream', data]
+
+    def invalidateKeys(self):
+        # 令牌更换后调用, 丢弃本插件缓存的全部密钥
+        from base import hls
+        hls.keys.invalidate(type(self).__module__)
+
+    def cachedImage(self, source, produce):
+        # localProxy 图片分支用: produce(source) -> (bytes, mime) 负责下载解密, 结果落盘按内容去重
+        # produce 出错时应抛异常: 不写入缓存, 返回 502, 下次请求重新下载
+        from base import images
+        try:
+            data, mime = images.pipeline().load(f'{type(self).__module__}:{source}', partial(produce, source))
+        except Exception:
+            return [502, 'text/plain', '']
+        return [200, mime, data]
+
+    def prefetchImages(self, vods, produce, param='url'):
+        # 列表页返回后在后台并发准备所有封面, vod_pic 为指向本地代理、带 url 参数的地址
+        sources = []
+        for vod in vods:
+            query = parse_qs(urlparse(vod.get('vod_pic') or '').query)
+            if query.get(param):
+                sources.append(query[param][0])
+        if sources:
+            Thread(target=self.warmImages, args=(sources, produce), name='imagePrefetch', daemon=True).start()
+
+    def warmImages(self, sources, produce):
+        with self.executor() as executor:
+            for source in sources:
+                executor.submit(self.cachedImage, source, produce)
+
+    def thumb(self, url, width=None):
+        # 把 vod_pic 改写为经本地代理缩放、缓存后的地址; 非 http 地址原样返回
+        # 地址带签名, 代理只取本插件签发过的图片, 不能被当作开放代理访问任意地址
+        if not url or not url.startswith('http'):
+            return url
+        width = int(width or self.thumbWidth)
+        return f'{self.getProxyUrl()}&thumb={width}&url={quote(url, safe="")}&sign={self.thumbSign(width, url)}'
+
+    def thumbs(self, vods, width=None):
+        for vod in vods:
+            vod['vod_pic'] = self.thumb(vod.get('vod_pic'), width)
+        return vods
+
+    def thumbSign(self, width, url):
+        message = f'{type(self).__module__}\n{width}\n{url}'.encode('utf-8')
+        return hmac.new(_thumbSecret, message, hashlib.sha256).hexdigest()[:32]
+
+    def thumbnail(self, param):
+        try:
+            width, url = int(param['thumb']), param['url']
+        except (KeyError, ValueError):
+            return [400, 'text/plain', '']
+        if not hmac.compare_digest(param.get('sign', ''), self.thumbSign(width, url)):
+            return [403, 'text/plain', '']
+        from base import images
+        def produce():
+            # 错误页、验证码页等非图片内容一律抛异常, 不写入缓存
+            rsp = self.fetch(url, headers=self.thumbHeaders, timeout=10)
+            if rsp.status_code != 200:
+                raise IOError(f'thumbnail {rsp.status_code} {url}')
+            if not images.isImageType(rsp.headers.get('Content-Type')):
+                raise IOError(f'thumbnail {rsp.headers.get("Content-Type")} {url}')
+            return images.shrink(rsp.content, width, self.thumbQuality)
+        try:
+            data, mime = images.pipeline().load(f'thumb:{width}:{url}', produce)
+        except Exception:
+            return [502, 'text/plain', '']
+        return [200, mime, data]
+
     def html(self, content):
         return etree.HTML(content)
 
@@ -123,16 +667,16 @@ class Spider(metaclass=ABCMeta):
             print(f'{msg}')
 
     def getCache(self, key):
-        value = self.fetch(f'http://127.0.0.1:{Proxy.getPort()}/cache?do=get&key={key}', timeout=5).text
-        if len(value) > 0:
-            if value.startswith('{') and value.endswith('}') or value.startswith('[') and value.endswith(']'):
-                value = json.loads(value)
-                if type(value) == dict:
-                    if not 'expiresAt' in value or value['expiresAt'] >= int(time.time()):
-                        return value
-                    else:
-                        self.delCache(key)
-                        return None
+        value = self.memGet(key)
+        if value is not None:
+            return value
+        text = self.fetch(f'http://127.0.0.1:{Proxy.getPort()}/cache?do=get&key={key}', timeout=5).text
+        if len(text) > 0:
+            value = self.decodeCache(text)
+            if self.isExpired(value):
+                self.delCache(key)
+                return None
+            self.memPut(key, text, value)
             return value
         else:
             return None
@@ -141,11 +685,120 @@ class Spider(metaclass=ABCMeta):
         if type(value) in [int, float]:
             value = str(value)
         if len(value) > 0:
+            decoded = value if type(value) in [dict, list] else self.decodeCache(value)
             if type(value) == dict or type(value) == list:
                 value = json.dumps(value, ensure_ascii=False)
+            self.memPut(key, value, decoded)
         r = self.post(f'http://127.0.0.1:{Proxy.getPort()}/cache?do=set&key={key}', data={"value": value}, timeout=5)
         return 'succeed' if r.status_code == 200 else 'failed'
 
     def delCache(self, key):
+        self.memDelete(key)
         r = self.fetch(f'http://127.0.0.1:{Proxy.getPort()}/cache?do=del&key={key}', timeout=5)
-        return 'succeed' if r.status_code == 200 else 'failed'
\ No newline at end of file
+        return 'succeed' if r.status_code == 200 else 'failed'
+
+    def decodeCache(self, value):
+        if value.startswith('{') and value.endswith('}') or value.startswith('[') and value.endswith(']'):
+            try:
+                return json.loads(value)
+            except ValueError:
+                pass
+        return value
+
+    def isExpired(self, value):
+        return type(value) == dict and 'expiresAt' in value and value['expiresAt'] < int(time.time())
+
+    def memGet(self, key):
+        # 命中时从原文重新解码, 调用方修改返回的 dict/list 不会影响缓存里的值
+        with _memLock:
+            entry = _memCache.get(key)
+            expired = entry is not None and entry[2] is not None and entry[2] < int(time.time())
+            if entry is not None and time.time() - entry[0] <= self.memCacheTtl and not expired:
+                _memCache.move_to_end(key)
+                _memStats['hits'] += 1
+                metrics.hit(type(self).__module__, 'memory')
+                text = entry[1]
+            else:
+                text = None
+                _memCache.pop(key, None)
+                _memStats['misses'] += 1
+        if text is not None:
+            return self.decodeCache(text)
+        if expired:
+            self.delCache(key)
+        return None
+
+    def memPut(self, key, text, value):
+        # text 为写入代理的字符串, value 为其解码结果, 只用来取 expiresAt
+        expiresAt = value['expiresAt'] if type(value) == dict and 'expiresAt' in value else None
+        with _memLock:
+            _memCache[key] = (time.time(), text, expiresAt)
+            _memCache.move_to_end(key)
+            while len(_memCache) > self.memCacheSize:
+                _memCache.popitem(last=False)
+
+    def memDelete(self, key):
+        with _memLock:
+            _memCache.pop(key, None)
+
+    def cacheStats(self):
+        from base import hls, images, mirrors, doh
+        from base.prefetch import segments
+        with _memLock:
+            return dict(_memStats, size=len(_memCache), http=_httpCache.info(), hls=hls.playlists.info(),
+                        keys=hls.keys.info(), mirrors=mirrors.selector.info(), doh=doh.resolver.info(),
+                        segments=segments.info(), images=images.pipeline().cache.info())
+
+    def clearCaches(self):
+        # 清空进程内各级缓存(不含代理缓存), 供基准测试每轮从冷启动开始
+        from base import hls, images, mirrors, doh
+        from base.prefetch import segments
+        with _memLock:
+            _memCache.clear()
+        for cache in (_httpCache, hls.playlists, hls.keys, segments, mirrors.selector, doh.resolver,
+                      images.pipeline().cache):
+            cache.clear()
+
+
+class AsyncSpider(Spider):
+    """
+    在共享事件循环上运行的爬虫基类.
+    子类可以把 init/homeContent/detailContent 等写成 async def, 会自动包装成同步方法供 TVBox 调用; 并发使用 asyncio.gather.
+    没有非阻塞的 HTTP 客户端可用, fetchInThread/postInThread 只是把阻塞的 fetch/post 交给插件的 PluginExecutor,
+    与 self.executor() 共用连接池和 workerQuota, 并发上限为 workerQuota.
+    """
+    syncMethods = ('init', 'homeContent', 'homeVideoContent', 'categoryContent', 'detailContent', 'searchContent',
+                   'playerContent', 'liveContent', 'localProxy', 'action')
+
+    def __init_subclass__(cls, **kwargs):
+        for name in cls.syncMethods:
+            method = cls.__dict__.get(name)
+            if inspect.iscoroutinefunction(method):
+                setattr(cls, name, cls.syncShim(method))
+        super().__init_subclass__(**kwargs)
+
+    @staticmethod
+    def syncShim(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            return self.runSync(method(self, *args, **kwargs))
+        wrapper.asyncMethod = method
+        return wrapper
+
+    def runSync(self, coro):
+        if current_thread().name == 'spiderLoop':
+            coro.close()
+            raise RuntimeError('runSync called from the event loop, await the coroutine instead')
+        import asyncio
+        return asyncio.run_coroutine_threadsafe(coro, eventLoop()).result()
+
+    async def callInThread(self, func, *args, **kwargs):
+        # 经插件的 PluginExecutor 提交, 与 self.executor() 共用同一份 workerQuota
+        import asyncio
+        return await asyncio.wrap_future(self.executor().submit(func, *args, **kwargs))
+
+    async def fetchInThread(self, url, **kwargs):
+        return await self.callInThread(self.fetch, url, **kwargs)
+
+    async def postInThread(self, url, **kwargs):
+        return await self.callInThread(self.post, url, **kwargs)
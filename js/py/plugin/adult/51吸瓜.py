@@ -4,8 +4,6 @@ import json
 import random
 import re
 import sys
-import threading
-import time
 from base64 import b64decode, b64encode
 from urllib.parse import urlparse
 
@@ -36,7 +34,7 @@ class Spider(Spider):
             'Sec-Fetch-Dest': 'empty',
             'Accept-Language': 'zh-CN,zh;q=0.9',
         }
-        self.host=self.host_late(self.gethosts())
+        self.host=self.pickHost(self.gethosts(), headers=self.headers, proxies=self.proxies)
         self.headers.update({'Origin': self.host, 'Referer': f"{self.host}/"})
         self.getcnh()
         pass
@@ -76,6 +74,7 @@ class Spider(Spider):
         else:
             data = self.getpq(requests.get(f"{self.host}{tid}{pg}", headers=self.headers, proxies=self.proxies).text)
             videos = self.getlist(data('#archive article a'), tid)
+        self.prefetchImages(videos, self.coverImage)
         result = {}
         result['list'] = videos
         result['page'] = pg
@@ -120,11 +119,17 @@ class Spider(Spider):
 
     def localProxy(self, param):
         if param.get('type') == 'img':
-            res=requests.get(param['url'], headers=self.headers, proxies=self.proxies, timeout=10)
-            return [200,res.headers.get('Content-Type'),self.aesimg(res.content)]
+            return self.cachedImage(param['url'], self.coverImage)
         elif param.get('type') == 'm3u8':return self.m3Proxy(param['url'])
         else:return self.tsProxy(param['url'])
 
+    def coverImage(self, url):
+        # 请求失败时抛异常; 解密失败时 aesimg 抛 ValueError, 都不会写入图片缓存
+        res=requests.get(url, headers=self.headers, proxies=self.proxies, timeout=10)
+        if res.status_code != 200:
+            raise Exception(f"封面请求失败: {res.status_code}")
+        return self.aesimg(res.content), res.headers.get('Content-Type')
+
     def proxy(self, data, type='m3u8'):
         if data and len(self.proxies):return f"{self.getProxyUrl()}&url={self.e64(data)}&type={type}"
         else:return data
@@ -262,37 +267,6 @@ class Spider(Spider):
             self.log(f"执行失败: {e}")
             return []
 
-    def host_late(self, url_list):
-        if isinstance(url_list, str):
-            urls = [u.strip() for u in url_list.split(',')]
-        else:
-            urls = url_list
-
-        if len(urls) <= 1:
-            return urls[0] if urls else ''
-
-        results = {}
-        threads = []
-
-        def test_host(url):
-            try:
-                start_time = time.time()
-                response = requests.head(url,headers=self.headers,proxies=self.proxies,timeout=1.0, allow_redirects=False)
-                delay = (time.time() - start_time) * 1000
-                results[url] = delay
-            except Exception as e:
-                results[url] = float('inf')
-
-        for url in urls:
-            t = threading.Thread(target=test_host, args=(url,))
-            threads.append(t)
-            t.start()
-
-        for t in threads:
-            t.join()
-
-        return min(results.items(), key=lambda x: x[1])[0]
-
     def getlist(self, data, tid=''):
         videos = []
         l = '/mrdg' in tid
@@ -1,12 +1,9 @@
 # -*- coding: utf-8 -*-
 # by @嗷呜
 import json
-import re
 import sys
-import threading
 import time
 from base64 import b64decode, b64encode
-import requests
 from Crypto.Cipher import AES
 from Crypto.Hash import MD5
 from Crypto.Util.Padding import unpad
@@ -18,9 +15,9 @@ class Spider(Spider):
 
     def init(self, extend=""):
         self.did = self.getdid()
-        self.token=self.gettoken()
+        self.refreshToken()
         domain=self.domain()
-        self.phost=self.host_late(domain['domain_preview'])
+        self.phost=self.pickHost(domain['domain_preview'])
         self.bhost=domain['domain_original']
         self.names=domain['name_original']
         pass
@@ -127,6 +124,7 @@ class Spider(Spider):
             data=self.getsx(tid, pg, filter, extend)
         elif 'make' in tid:
             data=self.getmake(tid, pg, filter, extend)
+        self.prefetchImages(data, self.coverImage)
         result = {}
         result['list'] = data
         result['page'] = pg
@@ -160,33 +158,45 @@ class Spider(Spider):
 
     def localProxy(self, param):
         if param.get('type')=='image':
-            data=self.fetch(param.get('url'), headers=self.headers).text
-            content=b64decode(data.encode('utf-8'))
-            return [200, 'image/png', content]
+            return self.cachedImage(param.get('url'), self.coverImage)
         if param.get('type')=='m3u8':
             ids=self.d64(param.get('url')).split('@@@')
-            data=self.fetch(ids[0], headers=self.headers).text
-            lines = data.strip().split('\n')
-            for index, string in enumerate(lines):
-                if 'URI=' in string:
-                    replacement = f'URI="{self.getProxyUrl()}&id={ids[1]}&type=mkey"'
-                    lines[index]=re.sub(r'URI="[^"]+"', replacement, string)
-                    continue
-                if '#EXT' not in string and 'http' not in string:
-                    last_slash_index = ids[0].rfind('/')
-                    lpath = ids[0][:last_slash_index + 1]
-                    lines[index] = f'{lpath}{string}'
-            data = '\n'.join(lines)
+            playlist=self.loadPlaylist(ids[0], headers=self.headers)
+            data=playlist.rewrite(key=lambda uri, attrs: f'{self.getProxyUrl()}&id={ids[1]}&type=mkey')
             return [200, 'audio/x-mpegurl', data]
         if param.get('type')=='mkey':
             id=param.get('id')
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Linux; Android 11; M2012K10C Build/RP1A.200720.011; wv) AppleWebKit/537.36 (KHTML, like Gecko) Version/4.0 Chrome/87.0.4280.141 Mobile Safari/537.36',
-                'authdog': self.token
-            }
-            response = self.fetch(f'{self.host}/api/v1/video/key/{id}', headers=headers)
-            type=response.headers.get('Content-Type')
-            return [200, type, response.content]
+            url=f'{self.host}/api/v1/video/key/{id}'
+            try:
+                return self.cachedKey(url, lambda: self.fetchKey(url), id)
+            except Exception:
+                # 令牌失效: 重新获取令牌, 旧令牌下缓存的密钥一并作废后重试一次
+                self.refreshToken()
+            try:
+                return self.cachedKey(url, lambda: self.fetchKey(url), id)
+            except Exception as e:
+                return [502, 'text/plain', str(e)]
+
+    def fetchKey(self, url):
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Linux; Android 11; M2012K10C Build/RP1A.200720.011; wv) AppleWebKit/537.36 (KHTML, like Gecko) Version/4.0 Chrome/87.0.4280.141 Mobile Safari/537.36',
+            'authdog': self.token
+        }
+        response = self.fetch(url, headers=headers)
+        if response.status_code != 200 or len(response.content) != 16:
+            raise Exception(f'key {response.status_code}')
+        return response.content, response.headers.get('Content-Type')
+
+    def refreshToken(self):
+        self.token=self.gettoken()
+        self.invalidateKeys()
+
+    def coverImage(self, url):
+        # 请求或解码失败时抛异常, 错误页不会被当作图片缓存
+        res=self.fetch(url, headers=self.headers)
+        if res.status_code != 200:
+            raise Exception(f"封面请求失败: {res.status_code}")
+        return b64decode(''.join(res.text.split()), validate=True), 'image/png'
 
     def e64(self, text):
         try:
@@ -218,33 +228,6 @@ class Spider(Spider):
             self.setCache('did', did)
             return did
 
-    def host_late(self, url_list):
-        if isinstance(url_list, str):
-            urls = [u.strip() for u in url_list.split(',')]
-        else:
-            urls = url_list
-        if len(urls) <= 1:
-            return urls[0] if urls else ''
-        results = {}
-        threads = []
-
-        def test_host(url):
-            try:
-                start_time = time.time()
-                response = requests.head(url, timeout=1.0, allow_redirects=False)
-                delay = (time.time() - start_time) * 1000
-                results[url] = delay
-            except Exception as e:
-                results[url] = float('inf')
-
-        for url in urls:
-            t = threading.Thread(target=test_host, args=(url,))
-            threads.append(t)
-            t.start()
-        for t in threads:
-            t.join()
-        return min(results.items(), key=lambda x: x[1])[0]
-
     def domain(self):
         headers = {
             'User-Agent': 'Mozilla/5.0 (Linux; Android 11; M2012K10C Build/RP1A.200720.011; wv) AppleWebKit/537.36 (KHTML, like Gecko) Version/4.0 Chrome/87.0.4280.141 Mobile Safari/537.36',
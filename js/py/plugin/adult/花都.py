@@ -3,8 +3,6 @@
 import json
 import re
 import sys
-import threading
-import time
 from base64 import b64encode, b64decode
 from urllib.parse import urlparse
 import requests
@@ -139,7 +137,8 @@ class Spider(Spider):
         }
         self.headers.update({'referer': 'https://a.hdys.top/'})
         response = self.session.get('https://a.hdys.top/assets/js/config.js',proxies=self.proxies, params=params, headers=self.headers)
-        return self.host_late(response.text.split(';')[:-4])
+        hosts=[re.findall(r'"([^"]*)"', i)[0] for i in response.text.split(';')[:-4] if '"' in i]
+        return self.pickHost(hosts, headers=self.headers, proxies=self.proxies)
 
     def getlist(self,data):
         videos=[]
@@ -160,39 +159,6 @@ class Spider(Spider):
             print(f"{str(e)}")
             return pq(data.text.encode('utf-8'))
 
-    def host_late(self, url_list):
-        if isinstance(url_list, str):
-            urls = [u.strip() for u in url_list.split(',')]
-        else:
-            urls = url_list
-
-        if len(urls) <= 1:
-            return urls[0] if urls else ''
-
-        results = {}
-        threads = []
-
-        def test_host(url):
-            try:
-                url=re.findall(r'"([^"]*)"', url)[0]
-                start_time = time.time()
-                self.headers.update({'referer': f'{url}/'})
-                response = requests.head(url,proxies=self.proxies,headers=self.headers,timeout=1.0, allow_redirects=False)
-                delay = (time.time() - start_time) * 1000
-                results[url] = delay
-            except Exception as e:
-                results[url] = float('inf')
-
-        for url in urls:
-            t = threading.Thread(target=test_host, args=(url,))
-            threads.append(t)
-            t.start()
-
-        for t in threads:
-            t.join()
-
-        return min(results.items(), key=lambda x: x[1])[0]
-
     def m3Proxy(self, url):
         ydata = requests.get(url, headers=self.pheader, proxies=self.proxies, allow_redirects=False)
         data = ydata.content.decode('utf-8')
@@ -10,7 +10,6 @@ import requests
 from pyquery import PyQuery as pq
 sys.path.append('..')
 from base.spider import Spider
-from concurrent.futures import ThreadPoolExecutor
 
 
 class Spider(Spider):
@@ -158,7 +157,7 @@ class Spider(Spider):
                                 {'n': '娱乐', 'v': '8'}, {'n': '手游', 'v': '3'}]}]
         }
 
-        with ThreadPoolExecutor(max_workers=3) as executor:
+        with self.executor() as executor:
             futures = {
                 executor.submit(self.process_bili): 'bili',
                 executor.submit(self.process_douyin): 'douyin',
@@ -650,7 +649,7 @@ class Spider(Spider):
             headers = self.gethr(0, zr=f'{self.hosts[ids[0]]}/{sdata["id"]}')
             ldata = json.loads(self.d64(ids[2]))
             result_obj = {}
-            with ThreadPoolExecutor(max_workers=len(ldata)) as executor:
+            with self.executor() as executor:
                 futures = [
                     executor.submit(
                         self.douyufp,
@@ -5,7 +5,6 @@ import sys
 from base64 import b64decode, b64encode
 from Crypto.Cipher import AES
 from Crypto.Util.Padding import unpad, pad
-from concurrent.futures import ThreadPoolExecutor
 sys.path.append('..')
 from base.spider import Spider
 
@@ -46,7 +45,7 @@ class Spider(Spider):
                 'type_id': i['type_id'],
                 'type_name': i['type_name']
             })
-        with ThreadPoolExecutor(max_workers=len(classes)) as executor:
+        with self.executor() as executor:
             futures = [executor.submit(self.getf, i['type_id'])
                        for i in classes]
             for future in futures:
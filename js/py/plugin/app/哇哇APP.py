@@ -5,7 +5,7 @@ import sys
 import time
 import uuid
 from base64 import b64decode, b64encode
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import as_completed
 
 from Crypto.Cipher import AES
 from Crypto.Hash import SHA256, MD5
@@ -246,7 +246,7 @@ class Spider(Spider):
             return None
 
     def try_all_parses(self, parse_urls, target_url):
-        with ThreadPoolExecutor(max_workers=(len(parse_urls))) as executor:
+        with self.executor() as executor:
             future_to_url = {
                 executor.submit(self.fetch_url, parse_url.strip(), target_url): parse_url
                 for parse_url in parse_urls if parse_url.strip()
@@ -4,7 +4,7 @@ from Crypto.Hash import MD5
 sys.path.append("..")
 from Crypto.Cipher import AES
 from Crypto.Util.Padding import pad, unpad
-from urllib.parse import quote, urlparse
+from urllib.parse import quote
 from base64 import b64encode, b64decode
 import json
 import time
@@ -171,21 +171,8 @@ class Spider(Spider):
 
     def Mlocal(self, param, header=None):
         url = self.d64(param["url"])
-        ydata = self.fetch(url, headers=header, allow_redirects=False)
-        data = ydata.content.decode('utf-8')
-        if ydata.headers.get('Location'):
-            url = ydata.headers['Location']
-            data = self.fetch(url, headers=header).content.decode('utf-8')
-        parsed_url = urlparse(url)
-        durl = parsed_url.scheme + "://" + parsed_url.netloc
-        lines = data.strip().split('\n')
-        for index, string in enumerate(lines):
-            if '#EXT' not in string and 'http' not in string:
-                last_slash_index = string.rfind('/')
-                lpath = string[:last_slash_index + 1]
-                lines[index] = durl + ('' if lpath.startswith('/') else '/') + lpath
-        data = '\n'.join(lines)
-        return [200, "application/vnd.apple.mpegur", data]
+        playlist = self.loadPlaylist(url, headers=header)
+        return [200, "application/vnd.apple.mpegur", playlist.rewrite()]
 
     def e64(self, text):
         try:
@@ -1,24 +1,23 @@
 # -*- coding: utf-8 -*-
 # by @嗷呜
 import sys
-from urllib.parse import urlparse
 sys.path.append("..")
 import re
 import hashlib
 import hmac
 import random
 import string
+import asyncio
 from Crypto.Util.Padding import unpad
-from concurrent.futures import ThreadPoolExecutor
 from Crypto.PublicKey import RSA
 from Crypto.Cipher import PKCS1_v1_5, AES
 from base64 import b64encode, b64decode
 import json
 import time
-from base.spider import Spider
+from base.spider import AsyncSpider
 
 
-class Spider(Spider):
+class Spider(AsyncSpider):
 
     def init(self, extend=""):
         self.device = self.device_id()
@@ -112,11 +111,11 @@ class Spider(Spider):
         result["total"] = 999999
         return result
 
-    def detailContent(self, ids):
+    async def detailContent(self, ids):
         body = {"id": ids[0]}
         bba = self.url(body)
         url = f'{self.host}/api/v1/movie/detail?pack={bba[0]}&signature={bba[1]}'
-        data = self.fetch(url, headers=self.header()).json()['data']
+        data = (await self.fetchInThread(url, headers=self.header())).json()['data']
         video = {'vod_name': data.get('name'), 'type_name': data.get('type_name'), 'vod_year': data.get('year'),
                  'vod_area': data.get('area'), 'vod_remarks': data.get('dynami'), 'vod_content': data.get('content')}
         play = []
@@ -132,13 +131,12 @@ class Spider(Spider):
                 tasks.append({"movie_id": ids[0], "from_code": itt["code"]})
                 names.append(name)
         if tasks:
-            with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
-                results = executor.map(self.playlist, tasks)
-                for result in results:
-                    if result:
-                        play.append(result)
-                    else:
-                        play.append("")
+            results = await asyncio.gather(*[self.playlist(task) for task in tasks])
+            for result in results:
+                if result:
+                    play.append(result)
+                else:
+                    play.append("")
         video["vod_play_from"] = "$$$".join(names)
         video["vod_play_url"] = "$$$".join(play)
         result = {"list": [video]}
@@ -186,21 +184,8 @@ class Spider(Spider):
 
     def Mlocal(self, param,header=None):
         url = self.d64(param["url"])
-        ydata = self.fetch(url, headers=header, allow_redirects=False)
-        data = ydata.content.decode('utf-8')
-        if ydata.headers.get('Location'):
-            url = ydata.headers['Location']
-            data = self.fetch(url, headers=header).content.decode('utf-8')
-        parsed_url = urlparse(url)
-        durl = parsed_url.scheme + "://" + parsed_url.netloc
-        lines = data.strip().split('\n')
-        for index, string in enumerate(lines):
-            if '#EXT' not in string and 'http' not in string:
-                last_slash_index = string.rfind('/')
-                lpath = string[:last_slash_index + 1]
-                lines[index] = durl + ('' if lpath.startswith('/') else '/') + lpath
-        data = '\n'.join(lines)
-        return [200, "application/vnd.apple.mpegur", data]
+        playlist = self.loadPlaylist(url, headers=header)
+        return [200, "application/vnd.apple.mpegur", playlist.rewrite()]
 
     def device_id(self):
         characters = string.ascii_lowercase + string.digits
@@ -208,31 +193,12 @@ class Spider(Spider):
         return random_string
 
     def gethost(self):
-        try:
-            url = 'https://dns.alidns.com/dns-query'
-            headers = {
-                'User-Agent': 'okhttp/4.9.2',
-                'Accept': 'application/dns-message'
-            }
-            params = {
-                'dns': 'AAABAAABAAAAAAAACWJmbTExYXM5ZgdmdXFpeXVuAmNuAAAcAAE'
-            }
-            response = self.fetch(url, headers=headers, params=params)
-            host=self.parse_dns_name(response.content, 12)
-            return f"https://{host}"
-        except:
-            return "https://bfm11as9f.fuqiyun.cn"
-
-    def parse_dns_name(self, data, offset):
-        parts = []
-        while True:
-            length = data[offset]
-            if length == 0:
-                break
-            offset += 1
-            parts.append(data[offset:offset + length].decode('utf-8'))
-            offset += length
-        return '.'.join(parts)
+        # 线路域名经 DoH 解析(沿 CNAME 链取到最终 IP)以防污染; 请求的 Host/SNI 仍用该域名, 只把连接目标换成解析出的 IP
+        host = 'bfm11as9f.fuqiyun.cn'
+        # A/AAAA 并发查询, 一种超时不耽误另一种; 与实际连接时用的是同一份结果
+        if self.addresses(host):
+            self.dohHosts = [host]
+        return f"https://{host}"
 
     def header(self):
         headers = {
@@ -260,11 +226,11 @@ class Spider(Spider):
         sign = hmac.new(key.encode(), result.encode(), hashlib.md5).hexdigest()
         return result, sign
 
-    def playlist(self, body):
+    async def playlist(self, body):
         try:
             bba = self.url(body)
             url = f'{self.host}/api/v1/movie_addr/list?pack={bba[0]}&signature={bba[1]}'
-            data = self.fetch(url, headers=self.header()).json()['data']
+            data = (await self.fetchInThread(url, headers=self.header())).json()['data']
             return self.playeach(data)
         except Exception:
             return []
@@ -8,7 +8,6 @@ import sys
 import time
 import uuid
 from urllib.parse import urlparse
-from concurrent.futures import ThreadPoolExecutor
 sys.path.append('..')
 from base.spider import Spider
 from base64 import b64encode, b64decode
@@ -60,7 +59,7 @@ class Spider(Spider):
             classes.append({'type_id': id, 'type_name': i['type_name']})
             if len(i['data']):
                 vlist.extend(i['data'])
-        with ThreadPoolExecutor(max_workers=len(classes)) as executor:
+        with self.executor() as executor:
             results = executor.map(self.getf, classes)
             for id, ft in results:
                 if len(ft):filters[id] = ft
@@ -4,9 +4,7 @@ import json
 import random
 import re
 import sys
-import time
 from base64 import b64decode, b64encode
-import concurrent.futures
 import requests
 from Crypto.Hash import MD5
 from pyquery import PyQuery as pq
@@ -158,40 +156,7 @@ class Spider(Spider):
         data=pq(self.fetch('https://www.jubaba.vip',headers=self.headers).text)
         hlist=list(data('.content-top ul li').items())[:2]
         hsots=[j('a').attr('href') for i in hlist for j in i('a').items()]
-        return self.host_late(hsots)
-
-    def host_late(self, urls):
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            future_to_url = {
-                executor.submit(self.test_host, url): url
-                for url in urls
-            }
-            results = {}
-            for future in concurrent.futures.as_completed(future_to_url):
-                url = future_to_url[future]
-                try:
-                    results[url] = future.result()
-                except Exception as e:
-                    results[url] = float('inf')
-        min_url = min(results.items(), key=lambda x: x[1])[0] if results else None
-        if all(delay == float('inf') for delay in results.values()) or not min_url:
-            return urls[0]
-        return min_url
-
-    def test_host(self, url):
-        try:
-            start_time = time.monotonic()
-            response = requests.head(
-                url,
-                timeout=1.0,
-                allow_redirects=False,
-                headers=self.headers
-            )
-            response.raise_for_status()
-            return (time.monotonic() - start_time) * 1000
-        except Exception as e:
-            print(f"测试{url}失败: {str(e)}")
-            return float('inf')
+        return self.pickHost(hsots, headers=self.headers, strict=True)
 
     def getpq(self, path='',min=0,max=3):
         data = self.session.get(f"{self.host}{path}")
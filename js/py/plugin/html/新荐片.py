@@ -76,7 +76,7 @@ class Spider(Spider):
                     'type_name': k['name'],
                     'type_id': k['id']
                 })
-        with concurrent.futures.ThreadPoolExecutor(max_workers=len(classes)) as executor:
+        with self.executor() as executor:
             future_to_aid = {
                 executor.submit(self.getfts, aid['type_id']): aid['type_id']
                 for aid in classes
@@ -7,7 +7,6 @@ import json
 import time
 import urllib.parse
 import re
-import requests
 from lxml import etree
 from urllib.parse import urljoin
 
@@ -644,9 +643,9 @@ class Spider(Spider):
             if headers is None:
                 headers = self.headers
             if method == 'GET':
-                response = requests.get(url, headers=headers, timeout=timeout, verify=False)
+                response = self.getSession(url).get(url, headers=headers, timeout=timeout, verify=False)
             else:
-                response = requests.post(url, headers=headers, data=data, timeout=timeout, verify=False)
+                response = self.getSession(url).post(url, headers=headers, data=data, timeout=timeout, verify=False)
             return response
         except Exception as e:
             self.log(f"网络请求失败: {url}, 错误: {str(e)}")
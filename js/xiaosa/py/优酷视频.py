@@ -3,7 +3,7 @@
 import json
 import sys
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import as_completed
 from urllib.parse import quote
 from Crypto.Hash import MD5
 import requests
@@ -66,7 +66,7 @@ class Spider(Spider):
         classes = [{'type_name': category, 'type_id': category} for category in categories]
         filters = {}
         self.typeid = {}
-        with ThreadPoolExecutor(max_workers=len(categories)) as executor:
+        with self.executor() as executor:
             tasks = {
                 executor.submit(self.cf, {'type': category}, True): category
                 for category in categories
@@ -158,7 +158,7 @@ class Spider(Spider):
                 batch_size = len(pdata)
                 total_batches = ((index + batch_size - 1) // batch_size) - 1
                 ssj = json.loads(sdata['data']['session'])
-                with ThreadPoolExecutor(max_workers=total_batches) as executor:
+                with self.executor() as executor:
                     futures = []
                     for batch in range(total_batches):
                         start = batch_size + 1 + (batch * batch_size)
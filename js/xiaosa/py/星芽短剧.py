@@ -38,8 +38,6 @@ headerf = {
     "content-type": "application/json; charset=utf-8"
           }
 
-times = int(time.time() * 1000)
-
 data = {
     "device": "2a50580e69d38388c94c93605241fb306",
     "package_name": "com.jz.xydj",
@@ -49,25 +47,23 @@ data = {
     "last_update_time": 1752505243345,
     "report_link_url": "",
     "authorization": "",
-    "timestamp": times
+    "timestamp": 0
         }
 
-plain_text = json.dumps(data, separators=(',', ':'), ensure_ascii=False)
-
 key = "B@ecf920Od8A4df7"
-key_bytes = key.encode('utf-8')
-plain_bytes = plain_text.encode('utf-8')
-cipher = AES.new(key_bytes, AES.MODE_ECB)
-padded_data = pad(plain_bytes, AES.block_size)
-ciphertext = cipher.encrypt(padded_data)
-encrypted = base64.b64encode(ciphertext).decode('utf-8')
 
-response = requests.post("https://u.shytkjgs.com/user/v3/account/login", headers=headerf, data=encrypted)
-response_data = response.json()
-Authorization = response_data['data']['token']
+def login():
+    # 登录取 token; 原先在导入时执行, 网络不通时整个插件加载失败, 改为 init 时调用
+    data["timestamp"] = int(time.time() * 1000)
+    plain_text = json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+    cipher = AES.new(key.encode('utf-8'), AES.MODE_ECB)
+    ciphertext = cipher.encrypt(pad(plain_text.encode('utf-8'), AES.block_size))
+    encrypted = base64.b64encode(ciphertext).decode('utf-8')
+    response = requests.post("https://u.shytkjgs.com/user/v3/account/login", headers=headerf, data=encrypted)
+    return response.json()['data']['token']
 
 headerx = {
-    'authorization': Authorization,
+    'authorization': '',
     'platform': '1',
     'version_name': '3.8.3.1'
           }
@@ -81,7 +77,10 @@ class Spider(Spider):
         return "首页"
 
     def init(self, extend):
-        pass
+        try:
+            headerx['authorization'] = login()
+        except Exception as e:
+            print(f"登录失败: {e}")
 
     def isVideoFormat(self, url):
         pass
@@ -3,7 +3,7 @@
 import random
 import sys
 from base64 import b64encode, b64decode
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import as_completed
 from urllib.parse import urlencode
 sys.path.append('..')
 from base.spider import Spider
@@ -58,7 +58,7 @@ class Spider(Spider):
                 'type_name': k,
                 'type_id': cateManual[k]
             })
-        with ThreadPoolExecutor(max_workers=len(classes)) as executor:
+        with self.executor() as executor:
             results = executor.map(self.getf, classes)
             for id, ft in results:
                 if len(ft):filters[id] = ft
@@ -146,7 +146,7 @@ class Spider(Spider):
                 id = v['albumId']
                 pages = list(range(2, pg + 1))
                 page_results = {}
-                with ThreadPoolExecutor(max_workers=10) as executor:
+                with self.executor() as executor:
                     future_to_page = {
                         executor.submit(self.fetch_page_data, page, id): page
                         for page in pages
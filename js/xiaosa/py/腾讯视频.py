@@ -4,12 +4,12 @@ import json
 import sys
 import uuid
 import copy
+import asyncio
 sys.path.append('..')
-from base.spider import Spider
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from base.spider import AsyncSpider
 
 
-class Spider(Spider):
+class Spider(AsyncSpider):
 
     def init(self, extend=""):
         self.dbody = {
@@ -45,7 +45,7 @@ class Spider(Spider):
         'referer': f'{host}/'
     }
 
-    def homeContent(self, filter):
+    async def homeContent(self, filter):
         cdata = {
             "电视剧": "100113",
             "电影": "100173",
@@ -63,33 +63,31 @@ class Spider(Spider):
                 'type_name': k,
                 'type_id': cdata[k]
             })
-        with ThreadPoolExecutor(max_workers=len(classes)) as executor:
-            futures = [executor.submit(self.get_filter_data, item['type_id']) for item in classes]
-            for future in futures:
-                cid, data = future.result()
-                if not data.get('data', {}).get('module_list_datas'):
-                    continue
-                filter_dict = {}
-                try:
-                    items = data['data']['module_list_datas'][-1]['module_datas'][-1]['item_data_lists']['item_datas']
-                    for item in items:
-                        if not item.get('item_params', {}).get('index_item_key'):
-                            continue
-                        params = item['item_params']
-                        filter_key = params['index_item_key']
-                        if filter_key not in filter_dict:
-                            filter_dict[filter_key] = {
-                                'key': filter_key,
-                                'name': params['index_name'],
-                                'value': []
-                            }
-                        filter_dict[filter_key]['value'].append({
-                            'n': params['option_name'],
-                            'v': params['option_value']
-                        })
-                except (IndexError, KeyError):
-                    continue
-                filters[cid] = list(filter_dict.values())
+        results = await asyncio.gather(*[self.get_filter_data(item['type_id']) for item in classes])
+        for cid, data in results:
+            if not data.get('data', {}).get('module_list_datas'):
+                continue
+            filter_dict = {}
+            try:
+                items = data['data']['module_list_datas'][-1]['module_datas'][-1]['item_data_lists']['item_datas']
+                for item in items:
+                    if not item.get('item_params', {}).get('index_item_key'):
+                        continue
+                    params = item['item_params']
+                    filter_key = params['index_item_key']
+                    if filter_key not in filter_dict:
+                        filter_dict[filter_key] = {
+                            'key': filter_key,
+                            'name': params['index_name'],
+                            'value': []
+                        }
+                    filter_dict[filter_key]['value'].append({
+                        'n': params['option_name'],
+                        'v': params['option_value']
+                    })
+            except (IndexError, KeyError):
+                continue
+            filters[cid] = list(filter_dict.values())
         result['class'] = classes
         result['filters'] = filters
         return result
@@ -161,16 +159,12 @@ class Spider(Spider):
         result['total'] = 999999
         return result
 
-    def detailContent(self, ids):
+    async def detailContent(self, ids):
         vbody = {"page_params":{"req_from":"web","cid":ids[0],"vid":"","lid":"","page_type":"detail_operation","page_id":"detail_page_introduction"},"has_cache":1}
         body = {"page_params":{"req_from":"web_vsite","page_id":"vsite_episode_list","page_type":"detail_operation","id_type":"1","page_size":"","cid":ids[0],"vid":"","lid":"","page_num":"","page_context":"","detail_page_type":"1"},"has_cache":1}
-        with ThreadPoolExecutor(max_workers=2) as executor:
-            future_detail = executor.submit(self.get_vdata, vbody)
-            future_episodes = executor.submit(self.get_vdata, body)
-            vdata = future_detail.result()
-            data = future_episodes.result()
+        vdata, data = await asyncio.gather(self.get_vdata(vbody), self.get_vdata(body))
 
-        pdata = self.process_tabs(data, body, ids)
+        pdata = await self.process_tabs(data, body, ids)
         if not pdata:
             return self.handle_exception(None, "No pdata available")
 
@@ -229,20 +223,20 @@ class Spider(Spider):
     def localProxy(self, param):
         pass
 
-    def get_filter_data(self, cid):
-        hbody = self.dbody.copy()
+    async def get_filter_data(self, cid):
+        hbody = copy.deepcopy(self.dbody)
         hbody['page_params']['channel_id'] = cid
-        data = self.post(
+        data = (await self.postInThread(
             f'{self.apihost}/trpc.universal_backend_service.page_server_rpc.PageServer/GetPageData?video_appid=1000005&vplatform=2&vversion_name=8.9.10&new_mark_label_enabled=1',
-            json=hbody, headers=self.headers).json()
+            json=hbody, headers=self.headers)).json()
         return cid, data
 
-    def get_vdata(self, body):
+    async def get_vdata(self, body):
         try:
-            vdata = self.post(
+            vdata = (await self.postInThread(
                 f'{self.apihost}/trpc.universal_backend_service.page_server_rpc.PageServer/GetPageData?video_appid=3000010&vplatform=2&vversion_name=8.2.96',
                 json=body, headers=self.headers
-            ).json()
+            )).json()
             return vdata
         except Exception as e:
             print(f"Error in get_vdata: {str(e)}")
@@ -284,7 +278,7 @@ class Spider(Spider):
         print(f"{message}: {str(e)}")
         return {'list': [{'vod_play_from': '哎呀翻车啦', 'vod_play_url': '翻车啦#555'}]}
 
-    def process_tabs(self, data, body, ids):
+    async def process_tabs(self, data, body, ids):
         try:
             pdata = data['data']['module_list_datas'][-1]['module_datas'][-1]['item_data_lists']['item_datas']
             tabs = data['data']['module_list_datas'][-1]['module_datas'][-1]['module_params'].get('tabs')
@@ -296,17 +290,12 @@ class Spider(Spider):
                     nbody = copy.deepcopy(body)
                     nbody['page_params']['page_context'] = tab['page_context']
                     task_queue.append(nbody)
-                with ThreadPoolExecutor(max_workers=10) as executor:
-                    future_map = {executor.submit(self.get_vdata, task): idx for idx, task in enumerate(task_queue)}
-                    results = [None] * len(task_queue)
-                    for future in as_completed(future_map.keys()):
-                        idx = future_map[future]
-                        results[idx] = future.result()
-                    for result in results:
-                        if result:
-                            page_data = result['data']['module_list_datas'][-1]['module_datas'][-1]['item_data_lists'][
-                                'item_datas']
-                            pdata.extend(page_data)
+                results = await asyncio.gather(*[self.get_vdata(task) for task in task_queue])
+                for result in results:
+                    if result:
+                        page_data = result['data']['module_list_datas'][-1]['module_datas'][-1]['item_data_lists'][
+                            'item_datas']
+                        pdata.extend(page_data)
             return pdata
         except Exception as e:
             print(f"Error processing episodes: {str(e)}")
@@ -51,7 +51,7 @@ class Spider(Spider):
                 'vod_name':i.get('vod_name'),
                 'vod_pic':i.get('vod_pic_thumb')
             })
-        with concurrent.futures.ThreadPoolExecutor(max_workers=len(classes)) as executor:
+        with self.executor() as executor:
             future_to_aid = {executor.submit(self.fts, aid): aid for aid in classes}
             for future in concurrent.futures.as_completed(future_to_aid):
                 aid = future_to_aid[future]
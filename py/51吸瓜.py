@@ -4,10 +4,7 @@ import json
 import random
 import re
 import sys
-import threading
-import time
 from base64 import b64decode
-import requests
 from Crypto.Cipher import AES
 from Crypto.Util.Padding import unpad
 from pyquery import PyQuery as pq
@@ -18,7 +15,7 @@ from base.spider import Spider
 class Spider(Spider):
 
     def init(self, extend=""):
-        self.host=self.host_late(self.get_domains())
+        self.host=self.pickHost(self.get_domains())
         pass
 
     def getName(self):
@@ -69,6 +66,7 @@ class Spider(Spider):
         data=self.getpq(self.fetch(f"{self.host}{tid}{pg}", headers=self.headers).text)
         result = {}
         result['list'] = self.getlist(data('#archive article a'))
+        self.prefetchImages(result['list'], self.coverImage)
         result['page'] = pg
         result['pagecount'] = 9999
         result['limit'] = 90
@@ -122,8 +120,14 @@ class Spider(Spider):
         return  {'parse': 1, 'url': id, 'header': headers}
 
     def localProxy(self, param):
-        res=self.fetch(param['url'], headers=self.headers, timeout=10)
-        return [200,res.headers.get('Content-Type'),self.aesimg(res.content)]
+        return self.cachedImage(param['url'], self.coverImage)
+
+    def coverImage(self, url):
+        # 请求失败时抛异常; 解密失败时 aesimg 抛 ValueError, 都不会写入图片缓存
+        res=self.fetch(url, headers=self.headers, timeout=10)
+        if res.status_code != 200:
+            raise Exception(f"封面请求失败: {res.status_code}")
+        return self.aesimg(res.content), res.headers.get('Content-Type')
 
     def get_domains(self):
         html = self.getpq(self.fetch("https://51cg.fun", headers=self.headers).text)
@@ -149,37 +153,6 @@ class Spider(Spider):
             domains.append(domain)
         return domains
 
-    def host_late(self, url_list):
-        if isinstance(url_list, str):
-            urls = [u.strip() for u in url_list.split(',')]
-        else:
-            urls = url_list
-
-        if len(urls) <= 1:
-            return urls[0] if urls else ''
-
-        results = {}
-        threads = []
-
-        def test_host(url):
-            try:
-                start_time = time.time()
-                response = requests.head(url, timeout=1.0, allow_redirects=False)
-                delay = (time.time() - start_time) * 1000
-                results[url] = delay
-            except Exception as e:
-                results[url] = float('inf')
-
-        for url in urls:
-            t = threading.Thread(target=test_host, args=(url,))
-            threads.append(t)
-            t.start()
-
-        for t in threads:
-            t.join()
-
-        return min(results.items(), key=lambda x: x[1])[0]
-
     def getlist(self,data):
         videos = []
         for k in data.items():
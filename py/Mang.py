@@ -2,7 +2,7 @@
 # by @嗷呜
 import sys
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import as_completed
 sys.path.append('..')
 from base.spider import Spider
 
@@ -57,7 +57,7 @@ class Spider(Spider):
                 'type_name': k,
                 'type_id': cateManual[k]
             })
-        with ThreadPoolExecutor(max_workers=len(classes)) as executor:
+        with self.executor() as executor:
             results = executor.map(self.getf, classes)
             for id, ft in results:
                 if len(ft):filters[id] = ft
@@ -133,7 +133,7 @@ class Spider(Spider):
         if int(pagecount)>1:
             pages = list(range(2, pagecount+1))
             page_results = {}
-            with ThreadPoolExecutor(max_workers=10) as executor:
+            with self.executor() as executor:
                 future_to_page = {
                     executor.submit(self.fetch_page_data, page, ids[0]): page
                     for page in pages
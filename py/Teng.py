@@ -6,7 +6,7 @@ import uuid
 import copy
 sys.path.append('..')
 from base.spider import Spider
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import as_completed
 
 
 class Spider(Spider):
@@ -63,7 +63,7 @@ class Spider(Spider):
                 'type_name': k,
                 'type_id': cdata[k]
             })
-        with ThreadPoolExecutor(max_workers=len(classes)) as executor:
+        with self.executor() as executor:
             futures = [executor.submit(self.get_filter_data, item['type_id']) for item in classes]
             for future in futures:
                 cid, data = future.result()
@@ -164,7 +164,7 @@ class Spider(Spider):
     def detailContent(self, ids):
         vbody = {"page_params":{"req_from":"web","cid":ids[0],"vid":"","lid":"","page_type":"detail_operation","page_id":"detail_page_introduction"},"has_cache":1}
         body = {"page_params":{"req_from":"web_vsite","page_id":"vsite_episode_list","page_type":"detail_operation","id_type":"1","page_size":"","cid":ids[0],"vid":"","lid":"","page_num":"","page_context":"","detail_page_type":"1"},"has_cache":1}
-        with ThreadPoolExecutor(max_workers=2) as executor:
+        with self.executor() as executor:
             future_detail = executor.submit(self.get_vdata, vbody)
             future_episodes = executor.submit(self.get_vdata, body)
             vdata = future_detail.result()
@@ -296,7 +296,7 @@ class Spider(Spider):
                     nbody = copy.deepcopy(body)
                     nbody['page_params']['page_context'] = tab['page_context']
                     task_queue.append(nbody)
-                with ThreadPoolExecutor(max_workers=10) as executor:
+                with self.executor() as executor:
                     future_map = {executor.submit(self.get_vdata, task): idx for idx, task in enumerate(task_queue)}
                     results = [None] * len(task_queue)
                     for future in as_completed(future_map.keys()):
@@ -3,13 +3,13 @@
 # @Time    : 2025/4/6 21:04
 
 import json
-import re
 import sys
 import time
 import hashlib
 import requests
 import base64
 from urllib.parse import urlencode
+from functools import partial
 sys.path.append('..')
 from base.spider import Spider
 
@@ -113,29 +113,25 @@ class Spider(Spider):
 
     def get_m3u8_text(self,params):
         url = self.b64decode(params['url'])
-        headers = self.headers
-        home_url = url.replace(url.split('/')[-1], '')
+        playlist = self.loadPlaylist(url, headers=self.headers, fetch=partial(requests.get, proxies=self.proxy if self.is_proxy else None))
 
-        def callback_function(match):
-            uri = home_url + match.group(1)
-            a = self.b64encode(uri)
-            # h = params['headers']
-            return f"{self.getProxyUrl()}&type=ts&url={a}"
-        if self.is_proxy:
-            response = requests.get(url, headers=headers, proxies=self.proxy)
-        else:
-            response = requests.get(url, headers=headers)
-        m3u8_text = re.sub(r'(.*\.ts.*)', callback_function, response.text)
+        def callback_function(uri, attrs):
+            return f"{self.getProxyUrl()}&type=ts&url={self.b64encode(uri)}"
+        m3u8_text = playlist.rewrite(segment=callback_function)
+        self.prefetch([uri for _, _, uri, _ in playlist.segments], fetch=lambda u: requests.get(u, headers=self.headers, proxies=self.proxy if self.is_proxy else None, timeout=10))
         return [200, "application/vnd.apple.mpegurl", m3u8_text]
 
     def get_ts(self, params):
         url = self.b64decode(params['url'])
+        data = self.prefetched(url)
+        if data is not None:
+            return [206, "application/octet-stream", data]
         headers = self.headers
         if self.is_proxy:
-            response = requests.get(url, headers=headers, proxies=self.proxy)
+            response = requests.get(url, headers=headers, proxies=self.proxy, stream=True)
         else:
-            response = requests.get(url, headers=headers)
-        return [206, "application/octet-stream", response.content]
+            response = requests.get(url, headers=headers, stream=True)
+        return self.media(response)
 
     def destroy(self):
         return '正在Destroy'
@@ -4,7 +4,6 @@ import json
 import random
 import sys
 from base64 import b64encode, b64decode
-from concurrent.futures import ThreadPoolExecutor
 sys.path.append('..')
 from base.spider import Spider
 
@@ -119,7 +118,7 @@ class Spider(Spider):
         m.update({'playerId': str(l[0]['id'])})
         pd = self.getv(m, c['data']['episodeList'])
         if len(l)-1:
-            with ThreadPoolExecutor(max_workers=len(l)-1) as executor:
+            with self.executor() as executor:
                 future_to_player = {executor.submit(self.getd, jdata, player): player for player in l[1:]}
                 for future in future_to_player:
                     try:
@@ -7,7 +7,6 @@ import json
 import re
 import time
 import urllib.parse
-import requests
 from bs4 import BeautifulSoup
 
 # 导入基础类
@@ -87,9 +86,9 @@ class Spider(Spider):
                 headers = self.headers.copy()
                 
             if method.upper() == "GET":
-                response = requests.get(url, headers=headers, params=data, timeout=10,verify=False)
+                response = self.getSession(url).get(url, headers=headers, params=data, timeout=10,verify=False)
             else:  # POST
-                response = requests.post(url, headers=headers, data=data, timeout=10,verify=False)
+                response = self.getSession(url).post(url, headers=headers, data=data, timeout=10,verify=False)
                 
             response.raise_for_status()
             response.encoding = response.apparent_encoding or 'utf-8'
@@ -1,12 +1,9 @@
 # -*- coding: utf-8 -*-
 # by @嗷呜
-import concurrent.futures
 import json
 import re
 import sys
-import time
 from base64 import b64decode, b64encode
-import requests
 from pyquery import PyQuery as pq
 sys.path.append('..')
 from base.spider import Spider
@@ -150,40 +147,7 @@ class Spider(Spider):
     def gethost(self):
         data = pq(self.fetch('https://www.nmdvd.com', headers=self.headers).text)
         hlist = data('a[rel="nofollow"] b').text().split(' ')
-        return self.host_late(hlist)
-
-    def host_late(self, urls):
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            future_to_url = {
-                executor.submit(self.test_host, f"https://{url}"): f"https://{url}"
-                for url in urls
-            }
-            results = {}
-            for future in concurrent.futures.as_completed(future_to_url):
-                url = future_to_url[future]
-                try:
-                    results[url] = future.result()
-                except Exception as e:
-                    results[url] = float('inf')
-        min_url = min(results.items(), key=lambda x: x[1])[0] if results else None
-        if all(delay == float('inf') for delay in results.values()) or not min_url:
-            return f"https://{urls[0]}"
-        return min_url
-
-    def test_host(self, url):
-        try:
-            start_time = time.monotonic()
-            response = requests.head(
-                url,
-                timeout=1.0,
-                allow_redirects=False,
-                headers=self.headers
-            )
-            response.raise_for_status()
-            return (time.monotonic() - start_time) * 1000
-        except Exception as e:
-            print(f"测试{url}失败: {str(e)}")
-            return float('inf')
+        return self.pickHost([f"https://{i}" for i in hlist], headers=self.headers, strict=True)
 
     def getpq(self, path=''):
         data = self.fetch(f"{self.host}{path}", headers=self.headers).text
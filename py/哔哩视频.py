@@ -232,93 +232,43 @@ class Spider(Spider):  # 元类 默认的元类 type
 			return self.proxyMedia(params)
 		return None
 
-	def proxyMpd(self, params):
-		content, durlinfos, mediaType = self.getDash(params)
+	def proxyMpd(self, params, forceRefresh=False):
+		content, durlinfos, mediaType = self.getDash(params, forceRefresh)
 		if mediaType == 'mpd':
 			return [200, "application/dash+xml", content]
 		else:
-			url = content
-			durlinfo = durlinfos['durl'][0]['backup_url']
-			try:
-				r = self.fetch(url, headers=self.header, stream=True, timeout=1)
-				statusCode = r.status_code
-				try:
-					r.close()
-				except:
-					pass
-			except:
-				try:
-					r.close()
-				except:
-					pass
-				statusCode = 404
-				for url in durlinfo:
-					try:
-						r = self.fetch(url, headers=self.header, stream=True, timeout=1)
-						statusCode = r.status_code
-					except:
-						statusCode = 404
-					if statusCode == 200:
-						break
-					try:
-						r.close()
-					except:
-						pass
-			if statusCode != 200 and self.retry == 0:
-				self.retry += 1
-				self.proxyMedia(params, True)
+			urls = [content] + (durlinfos['durl'][0].get('backup_url') or [])
 			header = self.header.copy()
 			if 'range' in params:
 				header['Range'] = params['range']
-			if '127.0.0.1:7777' in url:
-				header['Location'] = url
-				return [302, "video/MP2T", None, header]
-			return [206, "application/octet-stream", self.fetch(content, headers=header, stream=True).content]
+			for url in urls:
+				if '127.0.0.1:7777' in url:
+					header['Location'] = url
+					return [302, "video/MP2T", None, header]
+			return self.proxyRace(urls, header, lambda: self.proxyMpd(params, True), forceRefresh)
 
 	def proxyMedia(self, params, forceRefresh=False):
-		_, dashinfos, _ = self.getDash(params)
+		_, dashinfos, _ = self.getDash(params, forceRefresh)
 		if 'videoid' in params:
 			videoid = int(params['videoid'])
 			dashinfo = dashinfos['video'][videoid]
-			url = dashinfo['baseUrl']
 		elif 'audioid' in params:
 			audioid = int(params['audioid'])
 			dashinfo = dashinfos['audio'][audioid]
-			url = dashinfo['baseUrl']
 		else:
 			return [404, "text/plain", ""]
-		try:
-			r = self.fetch(url, headers=params['headers'], stream=True)
-			statusCode = r.status_code
-			try:
-				r.close()
-			except:
-				pass
-		except:
-			try:
-				r.close()
-			except:
-				pass
-			statusCode = 404
-			for url in dashinfo['backupUrl']:
-				try:
-					r = self.fetch(url, headers=self.header, stream=True, timeout=1)
-					statusCode = r.status_code
-				except:
-					statusCode = 404
-				if statusCode == 200:
-					break
-				try:
-					r.close()
-				except:
-					pass
-		if statusCode != 200 and self.retry == 0:
-			self.retry += 1
-			self.proxyMedia(params, True)
+		urls = [dashinfo['baseUrl']] + (dashinfo.get('backupUrl') or [])
 		header = self.header.copy()
 		if 'range' in params:
 			header['Range'] = params['range']
-		return [206, "application/octet-stream", self.fetch(url, headers=header, stream=True).content]
+		return self.proxyRace(urls, header, lambda: self.proxyMedia(params, True), forceRefresh)
+
+	def proxyRace(self, urls, header, refresh, refreshed):
+		# 主备地址并发对冲, 直接转发胜出的连接; 全部失败时刷新一次播放地址重试
+		r = self.race(urls, headers=header)
+		if r is None:
+			return [404, "text/plain", ""] if refreshed else refresh()
+		return self.media(r)
 
 	def getDash(self, params, forceRefresh=False):
 		aid = params['aid']
@@ -32,6 +32,9 @@ class Spider(Spider):
 
     host='https://www.knvod.com'
 
+    # 首页与分类页缓存, 过期后条件请求回源
+    cacheRules = {r'knvod\.com/?$': 600, r'/show/\d+-': 300}
+
     headers = {
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
         'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
@@ -1,5 +1,4 @@
 # -*- coding: utf-8 -*-
-import requests
 import re
 import json
 import traceback
@@ -49,7 +48,7 @@ class Spider(Spider):
             }
         
         try:
-            response = requests.get(url, headers=headers, timeout=10, allow_redirects=True)
+            response = self.getSession(url).get(url, headers=headers, timeout=10, allow_redirects=True)
             response.raise_for_status()
             return response
         except Exception as e:
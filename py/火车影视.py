@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
 # by @嗷呜
 import sys
-from urllib.parse import urlparse
 sys.path.append("..")
 import re
 import hashlib
@@ -9,7 +8,6 @@ import hmac
 import random
 import string
 from Crypto.Util.Padding import unpad
-from concurrent.futures import ThreadPoolExecutor
 from Crypto.PublicKey import RSA
 from Crypto.Cipher import PKCS1_v1_5, AES
 from base64 import b64encode, b64decode
@@ -132,7 +130,7 @@ class Spider(Spider):
                 tasks.append({"movie_id": ids[0], "from_code": itt["code"]})
                 names.append(name)
         if tasks:
-            with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+            with self.executor() as executor:
                 results = executor.map(self.playlist, tasks)
                 for result in results:
                     if result:
@@ -186,21 +184,8 @@ class Spider(Spider):
 
     def Mlocal(self, param,header=None):
         url = self.d64(param["url"])
-        ydata = self.fetch(url, headers=header, allow_redirects=False)
-        data = ydata.content.decode('utf-8')
-        if ydata.headers.get('Location'):
-            url = ydata.headers['Location']
-            data = self.fetch(url, headers=header).content.decode('utf-8')
-        parsed_url = urlparse(url)
-        durl = parsed_url.scheme + "://" + parsed_url.netloc
-        lines = data.strip().split('\n')
-        for index, string in enumerate(lines):
-            if '#EXT' not in string and 'http' not in string:
-                last_slash_index = string.rfind('/')
-                lpath = string[:last_slash_index + 1]
-                lines[index] = durl + ('' if lpath.startswith('/') else '/') + lpath
-        data = '\n'.join(lines)
-        return [200, "application/vnd.apple.mpegur", data]
+        playlist = self.loadPlaylist(url, headers=header)
+        return [200, "application/vnd.apple.mpegur", playlist.rewrite()]
 
     def device_id(self):
         characters = string.ascii_lowercase + string.digits
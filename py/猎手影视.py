@@ -10,7 +10,6 @@ import hmac
 import random
 import string
 from Crypto.Util.Padding import unpad
-from concurrent.futures import ThreadPoolExecutor
 from Crypto.PublicKey import RSA
 from Crypto.Cipher import PKCS1_v1_5, AES
 from base64 import b64encode, b64decode
@@ -132,7 +131,7 @@ class Spider(Spider):
                 tasks.append({"movie_id": ids[0], "from_code": itt["code"]})
                 names.append(name)
         if tasks:
-            with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+            with self.executor() as executor:
                 results = executor.map(self.playlist, tasks)
                 for result in results:
                     if result:
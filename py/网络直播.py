@@ -4,16 +4,17 @@ import json
 import re
 import sys
 import time
+import asyncio
 from base64 import b64decode, b64encode
 from urllib.parse import parse_qs
 import requests
 from pyquery import PyQuery as pq
 sys.path.append('..')
-from base.spider import Spider
-from concurrent.futures import ThreadPoolExecutor
+from base.spider import AsyncSpider
 
 
-class Spider(Spider):
+class Spider(AsyncSpider):
+    coalesce = True
 
     def init(self, extend=""):
         tid = 'douyin'
@@ -92,12 +93,12 @@ class Spider(Spider):
         }
     }
 
-    def process_bili(self):
+    async def process_bili(self):
         try:
-            self.blfdata = self.fetch(
+            self.blfdata = (await self.fetchInThread(
                 f'{self.hosts["bili"][0]}/room/v1/Area/getList?need_entrance=1&parent_id=0',
                 headers=self.gethr(0, 'bili')
-            ).json()
+            )).json()
             return ('bili', [{'key': 'cate', 'name': '分类',
                               'value': [{'n': i['name'], 'v': str(i['id'])}
                                         for i in self.blfdata['data']]}])
@@ -105,9 +106,9 @@ class Spider(Spider):
             print(f"bili处理错误: {e}")
             return 'bili', None
 
-    def process_douyin(self):
+    async def process_douyin(self):
         try:
-            data = self.getpq(self.hosts['douyin'], headers=self.dyheaders)('script')
+            data = (await self.callInThread(self.getpq, self.hosts['douyin'], headers=self.dyheaders))('script')
             for i in data.items():
                 if 'categoryData' in i.text():
                     content = i.text()
@@ -129,12 +130,12 @@ class Spider(Spider):
             print(f"douyin请求或处理错误: {e}")
             return 'douyin', None
 
-    def process_douyu(self):
+    async def process_douyu(self):
         try:
-            self.dyufdata = self.fetch(
+            self.dyufdata = (await self.fetchInThread(
                 f'{self.referers["douyu"]}/api/cate/list',
                 headers=self.headers[1]
-            ).json()
+            )).json()
             return ('douyu', [{'key': 'cate', 'name': '分类',
                                'value': [{'n': i['cate1Name'], 'v': str(i['cate1Id'])}
                                          for i in self.dyufdata['data']['cate1Info']]}])
@@ -142,7 +143,7 @@ class Spider(Spider):
             print(f"douyu错误: {e}")
             return 'douyu', None
 
-    def homeContent(self, filter):
+    async def homeContent(self, filter):
         result = {}
         cateManual = {
             "虎牙": "huya",
@@ -157,17 +158,10 @@ class Spider(Spider):
                                 {'n': '娱乐', 'v': '8'}, {'n': '手游', 'v': '3'}]}]
         }
 
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            futures = {
-                executor.submit(self.process_bili): 'bili',
-                executor.submit(self.process_douyin): 'douyin',
-                executor.submit(self.process_douyu): 'douyu'
-            }
-
-            for future in futures:
-                platform, filter_data = future.result()
-                if filter_data:
-                    filters[platform] = filter_data
+        results = await asyncio.gather(self.process_bili(), self.process_douyin(), self.process_douyu())
+        for platform, filter_data in results:
+            if filter_data:
+                filters[platform] = filter_data
 
         for k in cateManual:
             classes.append({
@@ -649,7 +643,7 @@ class Spider(Spider):
             headers = self.gethr(0, zr=f'{self.hosts[ids[0]]}/{sdata["id"]}')
             ldata = json.loads(self.d64(ids[2]))
             result_obj = {}
-            with ThreadPoolExecutor(max_workers=len(ldata)) as executor:
+            with self.executor() as executor:
                 futures = [
                     executor.submit(
                         self.douyufp,
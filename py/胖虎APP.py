@@ -4,8 +4,8 @@ import re
 import sys
 sys.path.append('..')
 from base.spider import Spider
-from Cryptodome.Cipher import AES
-from Cryptodome.Util.Padding import pad, unpad
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import pad, unpad
 from base64 import b64encode, b64decode
 import json
 import time
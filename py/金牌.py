@@ -2,9 +2,7 @@
 # by @嗷呜
 import json
 import sys
-import threading
 import uuid
-import requests
 sys.path.append('..')
 from base.spider import Spider
 import time
@@ -15,7 +13,7 @@ class Spider(Spider):
     def init(self, extend=""):
         if extend:
             hosts=json.loads(extend)['site']
-        self.host = self.host_late(hosts)
+        self.host = self.pickHost(hosts)
         pass
 
     def getName(self):
@@ -143,33 +141,6 @@ class Spider(Spider):
     def localProxy(self, param):
         pass
 
-    def host_late(self, url_list):
-        if isinstance(url_list, str):
-            urls = [u.strip() for u in url_list.split(',')]
-        else:
-            urls = url_list
-        if len(urls) <= 1:
-            return urls[0] if urls else ''
-
-        results = {}
-        threads = []
-
-        def test_host(url):
-            try:
-                start_time = time.time()
-                response = requests.head(url, timeout=1.0, allow_redirects=False)
-                delay = (time.time() - start_time) * 1000
-                results[url] = delay
-            except Exception as e:
-                results[url] = float('inf')
-        for url in urls:
-            t = threading.Thread(target=test_host, args=(url,))
-            threads.append(t)
-            t.start()
-        for t in threads:
-            t.join()
-        return min(results.items(), key=lambda x: x[1])[0]
-
     def md5(self, sign_key):
         md5_hash = MD5.new()
         md5_hash.update(sign_key.encode('utf-8'))